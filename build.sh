@@ -44,6 +44,14 @@ $PYTHON manage.py collectstatic --no-input
 echo "Running migrations..."
 $PYTHON manage.py migrate
 
+# Ingredient names and allergen flags follow the rules in core.dietary
+echo "Reclassifying recipes..."
+$PYTHON manage.py reclassify_recipes
+
+# Shared cache table (a no-op unless the database cache is configured)
+echo "Creating cache table..."
+$PYTHON manage.py createcachetable
+
 echo "Creating default superuser if needed..."
 $PYTHON manage.py create_default_superuser
 
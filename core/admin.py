@@ -6,7 +6,8 @@ from django.utils.html import format_html
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Profile, MealPlan, WeeklyUpdate, MealPlanTemplate, Recipe, Message, LabResult, FoodLog
+from .models import Profile, MealPlan, WeeklyUpdate, MealPlanTemplate, Recipe, Message, LabResult, FoodLog, BulkAssignmentJob
+from .assignments import assign_or_queue
 
 class AssignMealPlanForm(forms.Form):
     template = forms.ModelChoiceField(queryset=MealPlanTemplate.objects.all(), label="Select Meal Plan Template")
@@ -23,9 +24,10 @@ class RecipeAdmin(admin.ModelAdmin):
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'is_approved', 'is_staff_status', 'get_groups')
-    list_filter = ('is_approved', 'user__is_staff', 'user__groups')
+    list_display = ('user', 'is_approved', 'nutritionist', 'is_staff_status', 'get_groups')
+    list_filter = ('is_approved', 'nutritionist', 'user__is_staff', 'user__groups')
     search_fields = ('user__username', 'user__email')
+    raw_id_fields = ('nutritionist',)
     actions = ['assign_meal_plan_from_template', 'toggle_staff_status', 'promote_to_nutritionist']
 
     def is_staff_status(self, obj):
@@ -77,22 +79,14 @@ class ProfileAdmin(admin.ModelAdmin):
                 template = form.cleaned_data['template']
                 start_date = form.cleaned_data['start_date']
                 
-                # Calculate end date (assuming 7 days for now, or could add duration to template)
-                from datetime import timedelta
-                end_date = start_date + timedelta(days=6)
+                # Only user ids are needed, so profile.user is never loaded per row
+                user_ids = queryset.values_list('user_id', flat=True)
+                count, job = assign_or_queue(template, user_ids, start_date, created_by=request.user)
                 
-                count = 0
-                for profile in queryset:
-                    MealPlan.objects.create(
-                        user=profile.user,
-                        start_date=start_date,
-                        end_date=end_date,
-                        content=template.content,
-                        structured_plan=template.structured_plan
-                    )
-                    count += 1
-                
-                self.message_user(request, f"Successfully assigned '{template.name}' to {count} users.")
+                if job is not None:
+                    self.message_user(request, f"Queued assignment of '{template.name}' to {job.total} users (job #{job.id}).")
+                else:
+                    self.message_user(request, f"Successfully assigned '{template.name}' to {count} users.")
                 return redirect(request.get_full_path())
         else:
             form = AssignMealPlanForm()
@@ -113,6 +107,13 @@ class MealPlanTemplateAdmin(admin.ModelAdmin):
     list_display = ('name', 'created_at')
     search_fields = ('name',)
 
+@admin.register(BulkAssignmentJob)
+class BulkAssignmentJobAdmin(admin.ModelAdmin):
+    list_display = ('template', 'status', 'processed', 'total', 'created_by', 'created_at')
+    list_filter = ('status',)
+    readonly_fields = ('template', 'created_by', 'start_date', 'status', 'total', 'processed', 'error', 'created_at', 'updated_at')
+    exclude = ('user_ids',)
+
 @admin.register(MealPlan)
 class MealPlanAdmin(admin.ModelAdmin):
     list_display = ('user', 'start_date', 'end_date', 'created_at')
@@ -0,0 +1,116 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .dashboard import invalidate_dashboard_stats
+from .models import MealPlan, BulkAssignmentJob
+
+ASSIGN_BATCH_SIZE = 500
+# A 'running' job not updated for this long is assumed to belong to a dead worker
+STALE_JOB_AFTER = timedelta(minutes=10)
+
+
+def assignment_end_date(start_date):
+    # Templates describe one week
+    return start_date + timedelta(days=6)
+
+
+def create_plans(template, user_ids, start_date, recipe_ids=None):
+    """
+    bulk_create one plan per user. bulk_create skips the signals that
+    normally maintain nutrition_summary and the recipes M2M, so both are
+    copied from the template here.
+    """
+    if recipe_ids is None:
+        recipe_ids = list(template.recipes.values_list('id', flat=True))
+    end_date = assignment_end_date(start_date)
+    plans = MealPlan.objects.bulk_create([
+        MealPlan(
+            user_id=user_id,
+            start_date=start_date,
+            end_date=end_date,
+            content=template.content,
+            structured_plan=template.structured_plan,
+            nutrition_summary=template.nutrition_summary,
+        )
+        for user_id in user_ids
+    ], batch_size=ASSIGN_BATCH_SIZE)
+
+    PlanRecipe = MealPlan.recipes.through
+    PlanRecipe.objects.bulk_create([
+        PlanRecipe(mealplan_id=plan.id, recipe_id=recipe_id)
+        for plan in plans for recipe_id in recipe_ids
+    ], batch_size=ASSIGN_BATCH_SIZE)
+    return len(plans)
+
+
+def assign_template(template, user_ids, start_date, batch_size=ASSIGN_BATCH_SIZE):
+    """Assign synchronously, in batches, inside a single transaction."""
+    user_ids = list(user_ids)
+    recipe_ids = list(template.recipes.values_list('id', flat=True))
+    with transaction.atomic():
+        for offset in range(0, len(user_ids), batch_size):
+            create_plans(template, user_ids[offset:offset + batch_size], start_date, recipe_ids)
+    invalidate_dashboard_stats()
+    return len(user_ids)
+
+
+def assign_or_queue(template, user_ids, start_date, created_by=None):
+    """
+    Assign directly when the batch is small; above BULK_ASSIGN_SYNC_LIMIT
+    queue a BulkAssignmentJob instead. Returns (created_count, job).
+    """
+    user_ids = list(user_ids)
+    if len(user_ids) <= settings.BULK_ASSIGN_SYNC_LIMIT:
+        return assign_template(template, user_ids, start_date), None
+
+    job = BulkAssignmentJob.objects.create(
+        template=template,
+        created_by=created_by,
+        start_date=start_date,
+        user_ids=user_ids,
+        total=len(user_ids),
+    )
+    return 0, job
+
+
+def claim_next_job():
+    """Lock and mark the oldest runnable job as running, or return None."""
+    stale_before = timezone.now() - STALE_JOB_AFTER
+    with transaction.atomic():
+        job = BulkAssignmentJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status='pending') | Q(status='running', updated_at__lt=stale_before)
+        ).order_by('created_at').first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+    return job
+
+
+def run_job(job, batch_size=ASSIGN_BATCH_SIZE):
+    """
+    Process a claimed job batch by batch. Each batch commits together with
+    the progress counter, so a restarted job resumes where it stopped.
+    """
+    template = job.template
+    recipe_ids = list(template.recipes.values_list('id', flat=True))
+    try:
+        while job.processed < job.total:
+            batch = job.user_ids[job.processed:job.processed + batch_size]
+            with transaction.atomic():
+                create_plans(template, batch, job.start_date, recipe_ids)
+                job.processed += len(batch)
+                job.save(update_fields=['processed', 'updated_at'])
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+    finally:
+        invalidate_dashboard_stats()
+
+    job.status = 'done'
+    job.save(update_fields=['status', 'updated_at'])
+    return job
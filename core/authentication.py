@@ -0,0 +1,120 @@
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from functools import partial
+from django.contrib.auth.models import User
+from .models import Profile
+
+# Claims stamped into every token by CustomTokenObtainPairSerializer.get_token
+USER_CLAIMS = ('username', 'is_staff', 'is_active')
+PROFILE_CLAIMS = ('profile_id', 'is_nutritionist', 'is_approved')
+
+
+def add_user_claims(token, user):
+    """Embed the fields needed by permission checks into a token."""
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+
+    profile = getattr(user, 'profile', None)
+    token['profile_id'] = profile.id if profile else None
+    token['is_nutritionist'] = bool(profile and profile.is_nutritionist)
+    token['is_approved'] = bool(profile and profile.is_approved)
+    return token
+
+
+def _refresh_with_deferred(instance, using=None, fields=None, from_queryset=None):
+    # Any deferred column pulls in all of them, so a serializer reading the
+    # unclaimed fields costs one query rather than one per field
+    deferred = instance.get_deferred_fields()
+    if deferred:
+        if fields is None:
+            fields = [f.attname for f in instance._meta.concrete_fields]
+        else:
+            fields = set(fields) | deferred
+    type(instance).refresh_from_db(instance, using=using, fields=fields, from_queryset=from_queryset)
+
+
+def _from_claims(model, values):
+    """
+    A plain `model` instance (not a proxy, so signal receivers registered
+    for the model still fire on save) with only the claimed columns loaded.
+    """
+    # from_db() marks every column we don't pass as deferred
+    field_names = [f.attname for f in model._meta.concrete_fields if f.attname in values]
+    instance = model.from_db(None, field_names, [values[name] for name in field_names])
+    instance.refresh_from_db = partial(_refresh_with_deferred, instance)
+    return instance
+
+
+def user_from_claims(validated_token):
+    """
+    Build a User from token claims without touching the database.
+    Returns None for tokens issued without the claims (e.g. RefreshToken.for_user).
+    """
+    if any(claim not in validated_token for claim in USER_CLAIMS + PROFILE_CLAIMS):
+        return None
+
+    # simplejwt serializes the id claim as a string
+    user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+    user = _from_claims(User, {
+        'id': user_id,
+        **{claim: validated_token[claim] for claim in USER_CLAIMS},
+    })
+
+    profile = None
+    if validated_token['profile_id'] is not None:
+        profile = _from_claims(Profile, {
+            'id': validated_token['profile_id'],
+            'user_id': user_id,
+            'is_nutritionist': validated_token['is_nutritionist'],
+            'is_approved': validated_token['is_approved'],
+        })
+        Profile._meta.get_field('user').set_cached_value(profile, user)
+    # Caching None makes a missing profile raise DoesNotExist without a query
+    Profile._meta.get_field('user').remote_field.set_cached_value(user, profile)
+    return user
+
+
+class StatelessJWTMixin:
+    """
+    Trust the signed claims instead of loading the User and Profile rows on
+    every request. Claims are refreshed whenever the access token is
+    refreshed, so changes to is_staff/is_approved apply within one token
+    lifetime.
+    """
+    def get_user(self, validated_token):
+        # Password-change revocation needs the stored hash, so it can't be stateless
+        user = None if api_settings.CHECK_REVOKE_TOKEN else user_from_claims(validated_token)
+        if user is None:
+            return super().get_user(validated_token)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+class StatelessJWTAuthentication(StatelessJWTMixin, JWTAuthentication):
+    pass
+
+
+class StatelessJWTCookieAuthentication(StatelessJWTMixin, JWTCookieAuthentication):
+    pass
+
+
+def authenticate_token_request(request):
+    """
+    Resolve the JWT user for a plain Django view (not DRF). Browsers can't
+    attach headers to EventSource or <img> requests, so ?token=<access token>
+    is accepted as well as the header and cookie. Returns None when
+    unauthenticated.
+    """
+    auth = StatelessJWTCookieAuthentication()
+    try:
+        raw_token = request.GET.get('token')
+        if raw_token:
+            return auth.get_user(auth.get_validated_token(raw_token))
+        result = auth.authenticate(request)
+        return result[0] if result else None
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
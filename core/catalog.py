@@ -0,0 +1,319 @@
+import csv
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from . import dietary, recipe_search
+from .conditional import touch
+from .meal_plans import MACRO_FIELDS, load_plan_recipes, nutrition_summary, plan_recipe_ids, refresh_nutrition_summaries
+from .models import MealPlan, MealPlanTemplate, Recipe, RecipeIngredient, Tag
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+
+RECIPE_FIELDS = (
+    'title', 'prep_time_minutes', 'cook_time_minutes', 'servings', 'calories', 'protein_g', 'carbs_g', 'fat_g',
+    'ingredients', 'instructions', 'tags',
+)
+TEMPLATE_FIELDS = ('name', 'description', 'content', 'structured_plan')
+RECORD_TYPES = {
+    'recipe': (Recipe, RECIPE_FIELDS),
+    'template': (MealPlanTemplate, TEMPLATE_FIELDS),
+}
+# Recipe fields that feed cached shopping lists (see signals.SHOPPING_LIST_FIELDS)
+SHOPPING_LIST_FIELDS = ('title', 'ingredients', 'servings')
+INPUT_FORMATS = {'.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+
+
+def detect_format(filename):
+    for extension, input_format in INPUT_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return input_format
+    raise ValueError(f"Can't tell the format of {filename}; expected one of: {', '.join(INPUT_FORMATS)}")
+
+
+def read_records(stream, input_format):
+    """
+    Yield (row number, record) from a text stream. NDJSON and CSV are read
+    a line at a time; a JSON document (a list of records, or
+    {"recipes": [...], "templates": [...]}) has to be parsed whole.
+    Records that aren't objects come through as None.
+    """
+    if input_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif input_format == 'ndjson':
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+    else:
+        document = json.load(stream)
+        if isinstance(document, dict):
+            document = [
+                {'type': kind, **record} if isinstance(record, dict) else record
+                for kind, section in (('recipe', 'recipes'), ('template', 'templates'))
+                for record in document.get(section) or []
+            ]
+        for number, record in enumerate(document, 1):
+            yield number, record
+
+
+def clean_record(record):
+    """
+    (type, key, field values) for one record, validated and coerced with
+    the model fields themselves. Raises ValueError describing every
+    problem found.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('not a JSON object')
+    kind = record.get('type') or 'recipe'
+    if kind not in RECORD_TYPES:
+        raise ValueError(f"type must be one of: {', '.join(RECORD_TYPES)}")
+    key = str(record.get('key') or '').strip()
+    if not key or len(key) > 100:
+        raise ValueError('key is required (at most 100 characters)')
+
+    model, fields = RECORD_TYPES[kind]
+    values, errors = {}, []
+    for name in fields:
+        field = model._meta.get_field(name)
+        raw = record.get(name)
+        if raw is None or (raw == '' and field.null):
+            # CSV leaves empty cells; missing text fields default to ''
+            raw = None if field.null else field.get_default()
+        try:
+            if name == 'structured_plan' and isinstance(raw, str):
+                raw = json.loads(raw)
+            values[name] = field.clean(raw, None)
+        except ValueError:
+            errors.append(f'{name}: invalid JSON')
+        except ValidationError as e:
+            errors.append(f"{name}: {' '.join(e.messages)}")
+    if errors:
+        raise ValueError('; '.join(errors))
+    return kind, key, values
+
+
+class CatalogImport:
+    """
+    Upserts recipes and templates keyed on catalog_key, a batch at a time,
+    with bulk_create(update_conflicts=True). bulk_create skips the model
+    signals, so each batch also writes what they would have derived:
+    allergen flags, ingredient and tag rows, search vectors, template
+    nutrition summaries and recipe links, and refreshed summaries and
+    shopping list versions for plans using a changed recipe.
+
+    Templates refer to recipes by catalog key (a string) or by id (an
+    integer). Keys resolve against recipes earlier in the same import or
+    already in the database, so list recipes before the templates using
+    them.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.pending = {'recipe': {}, 'template': {}}
+        # Catalog key -> id for every recipe key seen (ids are None in a dry run)
+        self.recipe_ids = {}
+        self.counts = {kind: {'created': 0, 'updated': 0} for kind in RECORD_TYPES}
+        self.recipes_written = False
+        self.rows = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, records):
+        started = time.monotonic()
+        for number, record in records:
+            self.rows += 1
+            try:
+                kind, key, values = clean_record(record)
+            except ValueError as e:
+                self.error(number, e)
+                continue
+            # Repeated keys within a batch: the last one wins
+            self.pending[kind][key] = (number, values)
+            if len(self.pending[kind]) >= self.batch_size:
+                self.flush(kind)
+        self.flush('recipe')
+        self.flush('template')
+        if self.recipes_written:
+            recipe_search.invalidate_index()
+        return self.report(time.monotonic() - started)
+
+    def error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'error': str(message)})
+
+    def report(self, seconds):
+        return {
+            'rows': self.rows,
+            'recipes': self.counts['recipe'],
+            'templates': self.counts['template'],
+            'errors': self.error_count,
+            'error_details': self.errors,
+            'dry_run': self.dry_run,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds) if seconds else None,
+        }
+
+    def flush(self, kind):
+        batch, self.pending[kind] = self.pending[kind], {}
+        if kind == 'template':
+            # Templates may refer to recipes still waiting for their batch
+            self.flush('recipe')
+            batch = self.resolve_plans(batch)
+        if not batch:
+            return
+        with transaction.atomic():
+            if kind == 'recipe':
+                self.write_recipes(batch)
+            else:
+                self.write_templates(batch)
+
+    def resolve_plans(self, batch):
+        """Rewrite recipe keys in structured plans to ids; drop templates with unknown keys."""
+        refs = {
+            ref for _, values in batch.values() for meals in _plan_meals(values['structured_plan'])
+            for ref in meals.values() if isinstance(ref, str)
+        }
+        missing = refs.difference(self.recipe_ids)
+        if missing:
+            self.recipe_ids.update(Recipe.objects.filter(catalog_key__in=missing).values_list('catalog_key', 'id'))
+
+        resolved = {}
+        for key, (number, values) in batch.items():
+            plan = values['structured_plan']
+            unknown = sorted({
+                ref for meals in _plan_meals(plan) for ref in meals.values()
+                if isinstance(ref, str) and ref not in self.recipe_ids
+            })
+            if unknown:
+                self.error(number, f"structured_plan: unknown recipe keys {unknown[:10]}")
+                continue
+            if isinstance(plan, dict):
+                values['structured_plan'] = {
+                    day: {
+                        meal: self.recipe_ids[ref] if isinstance(ref, str) else ref for meal, ref in meals.items()
+                    } if isinstance(meals, dict) else meals
+                    for day, meals in plan.items()
+                }
+            resolved[key] = (number, values)
+        return resolved
+
+    def write_recipes(self, batch):
+        keys = list(batch)
+        existing = {
+            row[0]: row[1:] for row in Recipe.objects.filter(catalog_key__in=keys).values_list(
+                'catalog_key', 'id', *SHOPPING_LIST_FIELDS, *MACRO_FIELDS,
+            )
+        }
+        self.counts['recipe']['created'] += len(keys) - len(existing)
+        self.counts['recipe']['updated'] += len(existing)
+        if self.dry_run:
+            self.recipe_ids.update(dict.fromkeys(keys))
+            return
+
+        ingredients, tags, recipes = {}, {}, []
+        for key, (_, values) in batch.items():
+            ingredients[key] = dietary.parse_ingredients(values['ingredients'])
+            tags[key] = recipe_search.parse_tags(values['tags'])
+            recipes.append(Recipe(catalog_key=key, allergen_flags=dietary.ingredient_flags(ingredients[key]), **values))
+        self.recipes_written = True
+        Recipe.objects.bulk_create(
+            recipes, update_conflicts=True, unique_fields=['catalog_key'],
+            update_fields=[*RECIPE_FIELDS, 'allergen_flags', 'updated_at'],
+        )
+        ids = {key: row[0] for key, row in existing.items()}
+        ids.update(Recipe.objects.filter(catalog_key__in=[k for k in keys if k not in ids]).values_list('catalog_key', 'id'))
+        self.recipe_ids.update(ids)
+        updated_ids = [row[0] for row in existing.values()]
+
+        RecipeIngredient.objects.filter(recipe_id__in=updated_ids).delete()
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe_id=ids[key], name=name) for key, names in ingredients.items() for name in names
+        ], ignore_conflicts=True)
+
+        names = {name for batch_tags in tags.values() for name in batch_tags}
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        RecipeTag = Recipe.tag_set.through
+        RecipeTag.objects.filter(recipe_id__in=updated_ids).delete()
+        RecipeTag.objects.bulk_create([
+            RecipeTag(recipe_id=ids[key], tag_id=tag_ids[name]) for key, batch_tags in tags.items() for name in batch_tags
+        ], ignore_conflicts=True)
+        recipe_search.update_search_vectors(Recipe.objects.filter(id__in=ids.values()))
+
+        # What the post_save signals do for edited recipes
+        shopping_changed, macros_changed = [], []
+        width = len(SHOPPING_LIST_FIELDS)
+        for key, (recipe_id, *saved) in existing.items():
+            values = batch[key][1]
+            if tuple(saved[:width]) != tuple(values[f] for f in SHOPPING_LIST_FIELDS):
+                shopping_changed.append(recipe_id)
+            if tuple(saved[width:]) != tuple(values[f] for f in MACRO_FIELDS):
+                macros_changed.append(recipe_id)
+        if shopping_changed:
+            MealPlan.objects.filter(
+                id__in=MealPlan.recipes.through.objects.filter(recipe_id__in=shopping_changed).values('mealplan_id')
+            ).update(version=F('version') + 1, **touch(MealPlan))
+        if macros_changed:
+            refresh_nutrition_summaries(MealPlan, MealPlan.objects.filter(recipes__in=macros_changed).distinct())
+            refresh_nutrition_summaries(
+                MealPlanTemplate, MealPlanTemplate.objects.filter(recipes__in=macros_changed).distinct()
+            )
+
+    def write_templates(self, batch):
+        keys = list(batch)
+        existing = dict(MealPlanTemplate.objects.filter(catalog_key__in=keys).values_list('catalog_key', 'id'))
+        self.counts['template']['created'] += len(keys) - len(existing)
+        self.counts['template']['updated'] += len(existing)
+        if self.dry_run:
+            return
+
+        # One recipe query for the whole batch; signals.compute_nutrition_summary makes one per template
+        recipe_map = load_plan_recipes([values['structured_plan'] for _, values in batch.values()])
+        templates, recipe_links = [], {}
+        for key, (_, values) in batch.items():
+            plan_map = {
+                pk: recipe_map[pk] for pk in plan_recipe_ids([values['structured_plan']]) if pk in recipe_map
+            }
+            recipe_links[key] = list(plan_map)
+            templates.append(MealPlanTemplate(
+                catalog_key=key, nutrition_summary=nutrition_summary(values['structured_plan'], plan_map), **values
+            ))
+        MealPlanTemplate.objects.bulk_create(
+            templates, update_conflicts=True, unique_fields=['catalog_key'],
+            update_fields=[*TEMPLATE_FIELDS, 'nutrition_summary'],
+        )
+        ids = dict(existing)
+        ids.update(MealPlanTemplate.objects.filter(
+            catalog_key__in=[k for k in keys if k not in ids]
+        ).values_list('catalog_key', 'id'))
+
+        TemplateRecipe = MealPlanTemplate.recipes.through
+        TemplateRecipe.objects.filter(mealplantemplate_id__in=existing.values()).delete()
+        TemplateRecipe.objects.bulk_create([
+            TemplateRecipe(mealplantemplate_id=ids[key], recipe_id=recipe_id)
+            for key, recipe_ids in recipe_links.items() for recipe_id in recipe_ids
+        ], ignore_conflicts=True)
+
+
+def _plan_meals(structured_plan):
+    if isinstance(structured_plan, dict):
+        for meals in structured_plan.values():
+            if isinstance(meals, dict):
+                yield meals
+
+
+def import_catalog(stream, input_format, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """Import a recipe/template catalog from a text stream; returns the report."""
+    return CatalogImport(batch_size, dry_run).run(read_records(stream, input_format))
@@ -0,0 +1,97 @@
+import hashlib
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .models import Profile, Recipe
+
+
+def make_etag(request, version):
+    """
+    Weak ETag for a response to `request` whose content is determined by
+    `version`. The user, full path and renderer are folded in, so one tag
+    never covers two different bodies.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = repr((request.user.id, request.get_full_path(), getattr(renderer, 'format', None), version))
+    return f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def conditional_get(version_func):
+    """
+    Decorate a GET handler so it answers If-None-Match with 304 before the
+    serializer runs. `version_func(view, request, *args, **kwargs)` must be
+    one cheap query whose result changes whenever the body would; returning
+    None skips the check (e.g. to let the handler 404).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            version = version_func(self, request, *args, **kwargs)
+            if version is None:
+                return method(self, request, *args, **kwargs)
+            etag = make_etag(request, version)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                # Stored by the browser but revalidated on every use
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
+
+
+def touch(model):
+    """`updated_at` for rows changed through update()/bulk_update(), if the model keeps one."""
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        return {'updated_at': timezone.now()}
+    return {}
+
+
+def _aggregate(queryset, **extra):
+    row = queryset.order_by().aggregate(count=Count('id', distinct=True), updated=Max('updated_at'), **extra)
+    return tuple(row.values())
+
+
+def recipes_version(view, request, *args, **kwargs):
+    # Across all recipes: search ranking depends on the whole corpus
+    version = _aggregate(Recipe.objects.all())
+    patient_id = request.query_params.get('for_patient')
+    if patient_id and patient_id.isdigit():
+        version += (Profile.objects.filter(user_id=patient_id).values_list('updated_at', flat=True).first(),)
+    return version
+
+
+def recipe_version(view, request, pk, *args, **kwargs):
+    return Recipe.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+
+
+def meal_plans_version(view, request, *args, **kwargs):
+    queryset = view.get_queryset()
+    if 'pk' in kwargs:
+        queryset = queryset.filter(pk=kwargs['pk'])
+    extra = {}
+    if view.get_serializer().expand_recipes():
+        # Expanded payloads embed the referenced recipes
+        extra['recipes_updated'] = Max('recipes__updated_at')
+    version = _aggregate(queryset, **extra)
+    return version if version[0] or 'pk' not in kwargs else None
+
+
+def profile_version(view, request, *args, **kwargs):
+    return Profile.objects.filter(user_id=request.user.id).values_list('updated_at', flat=True).first()
+
+
+def nutritionists_version(view, request, *args, **kwargs):
+    # User saves re-save the profile (signals.save_user_profile), so its
+    # updated_at covers the user fields too
+    row = User.objects.filter(is_staff=True).aggregate(
+        count=Count('id'), updated=Max('profile__updated_at'), last_id=Max('id'),
+    )
+    return tuple(row.values())
@@ -0,0 +1,48 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Func, Max, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import MealPlan
+from .patients import reachable
+
+STATS_CACHE_KEY = 'nutritionist:dashboard-stats:{generation}:{nutritionist_id}'
+# Bumped to drop every nutritionist's cached stats at once
+STATS_GENERATION_KEY = 'nutritionist:dashboard-stats:generation'
+STATS_CACHE_SECONDS = 60
+
+
+def compute_dashboard_stats(nutritionist_id):
+    """
+    Counts for one nutritionist's caseload (plus the unassigned patients
+    waiting for approval) and their active meal plans, in a single SQL
+    statement: the patient counts are conditional aggregates and the meal
+    plan count is an uncorrelated scalar subquery (MAX() only lifts it into
+    the aggregate).
+    """
+    active_meal_plans = MealPlan.objects.filter(
+        user__profile__nutritionist_id=nutritionist_id,
+        end_date__gte=timezone.now().date()
+    ).order_by().annotate(count=Func(F('id'), function='COUNT')).values('count')
+
+    stats = reachable(nutritionist_id).aggregate(
+        total_patients=Count('id'),
+        approved_patients=Count('id', filter=Q(profile__is_approved=True)),
+        active_meal_plans=Coalesce(Max(Subquery(active_meal_plans)), 0),
+    )
+    stats['pending_patients'] = stats['total_patients'] - stats['approved_patients']
+    return stats
+
+
+def get_dashboard_stats(nutritionist_id):
+    generation = cache.get_or_set(STATS_GENERATION_KEY, lambda: uuid4().hex, None)
+    key = STATS_CACHE_KEY.format(generation=generation, nutritionist_id=nutritionist_id)
+    return cache.get_or_set(key, lambda: compute_dashboard_stats(nutritionist_id), STATS_CACHE_SECONDS)
+
+
+def invalidate_dashboard_stats():
+    # Only once the write is visible; rotating earlier lets a concurrent
+    # request cache the old counts under the new generation
+    transaction.on_commit(lambda: cache.set(STATS_GENERATION_KEY, uuid4().hex, None))
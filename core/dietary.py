@@ -0,0 +1,205 @@
+import re
+from functools import lru_cache
+
+from django.db.models import F
+
+# One bit per allergen / ingredient class stored in Recipe.allergen_flags.
+# Append new classes at the end: the values are persisted.
+GLUTEN = 1 << 0
+DAIRY = 1 << 1
+EGG = 1 << 2
+PEANUT = 1 << 3
+TREE_NUT = 1 << 4
+SOY = 1 << 5
+FISH = 1 << 6
+SHELLFISH = 1 << 7
+SESAME = 1 << 8
+MEAT = 1 << 9
+HONEY = 1 << 10
+
+FLAG_NAMES = {
+    GLUTEN: 'gluten', DAIRY: 'dairy', EGG: 'egg', PEANUT: 'peanut', TREE_NUT: 'tree_nut',
+    SOY: 'soy', FISH: 'fish', SHELLFISH: 'shellfish', SESAME: 'sesame', MEAT: 'meat', HONEY: 'honey',
+}
+
+_KEYWORDS = {
+    GLUTEN: 'gluten wheat flour bread breadcrumb pasta spaghetti macaroni noodle barley rye couscous bulgur semolina tortilla seitan cracker',
+    DAIRY: 'dairy lactose milk buttermilk cheese butter cream yogurt yoghurt ghee parmesan mozzarella feta ricotta '
+           'cheddar whey custard kefir mascarpone paneer',
+    EGG: 'egg mayonnaise mayo meringue',
+    PEANUT: 'peanut',
+    TREE_NUT: 'almond walnut cashew pecan pistachio hazelnut macadamia',
+    SOY: 'soy soya tofu tempeh edamame miso',
+    # Worcestershire sauce is made with anchovies
+    FISH: 'fish salmon tuna cod anchovy sardine trout mackerel tilapia halibut worcestershire',
+    SHELLFISH: 'shellfish shrimp prawn crab lobster mussel clam oyster scallop',
+    SESAME: 'sesame tahini',
+    MEAT: 'meat chicken beef pork lamb turkey bacon ham sausage veal duck prosciutto salami gelatin',
+    HONEY: 'honey',
+}
+KEYWORD_FLAGS = {word: flag for flag, words in _KEYWORDS.items() for word in words.split()}
+# Words that name several classes at once, mostly seen in allergy notes
+KEYWORD_FLAGS.update({
+    'nut': PEANUT | TREE_NUT,
+    'seafood': FISH | SHELLFISH,
+    # Parmesan and pine nuts
+    'pesto': DAIRY | TREE_NUT,
+})
+
+# Phrases whose meaning differs from their words ("almond milk" isn't dairy)
+PHRASE_FLAGS = {
+    'almond milk': TREE_NUT,
+    'almond butter': TREE_NUT,
+    'cashew milk': TREE_NUT,
+    'coconut milk': 0,
+    'coconut cream': 0,
+    'oat milk': 0,
+    'rice milk': 0,
+    'soy milk': SOY,
+    'peanut butter': PEANUT,
+    'cocoa butter': 0,
+    'cream of tartar': 0,
+    'soy sauce': SOY | GLUTEN,
+    # Flours and starches that aren't wheat; plain "flour" still counts
+    'almond flour': TREE_NUT,
+    'hazelnut flour': TREE_NUT,
+    'soy flour': SOY,
+    'rice flour': 0,
+    'coconut flour': 0,
+    'chickpea flour': 0,
+    'buckwheat flour': 0,
+    'corn flour': 0,
+    'potato flour': 0,
+    'tapioca flour': 0,
+    'cassava flour': 0,
+    'quinoa flour': 0,
+    'sorghum flour': 0,
+    'millet flour': 0,
+    'rice noodle': 0,
+    'corn tortilla': 0,
+}
+
+# Qualifiers that cancel a class for the rest of the line
+FREE_OF = {
+    'gluten free': GLUTEN,
+    'dairy free': DAIRY,
+    'lactose free': DAIRY,
+    'egg free': EGG,
+    'vegan': DAIRY | EGG | MEAT | HONEY,
+}
+
+# Classes each diet rules out
+DIETS = {
+    'vegetarian': MEAT | FISH | SHELLFISH,
+    'vegan': MEAT | FISH | SHELLFISH | DAIRY | EGG | HONEY,
+    'pescatarian': MEAT,
+    'gluten free': GLUTEN,
+    'coeliac': GLUTEN,
+    'celiac': GLUTEN,
+    'dairy free': DAIRY,
+    'lactose free': DAIRY,
+}
+
+UNITS = frozenset(
+    'g kg mg ml l oz lb lbs cup tbsp tsp tablespoon teaspoon pinch handful clove slice can '
+    'piece bunch dash scoop sprig large small medium of x'.split()
+)
+TOKEN_RE = re.compile(r'[a-z]+|\d[\d./]*[a-z]*')
+PARENTHETICAL_RE = re.compile(r'\([^)]*\)')
+
+
+def _singular(word):
+    # Keywords are matched as written ("couscous"), and -us words are rarely plurals
+    if word in KEYWORD_FLAGS or word.endswith('us'):
+        return word
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(line):
+    """
+    Reduce an ingredient line to a canonical name:
+    "2 cups Almond Milk (unsweetened), chilled" -> "almond milk".
+    Unit words are dropped, except as the last word after the ingredient's
+    own ("ground cloves" stays "ground clove"). Returns '' when nothing is left.
+    """
+    line = PARENTHETICAL_RE.sub(' ', line.lower().replace('-', ' '))
+    line = line.split(',')[0]
+    words = [_singular(word) for word in TOKEN_RE.findall(line) if not word[0].isdigit()]
+    kept = [word for word in words[:-1] if word not in UNITS]
+    if words and (kept or words[-1] not in UNITS):
+        kept.append(words[-1])
+    return ' '.join(kept)[:100]
+
+
+def parse_ingredients(text):
+    """Unique canonical ingredient names, one per non-empty line."""
+    names = {}
+    for line in (text or '').splitlines():
+        name = normalize_ingredient(line)
+        if name:
+            names[name] = None
+    return list(names)
+
+
+def _contains(words, phrase):
+    phrase = phrase.split()
+    return any(words[i:i + len(phrase)] == phrase for i in range(len(words) - len(phrase) + 1))
+
+
+# Catalogs repeat the same few thousand ingredients across many recipes
+@lru_cache(maxsize=8192)
+def classify(name):
+    """Allergen flags for one canonical ingredient name."""
+    words = name.split()
+    flags = 0
+    consumed = set()
+    for phrase, phrase_flags in PHRASE_FLAGS.items():
+        if _contains(words, phrase):
+            flags |= phrase_flags
+            consumed.update(phrase.split())
+    for word in words:
+        if word not in consumed:
+            flags |= KEYWORD_FLAGS.get(word, 0)
+    for qualifier, cancelled in FREE_OF.items():
+        if _contains(words, qualifier):
+            flags &= ~cancelled
+    return flags
+
+
+def ingredient_flags(names):
+    flags = 0
+    for name in names:
+        flags |= classify(name)
+    return flags
+
+
+def avoided_flags(allergies, dietary_prefs):
+    """Classes a patient must avoid, from the free-text profile fields."""
+    flags = 0
+    for item in re.split(r'[,;/\n]|\band\b', (allergies or '').lower()):
+        name = normalize_ingredient(item)
+        if name:
+            flags |= classify(name)
+    prefs = normalize_ingredient((dietary_prefs or '').replace(',', ' '))
+    words = prefs.split()
+    for diet, diet_flags in DIETS.items():
+        if _contains(words, diet):
+            flags |= diet_flags
+    return flags
+
+
+def flag_names(flags):
+    return [name for flag, name in FLAG_NAMES.items() if flags & flag]
+
+
+def exclude_conflicts(queryset, flags):
+    """Recipes sharing no bit with `flags`: one predicate on allergen_flags."""
+    if not flags:
+        return queryset
+    return queryset.alias(conflicts=F('allergen_flags').bitand(flags)).filter(conflicts=0)
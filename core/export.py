@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import FoodLog, MealPlan, NutritionistNote, WeeklyUpdate
+
+# Rows fetched per round trip (a server-side cursor on PostgreSQL)
+EXPORT_CHUNK_SIZE = 2000
+# Output is handed out in pieces of about this size rather than one per row
+FLUSH_BYTES = 64 * 1024
+
+# dataset -> (model, patient field, exported columns, ordering). Each
+# dataset's rows come out patient by patient, oldest first.
+DATASETS = {
+    'weekly_updates': (WeeklyUpdate, 'user', (
+        'date', 'current_weight', 'waist_cm', 'hips_cm', 'chest_cm', 'arm_cm', 'thigh_cm',
+        'energy_level', 'compliance_score', 'notes',
+    ), ('date', 'id')),
+    'food_logs': (FoodLog, 'user', ('date', 'meal_type', 'content', 'created_at'), ('date', 'id')),
+    'meal_plans': (MealPlan, 'user', (
+        'start_date', 'end_date', 'structured_plan', 'nutrition_summary', 'created_at', 'updated_at',
+    ), ('start_date', 'id')),
+    'notes': (NutritionistNote, 'patient', ('content', 'tags', 'created_at', 'updated_at'), ('created_at', 'id')),
+}
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def headers(dataset):
+    return ('id', 'patient_id', 'patient') + DATASETS[dataset][2]
+
+
+def export_rows(dataset, nutritionist_id=None, patient_id=None):
+    """
+    Tuples in headers(dataset) order for one patient and/or one
+    nutritionist's caseload, streamed with .iterator() so memory stays flat
+    however long the history is. Notes are limited to the nutritionist's own.
+    """
+    model, field, columns, ordering = DATASETS[dataset]
+    queryset = model.objects.all()
+    if nutritionist_id is not None:
+        queryset = queryset.filter(**{f'{field}__profile__nutritionist_id': nutritionist_id})
+        if model is NutritionistNote:
+            queryset = queryset.filter(nutritionist_id=nutritionist_id)
+    if patient_id is not None:
+        queryset = queryset.filter(**{f'{field}_id': patient_id})
+    return queryset.order_by(f'{field}_id', *ordering).values_list(
+        'id', f'{field}_id', f'{field}__username', *columns
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Patient-written text; the quote makes Excel and Sheets show it as text
+        return "'" + value
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _csv_chunks(dataset, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers(dataset))
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(dataset, rows):
+    names = headers(dataset)
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({'type': dataset, **dict(zip(names, row))}, cls=DjangoJSONEncoder) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    yield ''.join(lines)
+
+
+def export_chunks(datasets, output, nutritionist_id=None, patient_id=None):
+    """
+    The export as a generator of text pieces. NDJSON lines carry their
+    dataset as "type"; CSV takes a single dataset, since the columns differ.
+    """
+    chunks = _csv_chunks if output == 'csv' else _ndjson_chunks
+    for dataset in datasets:
+        for chunk in chunks(dataset, export_rows(dataset, nutritionist_id, patient_id)):
+            if chunk:
+                yield chunk
+
+
+def encode_chunks(chunks, compress=False):
+    """UTF-8 encode, optionally gzipping on the fly."""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode()
+        return
+    # wbits=16+MAX_WBITS writes the gzip header and trailer
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def parse_export_params(params):
+    """
+    ?dataset=  comma-separated DATASETS keys (default all; exactly one for CSV)
+    ?output=   csv or ndjson (default ndjson)
+    ?gzip=true compress the stream
+    Returns (datasets, output, compress); raises ValueError for bad values.
+    """
+    output = params.get('output', 'ndjson')
+    if output not in FORMATS:
+        raise ValueError(f"output must be one of: {', '.join(FORMATS)}")
+    datasets = [name for name in params.get('dataset', '').split(',') if name] or list(DATASETS)
+    unknown = [name for name in datasets if name not in DATASETS]
+    if unknown:
+        raise ValueError(f"dataset must be one of: {', '.join(DATASETS)}")
+    datasets = list(dict.fromkeys(datasets))
+    if output == 'csv' and len(datasets) != 1:
+        raise ValueError('CSV exports take exactly one dataset')
+    return datasets, output, params.get('gzip') == 'true'
+
+
+def export_filename(datasets, output, compress, patient_id=None):
+    scope = f'patient-{patient_id}' if patient_id is not None else 'caseload'
+    name = f"export-{scope}-{datasets[0] if len(datasets) == 1 else 'all'}.{FORMATS[output][1]}"
+    return name + '.gz' if compress else name
@@ -0,0 +1,165 @@
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from PIL import Image, ImageOps, features
+
+from .models import Recipe, WeeklyUpdate, FoodLog
+from .conditional import touch
+from .storage import delete_released, sync_refs
+
+logger = logging.getLogger(__name__)
+
+# Image fields run through the pipeline; results land in each model's
+# `renditions` JSON keyed by field name
+IMAGE_FIELDS = {
+    WeeklyUpdate: ('photo_front', 'photo_side', 'photo_back'),
+    FoodLog: ('image',),
+    Recipe: ('image',),
+}
+
+# The re-encoded upload replaces the original and is bounded to MAX_EDGE;
+# the renditions are extra copies bounded to these longest edges
+MAX_EDGE = 2048
+RENDITIONS = {
+    'medium': 1080,
+    'small': 480,
+    'thumb': 160,
+}
+QUALITY = 82
+
+_executor = None
+
+
+def _output_format():
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def pending_fields(instance):
+    """Image fields whose current file hasn't been through the pipeline yet."""
+    renditions = instance.renditions or {}
+    return [
+        field for field in IMAGE_FIELDS[instance._meta.concrete_model]
+        if getattr(instance, field) and renditions.get(field, {}).get('source') != getattr(instance, field).name
+    ]
+
+
+def _encode(image, max_edge):
+    image = image.copy()
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    fmt, ext = _output_format()
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    # No exif/xmp arguments, so camera, device and GPS metadata are dropped
+    image.save(buffer, fmt, quality=QUALITY, icc_profile=image.info.get('icc_profile'))
+    return buffer.getvalue(), ext
+
+
+def _store(storage, directory, data, ext):
+    # ContentAddressedStorage names the file after its hash, so an unchanged
+    # rendition maps back onto the existing blob
+    return storage.save(posixpath.join(directory, f'rendition.{ext}'), ContentFile(data))
+
+
+def render_image(fieldfile):
+    """
+    Re-encode an uploaded image without metadata and build its renditions.
+    Returns (new file name, renditions entry).
+    """
+    storage = fieldfile.storage
+    directory = posixpath.dirname(fieldfile.name)
+    with storage.open(fieldfile.name, 'rb') as f, Image.open(f) as image:
+        # Let the JPEG decoder downscale while reading big phone photos
+        image.draft('RGB', (MAX_EDGE, MAX_EDGE))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        name = _store(storage, directory, *_encode(image, MAX_EDGE))
+        entry = {'source': name}
+        for label, edge in RENDITIONS.items():
+            entry[label] = _store(storage, directory, *_encode(image, edge))
+    return name, entry
+
+
+def process_images(instance):
+    """
+    Run every pending image field of `instance` through the pipeline and
+    save the results with a conditional update, so a file replaced in the
+    meantime is left for its own run. `instance` is updated in place.
+    """
+    model = instance._meta.concrete_model
+    renditions = dict(instance.renditions or {})
+    originals, updates = {}, {}
+    for field in pending_fields(instance):
+        fieldfile = getattr(instance, field)
+        originals[field] = fieldfile.name
+        try:
+            updates[field], renditions[field] = render_image(fieldfile)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            # Keep the upload as-is and don't retry it
+            logger.warning(f"Could not process {fieldfile.name}: {e}")
+            updates[field], renditions[field] = fieldfile.name, {'source': fieldfile.name}
+    if not updates:
+        return False
+
+    updated = model.objects.filter(pk=instance.pk, **originals).update(renditions=renditions, **updates, **touch(model))
+    if not updated:
+        return False
+
+    instance.renditions = renditions
+    for field, name in updates.items():
+        getattr(instance, field).name = name
+    sync_refs(instance)
+    # The raw upload still has its EXIF/GPS data, so it goes as soon as the
+    # re-encoded copy is committed rather than after the GC grace period
+    delete_released([name for field, name in originals.items() if updates[field] != name])
+    return True
+
+
+def _process_in_background(model, pk):
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None:
+            process_images(instance)
+    except Exception:
+        logger.exception(f"Image processing failed for {model.__name__} {pk}")
+    finally:
+        close_old_connections()
+
+
+def process_later(model, pk):
+    """
+    Hand large uploads to a small thread pool so the request returns
+    straight away. Anything lost to a restart is picked up by the
+    process_images command.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='images')
+    _executor.submit(_process_in_background, model, pk)
+
+
+def should_process_inline(instance, fields):
+    return sum(getattr(instance, field).size for field in fields) <= settings.IMAGE_SYNC_MAX_BYTES
+
+
+def rendition_urls(instance, build_url=None):
+    """{field: {label: url}} for the fields whose renditions are current."""
+    urls = {}
+    for field in IMAGE_FIELDS[instance._meta.concrete_model]:
+        fieldfile = getattr(instance, field)
+        entry = (instance.renditions or {}).get(field) or {}
+        if not fieldfile or entry.get('source') != fieldfile.name:
+            continue
+        urls[field] = {}
+        for label in RENDITIONS:
+            if label in entry:
+                url = fieldfile.storage.url(entry[label])
+                urls[field][label] = build_url(url) if build_url else url
+    return urls
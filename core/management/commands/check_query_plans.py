@@ -0,0 +1,84 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+from core import views
+from core.models import Message
+
+# Plan fragments that mean "read the whole table" or "sort after fetching"
+PLAN_PROBLEMS = {
+    'sqlite': [
+        (re.compile(r'\bSCAN (?!.*\bUSING\b)'), 'sequential scan'),
+        (re.compile(r'USE TEMP B-TREE FOR ORDER BY'), 'filesort'),
+    ],
+    'postgresql': [
+        (re.compile(r'\bSeq Scan\b'), 'sequential scan'),
+        (re.compile(r'(^|->)\s*(Incremental )?Sort\b'), 'filesort'),
+    ],
+}
+
+
+def view_queryset(view_class, user, **params):
+    """Build the queryset a list view would run for `user`."""
+    request = Request(RequestFactory().get('/', params))
+    request.user = user
+    view = view_class(request=request, args=(), kwargs={}, format_kwarg=None)
+    return view.get_queryset()
+
+
+def hot_paths(user, other):
+    return [
+        ('food logs', view_queryset(views.FoodLogViewSet, user)),
+        ('weekly updates', view_queryset(views.WeeklyUpdateView, user)),
+        ('lab results', view_queryset(views.LabResultViewSet, user)),
+        ('meal plans', view_queryset(views.MealPlanListView, user)),
+        ('message inbox', view_queryset(views.MessageViewSet, user, folder='inbox')),
+        ('message sent', view_queryset(views.MessageViewSet, user, folder='sent')),
+        ('conversation', Message.objects.filter(sender=other, recipient=user).order_by('-timestamp')),
+        ('unread messages', Message.objects.filter(recipient=user, sender=other, is_read=False)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN on the hot list-view queries and fails if any is not index-backed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to build querysets for (defaults to the first user)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every query plan')
+
+    def handle(self, *args, **options):
+        checks = PLAN_PROBLEMS.get(connection.vendor)
+        if checks is None:
+            raise CommandError(f"Query plan checks are not supported on '{connection.vendor}'")
+
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('No user found to build querysets for')
+        other = User.objects.exclude(id=user.id).order_by('id').first() or user
+
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small tables make seq scans look cheap; ask whether an index *can* serve the query
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                    cursor.execute('SET LOCAL enable_sort = off')
+
+            for label, queryset in hot_paths(user, other):
+                plan = queryset.explain()
+                problems = sorted({name for pattern, name in checks for line in plan.splitlines() if pattern.search(line)})
+                if options['verbose_plans'] or problems:
+                    self.stdout.write(f'{label}:\n{plan}\n')
+                if problems:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(f"{label}: {', '.join(problems)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'{label}: index-backed'))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot path(s) not index-backed: {', '.join(failures)}")
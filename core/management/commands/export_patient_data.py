@@ -0,0 +1,38 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from core import export
+
+
+class Command(BaseCommand):
+    help = "Streams a patient's or a nutritionist's caseload data as CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nutritionist', type=int, help="Export this nutritionist's caseload (and their notes)")
+        parser.add_argument('--patient', type=int, help='Export a single patient')
+        parser.add_argument('--dataset', default='', help=f"Comma-separated: {', '.join(export.DATASETS)} (default all)")
+        parser.add_argument('--output-format', choices=list(export.FORMATS), default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output')
+        parser.add_argument('--output', help='File to write (default stdout)')
+
+    def handle(self, *args, **options):
+        if options['nutritionist'] is None and options['patient'] is None:
+            raise CommandError('Pass --nutritionist, --patient or both')
+        try:
+            datasets, output, _ = export.parse_export_params({
+                'dataset': options['dataset'], 'output': options['output_format'],
+            })
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = export.export_chunks(datasets, output, options['nutritionist'], options['patient'])
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for data in export.encode_chunks(chunks, options['gzip']):
+                    f.write(data)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        elif options['gzip']:
+            for data in export.encode_chunks(chunks, compress=True):
+                sys.stdout.buffer.write(data)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
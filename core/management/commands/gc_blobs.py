@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from core.models import Blob
+from core.storage import GC_GRACE_PERIOD, collect_garbage, count_references
+
+
+class Command(BaseCommand):
+    help = f'Deletes media blobs that have had no references for {GC_GRACE_PERIOD}'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true', help='Rebuild reference counts from the tables first')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            counts = count_references()
+            fixed = 0
+            for blob in Blob.objects.only('id', 'name', 'ref_count').iterator():
+                if blob.ref_count != counts.get(blob.name, 0):
+                    # Relative to the stored value so concurrent saves aren't lost
+                    Blob.objects.filter(id=blob.id).update(ref_count=F('ref_count') - blob.ref_count + counts.get(blob.name, 0))
+                    fixed += 1
+            self.stdout.write(f'Corrected {fixed} reference counts')
+
+        deleted, freed = collect_garbage(dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} blobs ({freed / 1024 / 1024:.1f} MiB)'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.catalog import IMPORT_BATCH_SIZE, INPUT_FORMATS, detect_format, import_catalog
+
+
+class Command(BaseCommand):
+    help = 'Upserts recipes and meal plan templates from a JSON, NDJSON or CSV catalog, keyed on catalog_key'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--input-format', choices=sorted(set(INPUT_FORMATS.values())), help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and count without writing')
+
+    def handle(self, *args, **options):
+        try:
+            input_format = options['input_format'] or detect_format(options['path'])
+            with open(options['path'], encoding='utf-8', newline='') as f:
+                report = import_catalog(f, input_format, options['batch_size'], options['dry_run'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report['error_details']:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['error']}"))
+        if report['errors'] > len(report['error_details']):
+            self.stdout.write(self.style.WARNING(f"... {report['errors'] - len(report['error_details'])} more errors"))
+        recipes, templates = report['recipes'], report['templates']
+        verb = 'Validated' if report['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['rows']} rows in {report['seconds']:.1f}s ({report['rows_per_second'] or 0} rows/s): "
+            f"recipes {recipes['created']} created, {recipes['updated']} updated; "
+            f"templates {templates['created']} created, {templates['updated']} updated; "
+            f"{report['errors']} errors"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from core.images import IMAGE_FIELDS, pending_fields, process_images
+
+
+class Command(BaseCommand):
+    help = 'Strips metadata and builds renditions for images that have not been processed yet'
+
+    def handle(self, *args, **options):
+        for model, fields in IMAGE_FIELDS.items():
+            has_image = Q()
+            for field in fields:
+                has_image |= Q(**{f'{field}__gt': ''})
+            processed = 0
+            for instance in model.objects.filter(has_image).iterator(chunk_size=200):
+                if pending_fields(instance) and process_images(instance):
+                    processed += 1
+            self.stdout.write(self.style.SUCCESS(f'{model.__name__}: processed {processed}'))
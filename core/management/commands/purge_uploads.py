@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from core.uploads import STALE_UPLOAD_AFTER, purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = f'Deletes resumable uploads that have not been touched for {STALE_UPLOAD_AFTER}'
+
+    def handle(self, *args, **options):
+        count = purge_stale_uploads()
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} abandoned uploads'))
@@ -0,0 +1,36 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core import dietary
+from core.conditional import touch
+from core.models import Recipe, RecipeIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-parses recipe ingredient names and recomputes their allergen flags, '
+        'for when the parsing rules or the core.dietary tables change'
+    )
+
+    def handle(self, *args, **options):
+        stored = defaultdict(set)
+        for recipe_id, name in RecipeIngredient.objects.values_list('recipe_id', 'name').iterator(chunk_size=2000):
+            stored[recipe_id].add(name)
+
+        changed = 0
+        recipes = Recipe.objects.values_list('id', 'ingredients', 'allergen_flags')
+        for recipe_id, ingredients, flags in recipes.iterator(chunk_size=2000):
+            names = dietary.parse_ingredients(ingredients)
+            new_flags = dietary.ingredient_flags(names)
+            if set(names) == stored.get(recipe_id, set()) and new_flags == flags:
+                continue
+            with transaction.atomic():
+                RecipeIngredient.objects.filter(recipe_id=recipe_id).exclude(name__in=names).delete()
+                RecipeIngredient.objects.bulk_create(
+                    [RecipeIngredient(recipe_id=recipe_id, name=name) for name in names], ignore_conflicts=True,
+                )
+                # updated_at moves so recipe list ETags pick up the new allergens
+                Recipe.objects.filter(pk=recipe_id).update(allergen_flags=new_flags, **touch(Recipe))
+            changed += 1
+        self.stdout.write(self.style.SUCCESS(f'Reclassified {changed} recipes'))
@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from core.assignments import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Worker that processes queued bulk meal plan assignment jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when idle')
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'Job {job.id}: assigning {job.template.name} to {job.total} users')
+            started = time.monotonic()
+            try:
+                run_job(job)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Job {job.id} failed after {job.processed} users: {e}'))
+                continue
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(f'Job {job.id} done: {job.total} plans in {elapsed:.1f}s'))
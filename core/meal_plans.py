@@ -0,0 +1,82 @@
+from .conditional import touch
+from .models import Recipe
+
+MACRO_FIELDS = ('calories', 'protein_g', 'carbs_g', 'fat_g')
+
+
+def iter_plan_slots(structured_plan):
+    """
+    Yield (day, meal, recipe_id) for every slot of a structured plan
+    ({day: {meal: recipe_id}}) that references a recipe.
+    """
+    if not isinstance(structured_plan, dict):
+        return
+    for day, meals in structured_plan.items():
+        if not isinstance(meals, dict):
+            continue
+        for meal, recipe_id in meals.items():
+            if isinstance(recipe_id, bool):
+                continue
+            try:
+                yield day, meal, int(recipe_id)
+            except (TypeError, ValueError):
+                continue
+
+
+def plan_recipe_ids(structured_plans):
+    return {recipe_id for plan in structured_plans for _, _, recipe_id in iter_plan_slots(plan)}
+
+
+def load_plan_recipes(structured_plans, queryset=None):
+    """Fetch every recipe referenced by the given plans in one id__in query."""
+    recipe_ids = plan_recipe_ids(structured_plans)
+    if not recipe_ids:
+        return {}
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    return queryset.in_bulk(recipe_ids)
+
+
+def plan_macro_totals(structured_plan, recipe_map):
+    """Sum per-serving macros over every slot; unknown recipe ids are skipped."""
+    totals = dict.fromkeys(MACRO_FIELDS, 0)
+    for _, _, recipe_id in iter_plan_slots(structured_plan):
+        recipe = recipe_map.get(recipe_id)
+        if recipe is None:
+            continue
+        for field in MACRO_FIELDS:
+            totals[field] += getattr(recipe, field) or 0
+    return {field: round(value, 1) for field, value in totals.items()}
+
+
+def nutrition_summary(structured_plan, recipe_map):
+    """
+    Macro totals per day and for the whole plan, one serving per slot:
+    {'days': {day: {macro: value}}, 'total': {macro: value}}.
+    """
+    days = {}
+    total = dict.fromkeys(MACRO_FIELDS, 0)
+    for day, _, recipe_id in iter_plan_slots(structured_plan):
+        recipe = recipe_map.get(recipe_id)
+        if recipe is None:
+            continue
+        day_totals = days.setdefault(day, dict.fromkeys(MACRO_FIELDS, 0))
+        for field in MACRO_FIELDS:
+            value = getattr(recipe, field) or 0
+            day_totals[field] += value
+            total[field] += value
+    return {
+        'days': {day: {f: round(v, 1) for f, v in totals.items()} for day, totals in days.items()},
+        'total': {f: round(v, 1) for f, v in total.items()},
+    }
+
+
+def refresh_nutrition_summaries(model, plans):
+    """Recompute and store summaries for plans of `model` with one recipe query."""
+    plans = list(plans)
+    recipe_map = load_plan_recipes([plan.structured_plan for plan in plans])
+    stamp = touch(model)
+    for plan in plans:
+        plan.nutrition_summary = nutrition_summary(plan.structured_plan, recipe_map)
+        for field, value in stamp.items():
+            setattr(plan, field, value)
+    model.objects.bulk_update(plans, ['nutrition_summary', *stamp], batch_size=500)
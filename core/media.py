@@ -0,0 +1,216 @@
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .authentication import authenticate_token_request
+from .images import RENDITIONS
+from .models import WeeklyUpdate, FoodLog, LabResult, MealPlan
+from .streaming import for_server
+
+# Served to anyone
+PUBLIC_MEDIA_PREFIXES = ('recipes/',)
+
+# upload_to prefix -> (model, file fields). Files under these prefixes are
+# only served to the owning user, their nutritionist and staff.
+OWNED_MEDIA = {
+    'progress_photos/': (WeeklyUpdate, ('photo_front', 'photo_side', 'photo_back')),
+    'food_logs/': (FoodLog, ('image',)),
+    'lab_results/': (LabResult, ('file',)),
+    'meal_plans/': (MealPlan, ('file',)),
+}
+
+PUBLIC_MAX_AGE = 60 * 60 * 24
+PRIVATE_MAX_AGE = 60 * 60
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+RANGE_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Names written by core.images are content hashes
+CONTENT_HASHED_RE = re.compile(r'(^|/)[0-9a-f]{32}\.\w+$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def can_access_media(user, path):
+    if path.startswith(PUBLIC_MEDIA_PREFIXES):
+        return True
+    if user is None or not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    owners = Q(user_id=user.id)
+    profile = getattr(user, 'profile', None)
+    if profile is not None and profile.is_nutritionist:
+        owners |= Q(user__profile__nutritionist_id=user.id)
+
+    for prefix, (model, fields) in OWNED_MEDIA.items():
+        if path.startswith(prefix):
+            matches_file = Q()
+            for field in fields:
+                matches_file |= Q(**{field: path})
+                if hasattr(model, 'renditions'):
+                    for label in RENDITIONS:
+                        matches_file |= Q(**{f'renditions__{field}__{label}': path})
+            return model.objects.filter(matches_file, owners).exists()
+    # Anything else under MEDIA_ROOT is staff-only
+    return False
+
+
+def parse_range(header, size):
+    """
+    Return the (start, end) byte offsets (inclusive) requested by a single
+    `bytes=` range, or None when the header should be ignored and the whole
+    file served. Multi-range requests are ignored, which RFC 9110 allows.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(full_path, start, length):
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _content_type(path):
+    content_type, encoding = mimetypes.guess_type(path)
+    # Don't let browsers transparently decompress .gz downloads
+    return 'application/octet-stream' if encoding or not content_type else content_type
+
+
+def _accel_response(path, full_path):
+    """Authorization is done; let the proxy send the bytes, ranges and 304s."""
+    response = HttpResponse(content_type=_content_type(path))
+    if settings.MEDIA_ACCEL_HEADER.lower() == 'x-sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(path)
+    return response
+
+
+def _file_response(request, path, full_path, size, etag, last_modified):
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        # WSGI servers hand FileResponse to wsgi.file_wrapper (sendfile() where
+        # available). The ASGI handler has no such hook and would read a sync
+        # iterator whole, so there the file is sent block by block; set
+        # MEDIA_ACCEL_HEADER to have the proxy send it instead.
+        return for_server(request, FileResponse(open(full_path, 'rb'), content_type=_content_type(path)))
+
+    start, end = byte_range
+    response = for_server(request, StreamingHttpResponse(
+        _read_range(full_path, start, end - start + 1),
+        status=206,
+        content_type=_content_type(path),
+    ))
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with strong ETags, conditional requests and
+    single byte ranges. Patient uploads are only served to their owner,
+    the nutritionist they're assigned to and staff. Besides the JWT header and cookie, ?token= is
+    accepted because <img> tags can't send headers.
+    """
+    # Normalize first so 'recipes/../lab_results/x' can't pass as public
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+
+    public = path.startswith(PUBLIC_MEDIA_PREFIXES)
+    if not public:
+        # Session login covers the Django admin
+        user = authenticate_token_request(request) or request.user
+        if not user.is_authenticated:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        if not can_access_media(user, path):
+            # Don't reveal whether someone else's file exists
+            raise Http404
+
+    try:
+        st = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+
+    if settings.MEDIA_ACCEL_HEADER:
+        response = _accel_response(path, full_path)
+    else:
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        last_modified = int(st.st_mtime)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = _file_response(request, path, full_path, st.st_size, etag, last_modified)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+
+    if public:
+        cache_control = {'public': True, 'max_age': PUBLIC_MAX_AGE}
+    else:
+        cache_control = {'private': True, 'max_age': PRIVATE_MAX_AGE}
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+    if CONTENT_HASHED_RE.search(path):
+        cache_control.update(max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    patch_cache_control(response, **cache_control)
+    return response
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_alter_message_options_message_subject'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='foodlog',
+            index=models.Index(fields=['user', '-date', '-id'], name='foodlog_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labresult',
+            index=models.Index(fields=['user', '-uploaded_at', '-id'], name='labresult_user_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', '-start_date', '-id'], name='mealplan_user_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', '-timestamp'], name='message_recipient_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', '-timestamp'], name='message_sender_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', '-timestamp'], name='message_pair_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', 'sender'], name='message_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weeklyupdate',
+            index=models.Index(fields=['user', '-date', '-id'], name='weeklyupdate_user_date_idx'),
+        ),
+    ]
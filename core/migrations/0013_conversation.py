@@ -0,0 +1,62 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model('core', 'Message')
+    Conversation = apps.get_model('core', 'Conversation')
+
+    pairs = {
+        tuple(sorted(pair))
+        for pair in Message.objects.values_list('sender_id', 'recipient_id').distinct()
+    }
+    for user_a_id, user_b_id in pairs:
+        messages = Message.objects.filter(
+            models.Q(sender_id=user_a_id, recipient_id=user_b_id) |
+            models.Q(sender_id=user_b_id, recipient_id=user_a_id)
+        )
+        last = messages.order_by('-timestamp', '-id').first()
+        unread = messages.filter(is_read=False).aggregate(
+            unread_a=models.Count('id', filter=models.Q(recipient_id=user_a_id)),
+            unread_b=models.Count('id', filter=models.Q(recipient_id=user_b_id)),
+        )
+        Conversation.objects.create(
+            user_a_id=user_a_id,
+            user_b_id=user_b_id,
+            last_message=last,
+            last_message_preview=last.content[:200],
+            last_message_at=last.timestamp,
+            **unread,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_preview', models.CharField(blank=True, max_length=200)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_a', models.PositiveIntegerField(default=0, help_text='Unread messages addressed to user_a')),
+                ('unread_b', models.PositiveIntegerField(default=0, help_text='Unread messages addressed to user_b')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.message')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_a', '-last_message_at'], name='conversation_a_recent_idx'), models.Index(fields=['user_b', '-last_message_at'], name='conversation_b_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user_a', 'user_b'), name='conversation_pair_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:07
+
+from django.db import migrations, models
+
+# Frozen copy of core.meal_plans as of this migration
+MACRO_FIELDS = ('calories', 'protein_g', 'carbs_g', 'fat_g')
+
+
+def iter_plan_slots(structured_plan):
+    if not isinstance(structured_plan, dict):
+        return
+    for day, meals in structured_plan.items():
+        if not isinstance(meals, dict):
+            continue
+        for meal, recipe_id in meals.items():
+            if isinstance(recipe_id, bool):
+                continue
+            try:
+                yield day, meal, int(recipe_id)
+            except (TypeError, ValueError):
+                continue
+
+
+def nutrition_summary(structured_plan, recipe_map):
+    days = {}
+    total = dict.fromkeys(MACRO_FIELDS, 0)
+    for day, _, recipe_id in iter_plan_slots(structured_plan):
+        recipe = recipe_map.get(recipe_id)
+        if recipe is None:
+            continue
+        day_totals = days.setdefault(day, dict.fromkeys(MACRO_FIELDS, 0))
+        for field in MACRO_FIELDS:
+            value = getattr(recipe, field) or 0
+            day_totals[field] += value
+            total[field] += value
+    return {
+        'days': {day: {f: round(v, 1) for f, v in totals.items()} for day, totals in days.items()},
+        'total': {f: round(v, 1) for f, v in total.items()},
+    }
+
+
+def backfill_nutrition_summaries(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name in ('MealPlan', 'MealPlanTemplate'):
+        model = apps.get_model('core', model_name)
+        for plan in model.objects.iterator(chunk_size=500):
+            recipe_ids = {recipe_id for _, _, recipe_id in iter_plan_slots(plan.structured_plan)}
+            recipe_map = Recipe.objects.in_bulk(recipe_ids) if recipe_ids else {}
+            plan.nutrition_summary = nutrition_summary(plan.structured_plan, recipe_map)
+            plan.save(update_fields=['nutrition_summary'])
+            plan.recipes.set(list(recipe_map))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplan',
+            name='nutrition_summary',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='recipes',
+            field=models.ManyToManyField(blank=True, editable=False, help_text='Recipes referenced by structured_plan', related_name='meal_plans', to='core.recipe'),
+        ),
+        migrations.AddField(
+            model_name='mealplantemplate',
+            name='nutrition_summary',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='mealplantemplate',
+            name='recipes',
+            field=models.ManyToManyField(blank=True, editable=False, help_text='Recipes referenced by structured_plan', related_name='meal_plan_templates', to='core.recipe'),
+        ),
+        migrations.RunPython(backfill_nutrition_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:22
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+# Frozen copy of core.recipe_search as of this migration
+SEARCH_FIELDS = (('title', 'A'), ('tags', 'B'), ('ingredients', 'C'), ('instructions', 'D'))
+
+
+def parse_tags(text):
+    names = {}
+    for tag in (text or '').split(','):
+        tag = ' '.join(tag.split()).lower()[:50]
+        if tag:
+            names[tag] = None
+    return list(names)
+
+
+def search_vector():
+    vector = None
+    for field, weight in SEARCH_FIELDS:
+        part = SearchVector(field, weight=weight, config='english')
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def backfill_search(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    Tag = apps.get_model('core', 'Tag')
+    for recipe in Recipe.objects.iterator(chunk_size=500):
+        names = parse_tags(recipe.tags)
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        recipe.tag_set.set(Tag.objects.filter(name__in=names))
+    if schema_editor.connection.vendor == 'postgresql':
+        Recipe.objects.update(search_vector=search_vector())
+
+
+def create_search_index(apps, schema_editor):
+    # GIN is PostgreSQL-only; SQLite searches with core.recipe_search.InvertedIndex
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX recipe_search_vector_idx ON core_recipe USING gin (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='recipes', to='core.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['calories'], name='recipe_calories_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['protein_g'], name='recipe_protein_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['carbs_g'], name='recipe_carbs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['fat_g'], name='recipe_fat_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:26
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of core.dietary as of this migration; later changes to the
+# tables reach stored flags through the reclassify_recipes command
+GLUTEN, DAIRY, EGG, PEANUT, TREE_NUT, SOY, FISH, SHELLFISH, SESAME, MEAT, HONEY = (1 << i for i in range(11))
+
+_KEYWORDS = {
+    GLUTEN: 'gluten wheat flour bread breadcrumb pasta spaghetti macaroni noodle barley rye couscous bulgur semolina tortilla seitan cracker',
+    DAIRY: 'dairy lactose milk cheese butter cream yogurt yoghurt ghee parmesan mozzarella feta ricotta cheddar whey',
+    EGG: 'egg mayonnaise mayo meringue',
+    PEANUT: 'peanut',
+    TREE_NUT: 'almond walnut cashew pecan pistachio hazelnut macadamia',
+    SOY: 'soy soya tofu tempeh edamame miso',
+    FISH: 'fish salmon tuna cod anchovy sardine trout mackerel tilapia halibut',
+    SHELLFISH: 'shellfish shrimp prawn crab lobster mussel clam oyster scallop',
+    SESAME: 'sesame tahini',
+    MEAT: 'meat chicken beef pork lamb turkey bacon ham sausage veal duck prosciutto salami gelatin',
+    HONEY: 'honey',
+}
+KEYWORD_FLAGS = {word: flag for flag, words in _KEYWORDS.items() for word in words.split()}
+KEYWORD_FLAGS.update({'nut': PEANUT | TREE_NUT, 'seafood': FISH | SHELLFISH})
+
+PHRASE_FLAGS = {
+    'almond milk': TREE_NUT,
+    'almond butter': TREE_NUT,
+    'cashew milk': TREE_NUT,
+    'coconut milk': 0,
+    'coconut cream': 0,
+    'oat milk': 0,
+    'rice milk': 0,
+    'soy milk': SOY,
+    'peanut butter': PEANUT,
+    'cocoa butter': 0,
+    'cream of tartar': 0,
+    'soy sauce': SOY | GLUTEN,
+}
+FREE_OF = {
+    'gluten free': GLUTEN,
+    'dairy free': DAIRY,
+    'lactose free': DAIRY,
+    'egg free': EGG,
+    'vegan': DAIRY | EGG | MEAT | HONEY,
+}
+
+UNITS = frozenset(
+    'g kg mg ml l oz lb lbs cup tbsp tsp tablespoon teaspoon pinch handful clove slice can '
+    'piece bunch dash scoop sprig large small medium of x'.split()
+)
+TOKEN_RE = re.compile(r'[a-z]+|\d[\d./]*[a-z]*')
+PARENTHETICAL_RE = re.compile(r'\([^)]*\)')
+
+
+def _singular(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('oes', 'ches', 'shes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient(line):
+    line = PARENTHETICAL_RE.sub(' ', line.lower().replace('-', ' '))
+    line = line.split(',')[0]
+    words = [
+        _singular(word) for word in TOKEN_RE.findall(line)
+        if not word[0].isdigit() and word not in UNITS
+    ]
+    return ' '.join(words)[:100]
+
+
+def parse_ingredients(text):
+    names = {}
+    for line in (text or '').splitlines():
+        name = normalize_ingredient(line)
+        if name:
+            names[name] = None
+    return list(names)
+
+
+def _contains(words, phrase):
+    phrase = phrase.split()
+    return any(words[i:i + len(phrase)] == phrase for i in range(len(words) - len(phrase) + 1))
+
+
+def classify(name):
+    words = name.split()
+    flags = 0
+    consumed = set()
+    for phrase, phrase_flags in PHRASE_FLAGS.items():
+        if _contains(words, phrase):
+            flags |= phrase_flags
+            consumed.update(phrase.split())
+    for word in words:
+        if word not in consumed:
+            flags |= KEYWORD_FLAGS.get(word, 0)
+    for qualifier, cancelled in FREE_OF.items():
+        if _contains(words, qualifier):
+            flags &= ~cancelled
+    return flags
+
+
+def ingredient_flags(names):
+    flags = 0
+    for name in names:
+        flags |= classify(name)
+    return flags
+
+
+def backfill_ingredients(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeIngredient = apps.get_model('core', 'RecipeIngredient')
+    for recipe in Recipe.objects.only('id', 'ingredients').iterator(chunk_size=500):
+        names = parse_ingredients(recipe.ingredients)
+        RecipeIngredient.objects.bulk_create([RecipeIngredient(recipe_id=recipe.id, name=name) for name in names])
+        Recipe.objects.filter(pk=recipe.pk).update(allergen_flags=ingredient_flags(names))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='allergen_flags',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_set', to='core.recipe')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'name'), name='recipe_ingredient_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_ingredients, migrations.RunPython.noop),
+    ]
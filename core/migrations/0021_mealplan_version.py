@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_recipe_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplan',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
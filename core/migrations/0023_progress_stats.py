@@ -0,0 +1,64 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:37
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of core.social.apply_update as of this migration
+STREAK_GAP = timedelta(days=10)
+
+
+def apply_update(stats, day, weight):
+    if stats.last_update_date is not None and day - stats.last_update_date <= STREAK_GAP:
+        stats.streak += 1
+    else:
+        stats.streak = 1
+    stats.best_streak = max(stats.best_streak, stats.streak)
+
+    month = day.replace(day=1)
+    if stats.month != month:
+        stats.month = month
+        stats.month_start_weight = stats.latest_weight if stats.latest_weight is not None else weight
+    stats.latest_weight = weight
+    stats.last_update_date = day
+
+
+def backfill_stats(apps, schema_editor):
+    WeeklyUpdate = apps.get_model('core', 'WeeklyUpdate')
+    ProgressStats = apps.get_model('core', 'ProgressStats')
+    stats = {}
+    rows = WeeklyUpdate.objects.order_by('user_id', 'date', 'id').values_list('user_id', 'date', 'current_weight')
+    for user_id, day, weight in rows.iterator():
+        if user_id not in stats:
+            stats[user_id] = ProgressStats(user_id=user_id)
+        apply_update(stats[user_id], day, weight)
+    ProgressStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0022_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_update_date', models.DateField()),
+                ('latest_weight', models.FloatField()),
+                ('streak', models.PositiveIntegerField(default=0)),
+                ('best_streak', models.PositiveIntegerField(default=0)),
+                ('month', models.DateField()),
+                ('month_start_weight', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month'], name='progressstats_month_idx'), models.Index(fields=['-best_streak'], name='progressstats_streak_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_caseloads(apps, schema_editor):
+    """
+    Give existing patients the nutritionist who last wrote a note about
+    them, or the only nutritionist when there is just one. Anyone left is
+    assigned in the admin.
+    """
+    Profile = apps.get_model('core', 'Profile')
+    NutritionistNote = apps.get_model('core', 'NutritionistNote')
+    nutritionist_ids = list(Profile.objects.filter(is_nutritionist=True).values_list('user_id', flat=True)[:2])
+    sole = nutritionist_ids[0] if len(nutritionist_ids) == 1 else None
+
+    latest_author = {}
+    for patient_id, author_id in NutritionistNote.objects.order_by('created_at').values_list('patient_id', 'nutritionist_id'):
+        latest_author[patient_id] = author_id
+    patients = Profile.objects.filter(is_nutritionist=False, user__is_staff=False, nutritionist__isnull=True)
+    for profile in patients.only('id', 'user_id').iterator():
+        nutritionist_id = latest_author.get(profile.user_id, sole)
+        if nutritionist_id is not None:
+            Profile.objects.filter(pk=profile.pk).update(nutritionist_id=nutritionist_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_progress_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='nutritionist',
+            field=models.ForeignKey(blank=True, db_index=False, limit_choices_to={'profile__is_nutritionist': True}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='caseload', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['nutritionist', 'is_approved'], name='profile_caseload_idx'),
+        ),
+        migrations.RunPython(assign_caseloads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_profile_nutritionist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplantemplate',
+            name='catalog_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='catalog_key',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_catalog_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='foodlog',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='foodlog_user_created_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from ckeditor.fields import RichTextField
+from django.contrib.postgres.search import SearchVectorField
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -12,6 +14,20 @@ class Profile(models.Model):
     allergies = models.TextField(blank=True)
     is_approved = models.BooleanField(default=False)
     is_nutritionist = models.BooleanField(default=False)
+    # The nutritionist whose caseload this patient belongs to; unassigned
+    # pending patients are open to any nutritionist to approve and claim
+    nutritionist = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='caseload',
+        # Covered by profile_caseload_idx
+        db_index=False,
+        limit_choices_to={'profile__is_nutritionist': True},
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['nutritionist', 'is_approved'], name='profile_caseload_idx'),
+        ]
 
     def __str__(self):
         try:
@@ -21,9 +37,20 @@ class Profile(models.Model):
             pass
         return f"Orphaned Profile (ID: {self.id})"
 
+class Tag(models.Model):
+    """Normalized (lowercased) recipe tag, kept in sync with Recipe.tags."""
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.name
+
 class Recipe(models.Model):
     title = models.CharField(max_length=200)
+    # Stable id from an imported catalog; the upsert key for core.catalog
+    catalog_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
     image = models.ImageField(upload_to='recipes/', blank=True, null=True)
+    # Filled in by core.images: {'image': {'source': ..., 'thumb': ..., ...}}
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     prep_time_minutes = models.IntegerField(help_text="Preparation time in minutes")
     cook_time_minutes = models.IntegerField(help_text="Cooking time in minutes", null=True, blank=True)
     servings = models.IntegerField(default=1)
@@ -37,12 +64,40 @@ class Recipe(models.Model):
     ingredients = models.TextField(help_text="List of ingredients, one per line")
     instructions = models.TextField(help_text="Step-by-step instructions")
     tags = models.CharField(max_length=500, blank=True, help_text="Comma-separated tags (e.g., Vegan, Keto, Gluten-Free)")
+    # Derived from `tags` on save, for indexed tag filters
+    tag_set = models.ManyToManyField(Tag, related_name='recipes', blank=True, editable=False)
+    # Maintained on PostgreSQL only (GIN-indexed); see core.recipe_search
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Bitmask of core.dietary allergen classes, derived from `ingredients` on save
+    allergen_flags = models.PositiveIntegerField(default=0, db_index=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['calories'], name='recipe_calories_idx'),
+            models.Index(fields=['protein_g'], name='recipe_protein_idx'),
+            models.Index(fields=['carbs_g'], name='recipe_carbs_idx'),
+            models.Index(fields=['fat_g'], name='recipe_fat_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+class RecipeIngredient(models.Model):
+    """Canonical ingredient name parsed from one line of Recipe.ingredients."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='ingredient_set')
+    name = models.CharField(max_length=100, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'name'], name='recipe_ingredient_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
 class MealPlan(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meal_plans')
     start_date = models.DateField()
@@ -51,7 +106,18 @@ class MealPlan(models.Model):
     # Structured plan: { "Monday": { "Breakfast": recipe_id, "Lunch": ... } }
     structured_plan = models.JSONField(blank=True, null=True, help_text="JSON structure of the weekly plan")
     file = models.FileField(upload_to='meal_plans/', blank=True, null=True, help_text="PDF or image file of the meal plan")
+    # Per-day and whole-plan macro totals, maintained from structured_plan by signals
+    nutrition_summary = models.JSONField(blank=True, null=True, editable=False)
+    recipes = models.ManyToManyField(Recipe, blank=True, editable=False, related_name='meal_plans', help_text="Recipes referenced by structured_plan")
+    # Bumped on every save and when a referenced recipe changes; keys derived caches
+    version = models.PositiveIntegerField(default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-start_date', '-id'], name='mealplan_user_start_idx'),
+        ]
 
     def __str__(self):
         return f"Meal Plan for {self.user.username} ({self.start_date} to {self.end_date})"
@@ -71,10 +137,37 @@ class WeeklyUpdate(models.Model):
     photo_front = models.ImageField(upload_to='progress_photos/', blank=True, null=True)
     photo_side = models.ImageField(upload_to='progress_photos/', blank=True, null=True)
     photo_back = models.ImageField(upload_to='progress_photos/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='weeklyupdate_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"Update by {self.user.username} on {self.date}"
 
+class ProgressStats(models.Model):
+    """Per-user leaderboard figures, folded in from each WeeklyUpdate by core.social."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='progress_stats')
+    last_update_date = models.DateField()
+    latest_weight = models.FloatField()
+    # Consecutive weekly updates ending at last_update_date, and the longest run
+    streak = models.PositiveIntegerField(default=0)
+    best_streak = models.PositiveIntegerField(default=0)
+    # Calendar month of the latest update and the weight it is measured from
+    month = models.DateField()
+    month_start_weight = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['month'], name='progressstats_month_idx'),
+            models.Index(fields=['-best_streak'], name='progressstats_streak_idx'),
+        ]
+
+    def __str__(self):
+        return f"Progress stats for {self.user_id}"
+
 class FoodLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='food_logs')
     date = models.DateField()
@@ -86,11 +179,17 @@ class FoodLog(models.Model):
     ])
     content = models.TextField(help_text="Description of food consumed")
     image = models.ImageField(upload_to='food_logs/', blank=True, null=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "Food Journal Entry"
         verbose_name_plural = "Food Journal"
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='foodlog_user_date_idx'),
+            # Recent activity pages by creation time
+            models.Index(fields=['user', '-created_at', '-id'], name='foodlog_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.meal_type} - {self.date}"
@@ -105,10 +204,119 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Inbox / sent folders
+            models.Index(fields=['recipient', '-timestamp'], name='message_recipient_ts_idx'),
+            models.Index(fields=['sender', '-timestamp'], name='message_sender_ts_idx'),
+            # One direction of a conversation
+            models.Index(fields=['sender', 'recipient', '-timestamp'], name='message_pair_ts_idx'),
+            # Unread badge and mark-as-read only ever touch unread rows
+            models.Index(
+                fields=['recipient', 'sender'],
+                condition=models.Q(is_read=False),
+                name='message_unread_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} to {self.recipient.username} at {self.timestamp}"
 
+class Conversation(models.Model):
+    """
+    Denormalized summary of the messages exchanged between two users, kept in
+    step with Message writes so the inbox and unread badge read one row per
+    conversation instead of scanning Message. user_a always holds the lower
+    user id.
+    """
+    PREVIEW_LENGTH = 200
+
+    user_a = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_b = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_a = models.PositiveIntegerField(default=0, help_text="Unread messages addressed to user_a")
+    unread_b = models.PositiveIntegerField(default=0, help_text="Unread messages addressed to user_b")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_a', 'user_b'], name='conversation_pair_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user_a', '-last_message_at'], name='conversation_a_recent_idx'),
+            models.Index(fields=['user_b', '-last_message_at'], name='conversation_b_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_a_id} and {self.user_b_id}"
+
+    @staticmethod
+    def pair(first_id, second_id):
+        return tuple(sorted((first_id, second_id)))
+
+    def other_participant(self, user):
+        return self.user_b if self.user_a_id == user.id else self.user_a
+
+    def unread_for(self, user):
+        return self.unread_a if self.user_a_id == user.id else self.unread_b
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.objects.filter(models.Q(user_a=user) | models.Q(user_b=user))
+
+    @classmethod
+    def record_message(cls, message):
+        """Fold a newly created message into its conversation summary."""
+        user_a_id, user_b_id = cls.pair(message.sender_id, message.recipient_id)
+        with transaction.atomic():
+            conversation, _ = cls.objects.select_for_update().get_or_create(
+                user_a_id=user_a_id, user_b_id=user_b_id
+            )
+            conversation.last_message = message
+            conversation.last_message_preview = message.content[:cls.PREVIEW_LENGTH]
+            conversation.last_message_at = message.timestamp
+            if not message.is_read:
+                unread_field = 'unread_a' if message.recipient_id == user_a_id else 'unread_b'
+                setattr(conversation, unread_field, models.F(unread_field) + 1)
+            conversation.save()
+
+    @classmethod
+    def mark_read(cls, reader, other_username=None):
+        """Zero the reader's unread counters, optionally for one partner only."""
+        as_a = cls.objects.filter(user_a=reader)
+        as_b = cls.objects.filter(user_b=reader)
+        if other_username is not None:
+            as_a = as_a.filter(user_b__username=other_username)
+            as_b = as_b.filter(user_a__username=other_username)
+        as_a.update(unread_a=0)
+        as_b.update(unread_b=0)
+
+    @classmethod
+    def rebuild(cls, first_id, second_id):
+        """Recompute one summary from Message, e.g. after a delete or an admin edit."""
+        user_a_id, user_b_id = cls.pair(first_id, second_id)
+        messages = Message.objects.filter(
+            models.Q(sender_id=user_a_id, recipient_id=user_b_id) |
+            models.Q(sender_id=user_b_id, recipient_id=user_a_id)
+        )
+        last = messages.order_by('-timestamp', '-id').first()
+        if last is None:
+            cls.objects.filter(user_a_id=user_a_id, user_b_id=user_b_id).delete()
+            return
+        unread = messages.filter(is_read=False).aggregate(
+            unread_a=models.Count('id', filter=models.Q(recipient_id=user_a_id)),
+            unread_b=models.Count('id', filter=models.Q(recipient_id=user_b_id)),
+        )
+        cls.objects.update_or_create(
+            user_a_id=user_a_id, user_b_id=user_b_id,
+            defaults={
+                'last_message': last,
+                'last_message_preview': last.content[:cls.PREVIEW_LENGTH],
+                'last_message_at': last.timestamp,
+                **unread,
+            },
+        )
+
 class LabResult(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lab_results')
     title = models.CharField(max_length=200)
@@ -116,19 +324,103 @@ class LabResult(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     description = models.TextField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-uploaded_at', '-id'], name='labresult_user_uploaded_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
 class MealPlanTemplate(models.Model):
     name = models.CharField(max_length=200)
+    catalog_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
     description = models.TextField(blank=True)
     content = RichTextField(blank=True, null=True)
     structured_plan = models.JSONField(blank=True, null=True, help_text="JSON structure of the template")
+    nutrition_summary = models.JSONField(blank=True, null=True, editable=False)
+    recipes = models.ManyToManyField(Recipe, blank=True, editable=False, related_name='meal_plan_templates', help_text="Recipes referenced by structured_plan")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.name
 
+class BulkAssignmentJob(models.Model):
+    """
+    Database-backed job for assigning a template to more patients than fit
+    comfortably in one request. Picked up by the run_assignment_jobs worker;
+    `processed` doubles as the resume offset if a worker dies mid-job.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    template = models.ForeignKey(MealPlanTemplate, on_delete=models.CASCADE, related_name='assignment_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assignment_jobs')
+    start_date = models.DateField()
+    user_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='assignmentjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Assign {self.template.name} to {self.total} users ({self.status})"
+
+class Blob(models.Model):
+    """
+    A file in content-addressed media storage (core.storage). ref_count is
+    the number of file fields and renditions pointing at it; gc_blobs
+    deletes blobs that have stayed unreferenced.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever the same content is uploaded again
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at'], name='blob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+class UploadSession(models.Model):
+    """
+    A resumable upload in progress. Chunks are appended to a part file in
+    CHUNKED_UPLOAD_DIR; `received` is the next expected byte offset.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size}) by {self.user_id}"
+
 class NutritionistNote(models.Model):
     nutritionist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notes_created')
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='nutritionist_notes')
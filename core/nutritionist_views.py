@@ -1,66 +1,147 @@
+import base64
+import json
+from datetime import time, timezone as dt_timezone
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from django.db.models import Q, Prefetch
-from .models import Profile, MealPlan, WeeklyUpdate, FoodLog, LabResult, Recipe, MealPlanTemplate, NutritionistNote
+from django.http import StreamingHttpResponse
+from django.db.models import Q, F, Value, Prefetch, Subquery, CharField, FloatField, DateField, DateTimeField
+from django.db.models.functions import Cast, Substr
+from django.utils.dateparse import parse_datetime
+from .models import Profile, MealPlan, WeeklyUpdate, FoodLog, LabResult, Recipe, MealPlanTemplate, NutritionistNote, BulkAssignmentJob
 from .serializers import (
     UserSerializer, ProfileSerializer, MealPlanSerializer, 
     WeeklyUpdateSerializer, FoodLogSerializer, LabResultSerializer,
-    MealPlanTemplateSerializer, NutritionistNoteSerializer
+    MealPlanTemplateSerializer, NutritionistNoteSerializer,
+    TemplateAssignmentSerializer, BulkAssignmentJobSerializer, PatientListSerializer
 )
 from .permissions import IsNutritionist
+from .dashboard import get_dashboard_stats
+from .patients import annotate_patients, caseload, filter_patients, reachable
+from .assignments import assign_or_queue
+from . import export, timeseries
+from .streaming import for_server
+
+ACTIVITY_COLUMNS = (
+    'activity_type', 'object_id', 'patient_id', 'patient',
+    'headline', 'detail', 'weight', 'timestamp', 'day',
+)
+
+
+def activity_columns(activity_type, **columns):
+    """Annotations for one branch of the activity UNION, in ACTIVITY_COLUMNS order."""
+    defaults = {
+        'activity_type': Value(activity_type, output_field=CharField()),
+        'object_id': F('id'),
+        'patient_id': F('user_id'),
+        'patient': F('user__username'),
+        'headline': Value('', output_field=CharField()),
+        'detail': Value('', output_field=CharField()),
+        'weight': Value(None, output_field=FloatField()),
+    }
+    return {name: columns.get(name, defaults.get(name)) for name in ACTIVITY_COLUMNS}
 
 
 class NutritionistPatientListView(generics.ListAPIView):
     """
-    List all patients (non-nutritionist users) for the nutritionist.
+    List the nutritionist's approved patients (their caseload), with
+    their latest activity, weight, running plan and unread message count
+    computed in the same statement. See patients.filter_patients for the
+    filter and ordering parameters.
     """
-    serializer_class = UserSerializer
+    serializer_class = PatientListSerializer
     permission_classes = [IsNutritionist]
 
     def get_queryset(self):
-        # Return all users who are not nutritionists and not staff
-        return User.objects.filter(
-            profile__is_nutritionist=False,
-            profile__is_approved=True,
-            is_staff=False
+        queryset = caseload(self.request.user.id).filter(
+            profile__is_approved=True
         ).select_related('profile').order_by('username')
+        return annotate_patients(queryset, self.request.user.id)
+
+    def list(self, request, *args, **kwargs):
+        try:
+            queryset = filter_patients(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
 
 
 class NutritionistPendingPatientsListView(generics.ListAPIView):
     """
-    List all pending (unapproved) patients for the nutritionist.
+    List pending (unapproved) patients assigned to the nutritionist or not
+    yet assigned to anyone.
     """
     serializer_class = UserSerializer
     permission_classes = [IsNutritionist]
 
     def get_queryset(self):
-        return User.objects.filter(
-            profile__is_nutritionist=False,
-            profile__is_approved=False,
-            is_staff=False
+        return reachable(self.request.user.id).filter(
+            profile__is_approved=False
         ).select_related('profile').order_by('-date_joined')
 
 
 class ApprovePatientView(APIView):
     """
-    Approve a pending patient.
+    Approve a pending patient. Approving an unassigned patient adds them to
+    the nutritionist's caseload.
     """
     permission_classes = [IsNutritionist]
 
     def post(self, request, patient_id):
         try:
-            patient = User.objects.get(id=patient_id, profile__is_nutritionist=False)
+            patient = reachable(request.user.id).select_related('profile').get(id=patient_id)
             profile = patient.profile
             profile.is_approved = True
+            if profile.nutritionist_id is None:
+                profile.nutritionist = request.user
             profile.save()
             return Response({'status': 'Patient approved successfully'}, status=status.HTTP_200_OK)
         except User.DoesNotExist:
             return Response({'error': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+# (relation, serializer, ordering) for the histories embedded in patient payloads
+PATIENT_HISTORIES = (
+    ('meal_plans', MealPlanSerializer, ('-start_date', '-id')),
+    ('weekly_updates', WeeklyUpdateSerializer, ('-date', '-id')),
+    ('food_logs', FoodLogSerializer, ('-date', '-id')),
+    ('lab_results', LabResultSerializer, ('-uploaded_at', '-id')),
+)
+# Rows per relation; older rows are paged through NutritionistPatientHistoryView
+DETAIL_LIMITS = {'meal_plans': 10, 'weekly_updates': 10, 'food_logs': 20, 'lab_results': 10}
+SUMMARY_LIMITS = {'meal_plans': 1, 'weekly_updates': 3, 'food_logs': 5, 'lab_results': 3}
+MAX_BATCH_PATIENTS = 50
+
+
+def patient_histories(limits):
+    """
+    One Prefetch per relation, ordered and sliced in SQL. Django limits
+    sliced prefetches per patient with a ROW_NUMBER() window, so a batch of
+    patients still costs one query per relation.
+    """
+    prefetches = []
+    for relation, serializer_class, ordering in PATIENT_HISTORIES:
+        queryset = serializer_class.Meta.model.objects.order_by(*ordering)[:limits[relation]]
+        prefetches.append(Prefetch(relation, queryset=queryset, to_attr=f'recent_{relation}'))
+    return prefetches
+
+
+def patient_payload(patient, request):
+    """UserSerializer data plus the histories loaded by patient_histories()."""
+    data = UserSerializer(patient).data
+    for relation, serializer_class, _ in PATIENT_HISTORIES:
+        data[relation] = serializer_class(
+            getattr(patient, f'recent_{relation}'), many=True, context={'request': request}
+        ).data
+    return data
+
+
 class NutritionistPatientDetailView(generics.RetrieveAPIView):
     """
     Detailed view of a single patient for nutritionists.
@@ -70,60 +151,69 @@ class NutritionistPatientDetailView(generics.RetrieveAPIView):
     permission_classes = [IsNutritionist]
 
     def get_queryset(self):
-        return User.objects.filter(
-            profile__is_nutritionist=False,
-            is_staff=False
-        ).select_related('profile').prefetch_related(
-            'meal_plans',
-            'weekly_updates',
-            'food_logs',
-            'lab_results'
+        return caseload(self.request.user.id).select_related('profile').prefetch_related(
+            *patient_histories(DETAIL_LIMITS)
         )
 
     def retrieve(self, request, *args, **kwargs):
-        patient = self.get_object()
-        
-        # Build comprehensive patient data
-        patient_data = UserSerializer(patient).data
-        
-        # Add related data
-        patient_data['meal_plans'] = MealPlanSerializer(
-            patient.meal_plans.all().order_by('-start_date'), 
-            many=True,
-            context={'request': request}
-        ).data
-        
-        patient_data['weekly_updates'] = WeeklyUpdateSerializer(
-            patient.weekly_updates.all().order_by('-date')[:10], 
-            many=True,
-            context={'request': request}
-        ).data
-        
-        patient_data['food_logs'] = FoodLogSerializer(
-            patient.food_logs.all().order_by('-date')[:20], 
-            many=True,
-            context={'request': request}
-        ).data
-        
-        patient_data['lab_results'] = LabResultSerializer(
-            patient.lab_results.all().order_by('-uploaded_at'), 
-            many=True,
-            context={'request': request}
-        ).data
-        
-        return Response(patient_data)
+        return Response(patient_payload(self.get_object(), request))
+
+
+class NutritionistPatientHistoryView(generics.ListAPIView):
+    """
+    One of a patient's histories in full, newest first: the rows the
+    patient detail leaves out. Pass ?page_size= (and then the returned
+    ?cursor=) to page through it.
+    """
+    permission_classes = [IsNutritionist]
+    histories = {relation: (serializer_class, ordering) for relation, serializer_class, ordering in PATIENT_HISTORIES}
+
+    def get_queryset(self):
+        if self.kwargs['history'] not in self.histories:
+            raise NotFound('Unknown history')
+        if not caseload(self.request.user.id).filter(id=self.kwargs['patient_id']).exists():
+            raise NotFound('Patient not found')
+        serializer_class, ordering = self.histories[self.kwargs['history']]
+        return serializer_class.Meta.model.objects.filter(user_id=self.kwargs['patient_id']).order_by(*ordering)
+
+    def get_serializer_class(self):
+        return self.histories[self.kwargs['history']][0]
+
+
+class NutritionistPatientBatchView(APIView):
+    """
+    Summaries for several patients at once (?ids=1,2,3), in the order
+    asked: the latest meal plan plus a few recent updates, food logs and
+    lab results each. Ids outside the caseload are skipped. The query count doesn't
+    depend on the number of patients.
+    """
+    permission_classes = [IsNutritionist]
+
+    def get(self, request):
+        raw_ids = [value.strip() for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        if not raw_ids or not all(value.isdigit() for value in raw_ids):
+            return Response({'error': 'ids must be a comma-separated list of patient ids'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        if len(ids) > MAX_BATCH_PATIENTS:
+            return Response({'error': f'At most {MAX_BATCH_PATIENTS} patients per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        patients = caseload(request.user.id).filter(
+            id__in=ids
+        ).select_related('profile').prefetch_related(*patient_histories(SUMMARY_LIMITS)).in_bulk()
+        return Response([patient_payload(patients[pk], request) for pk in ids if pk in patients])
 
 
 class NutritionistMealPlanViewSet(viewsets.ModelViewSet):
     """
-    Allows nutritionists to create, update, and delete meal plans for patients.
+    Allows nutritionists to create, update, and delete meal plans for their patients.
     """
     serializer_class = MealPlanSerializer
     permission_classes = [IsNutritionist]
 
     def get_queryset(self):
-        # Nutritionists can see all meal plans
-        return MealPlan.objects.all().select_related('user').order_by('-start_date')
+        return MealPlan.objects.filter(
+            user__profile__nutritionist_id=self.request.user.id
+        ).select_related('user').order_by('-start_date')
 
     def create(self, request, *args, **kwargs):
         # Nutritionist must specify the user (patient) for the meal plan
@@ -135,7 +225,7 @@ class NutritionistMealPlanViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            patient = User.objects.get(id=user_id, profile__is_nutritionist=False)
+            patient = caseload(request.user.id).get(id=user_id)
         except User.DoesNotExist:
             return Response(
                 {'error': 'Patient not found'}, 
@@ -157,37 +247,46 @@ class NutritionistMealPlanTemplateViewSet(viewsets.ModelViewSet):
     permission_classes = [IsNutritionist]
     queryset = MealPlanTemplate.objects.all().order_by('-created_at')
 
+    @action(detail=True, methods=['post'])
+    def assign(self, request, pk=None):
+        """
+        Assign this template to many patients at once. Small batches are
+        created immediately; large ones return 202 with a job to poll.
+        """
+        template = self.get_object()
+        serializer = TemplateAssignmentSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        created, job = assign_or_queue(
+            template,
+            serializer.validated_data['user_ids'],
+            serializer.validated_data['start_date'],
+            created_by=request.user,
+        )
+        if job is not None:
+            return Response(BulkAssignmentJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+
+class BulkAssignmentJobView(generics.RetrieveAPIView):
+    """
+    Progress of a queued template assignment started by the nutritionist.
+    """
+    serializer_class = BulkAssignmentJobSerializer
+    permission_classes = [IsNutritionist]
+
+    def get_queryset(self):
+        return BulkAssignmentJob.objects.filter(created_by=self.request.user).select_related('template')
+
 
 class NutritionistDashboardStatsView(APIView):
     """
-    Provides summary statistics for the nutritionist dashboard.
+    Provides summary statistics for the nutritionist's dashboard.
     """
     permission_classes = [IsNutritionist]
 
     def get(self, request):
-        total_patients = User.objects.filter(
-            profile__is_nutritionist=False,
-            is_staff=False
-        ).count()
-        
-        approved_patients = User.objects.filter(
-            profile__is_nutritionist=False,
-            profile__is_approved=True,
-            is_staff=False
-        ).count()
-        
-        pending_patients = total_patients - approved_patients
-        
-        active_meal_plans = MealPlan.objects.filter(
-            end_date__gte=request.user.profile.user.date_joined.date()
-        ).count()
-        
-        return Response({
-            'total_patients': total_patients,
-            'approved_patients': approved_patients,
-            'pending_patients': pending_patients,
-            'active_meal_plans': active_meal_plans,
-        })
+        return Response(get_dashboard_stats(request.user.id))
 
 
 class NutritionistNoteViewSet(viewsets.ModelViewSet):
@@ -208,72 +307,140 @@ class NutritionistNoteViewSet(viewsets.ModelViewSet):
 
 class NutritionistRecentActivityView(APIView):
     """
-    Get recent activity from all patients (food logs, weekly updates, lab results).
+    Recent activity from the nutritionist's patients (food logs, weekly updates, lab results),
+    built as one UNION ALL ordered and limited in the database.
+
+    Without parameters returns the latest 20 entries as a list. Pass
+    ?page_size= (and then the returned ?cursor=) for "load more" pages, and
+    optionally ?type=food_log,lab_result and ?patient=<id> to filter.
     """
     permission_classes = [IsNutritionist]
+    page_size = 20
+    max_page_size = 100
+    activity_types = ('food_log', 'weekly_update', 'lab_result')
+    # The stored column each branch's timestamp comes from
+    order_columns = {'food_log': 'created_at', 'weekly_update': 'date', 'lab_result': 'uploaded_at'}
 
     def get(self, request):
-        from datetime import datetime, timedelta
-        from django.utils import timezone
-        
-        # Get activity from the last 7 days
-        week_ago = timezone.now() - timedelta(days=7)
-        
-        # Get recent food logs
-        recent_food_logs = FoodLog.objects.filter(
-            created_at__gte=week_ago,
-            user__profile__is_nutritionist=False
-        ).select_related('user').order_by('-created_at')[:10]
-        
-        # Get recent weekly updates
-        recent_updates = WeeklyUpdate.objects.filter(
-            date__gte=week_ago.date(),
-            user__profile__is_nutritionist=False
-        ).select_related('user').order_by('-date')[:10]
-        
-        # Get recent lab results
-        recent_labs = LabResult.objects.filter(
-            uploaded_at__gte=week_ago,
-            user__profile__is_nutritionist=False
-        ).select_related('user').order_by('-uploaded_at')[:10]
-        
-        # Combine and format activities
-        activities = []
-        
-        for log in recent_food_logs:
-            activities.append({
-                'type': 'food_log',
-                'patient': log.user.username,
-                'patient_id': log.user.id,
-                'content': f"{log.meal_type} - {log.content[:50]}...",
-                'timestamp': log.created_at,
-                'date': log.date
-            })
-        
-        for update in recent_updates:
-            activities.append({
-                'type': 'weekly_update',
-                'patient': update.user.username,
-                'patient_id': update.user.id,
-                'content': f"Weight: {update.current_weight}kg",
-                'timestamp': datetime.combine(update.date, datetime.min.time()).replace(tzinfo=timezone.get_current_timezone()),
-                'date': update.date
-            })
-        
-        for lab in recent_labs:
-            activities.append({
-                'type': 'lab_result',
-                'patient': lab.user.username,
-                'patient_id': lab.user.id,
-                'content': lab.title,
-                'timestamp': lab.uploaded_at,
-                'date': lab.uploaded_at.date()
-            })
-        
-        # Sort by timestamp
-        activities.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        return Response(activities[:20])
+        params = request.query_params
+        paginated = 'cursor' in params or 'page_size' in params
+        try:
+            page_size = max(1, min(int(params.get('page_size', self.page_size)), self.max_page_size))
+        except ValueError:
+            page_size = self.page_size
+
+        requested_types = [t for t in params.get('type', '').split(',') if t]
+        if any(t not in self.activity_types for t in requested_types):
+            return Response(
+                {'error': f"type must be one of {', '.join(self.activity_types)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        patient_id = params.get('patient')
+        if patient_id is not None and not patient_id.isdigit():
+            return Response({'error': 'patient must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+        cursor = self.decode_cursor(params.get('cursor'))
+        if params.get('cursor') and cursor is None:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        branches = []
+        for activity_type, queryset in self.activity_querysets():
+            if requested_types and activity_type not in requested_types:
+                continue
+            model = queryset.model
+            column = self.order_columns[activity_type]
+            latest = model.objects.filter(user__profile__nutritionist_id=request.user.id)
+            if patient_id is not None:
+                latest = latest.filter(user_id=patient_id)
+            if cursor:
+                latest = latest.filter(self.seek_filter(activity_type, column, cursor))
+            # Each branch reads at most a page, in index order on its raw
+            # column, before the UNION sorts the few rows left
+            latest = latest.order_by(f'-{column}', '-id').values('id')[:page_size + 1]
+            branches.append(queryset.filter(id__in=Subquery(latest)).values(*ACTIVITY_COLUMNS))
+
+        rows = []
+        if branches:
+            feed = branches[0].union(*branches[1:], all=True)
+            rows = list(feed.order_by('-timestamp', '-activity_type', '-object_id')[:page_size + 1])
+
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        activities = [self.format_activity(row) for row in rows]
+        if not paginated:
+            return Response(activities)
+
+        next_cursor = self.encode_cursor(rows[-1]) if has_next else None
+        return Response({'next_cursor': next_cursor, 'results': activities})
+
+    def activity_querysets(self):
+        # Every branch annotates ACTIVITY_COLUMNS in the same order so the
+        # UNION lines up column by column
+        yield 'food_log', FoodLog.objects.annotate(**activity_columns(
+            'food_log', timestamp=F('created_at'), headline=F('meal_type'),
+            detail=Substr('content', 1, 50), day=F('date'),
+        ))
+        yield 'weekly_update', WeeklyUpdate.objects.annotate(**activity_columns(
+            'weekly_update', timestamp=Cast('date', DateTimeField()),
+            weight=F('current_weight'), day=F('date'),
+        ))
+        yield 'lab_result', LabResult.objects.annotate(**activity_columns(
+            'lab_result', timestamp=F('uploaded_at'), headline=F('title'),
+            day=Cast('uploaded_at', DateField()),
+        ))
+
+    def seek_filter(self, activity_type, column, cursor):
+        """
+        Rows strictly after the cursor in (timestamp, type, id) descending
+        order, as predicates on the raw column so its index serves them.
+        """
+        timestamp, cursor_type, object_id = cursor
+        if column == 'date':
+            # Weekly updates sort at midnight UTC of their date
+            timestamp = timestamp.astimezone(dt_timezone.utc)
+            if timestamp.time() != time.min:
+                return Q(date__lte=timestamp.date())
+            before, same = Q(date__lt=timestamp.date()), Q(date=timestamp.date())
+        else:
+            before, same = Q(**{f'{column}__lt': timestamp}), Q(**{column: timestamp})
+        if activity_type < cursor_type:
+            return before | same
+        if activity_type > cursor_type:
+            return before
+        return before | (same & Q(id__lt=object_id))
+
+    def format_activity(self, row):
+        if row['activity_type'] == 'food_log':
+            content = f"{row['headline']} - {row['detail']}..."
+        elif row['activity_type'] == 'weekly_update':
+            content = f"Weight: {row['weight']}kg"
+        else:
+            content = row['headline']
+        return {
+            'type': row['activity_type'],
+            'id': row['object_id'],
+            'patient': row['patient'],
+            'patient_id': row['patient_id'],
+            'content': content,
+            'timestamp': row['timestamp'],
+            'date': row['day'],
+        }
+
+    def encode_cursor(self, row):
+        raw = json.dumps([row['timestamp'].isoformat(), row['activity_type'], row['object_id']])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return None
+        try:
+            timestamp, activity_type, object_id = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            timestamp = parse_datetime(timestamp)
+            object_id = int(object_id)
+            if timestamp is None or activity_type not in self.activity_types:
+                return None
+        except (TypeError, ValueError):
+            return None
+        return timestamp, activity_type, object_id
 
 
 class NutritionistPatientProgressView(APIView):
@@ -283,85 +450,82 @@ class NutritionistPatientProgressView(APIView):
     permission_classes = [IsNutritionist]
 
     def get(self, request, patient_id):
-        try:
-            patient = User.objects.get(
-                id=patient_id,
-                profile__is_nutritionist=False
-            )
-        except User.DoesNotExist:
+        if not caseload(request.user.id).filter(id=patient_id).exists():
             return Response(
                 {'error': 'Patient not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get all weekly updates for the patient
-        updates = WeeklyUpdate.objects.filter(
-            user=patient
-        ).order_by('date')
-        
+        metrics = list(timeseries.METRICS)
+        rows = timeseries.load_rows(patient_id, metrics)
+
         # Format data for charts
         progress_data = {
             'weight': [],
-            'measurements': {
-                'waist': [],
-                'hips': [],
-                'chest': [],
-                'arm': [],
-                'thigh': []
-            },
+            'measurements': {name: [] for name in timeseries.MEASUREMENTS},
             'energy_levels': [],
             'compliance': []
         }
-        
-        for update in updates:
-            date_str = update.date.isoformat()
-            
-            if update.current_weight:
-                progress_data['weight'].append({
-                    'date': date_str,
-                    'value': float(update.current_weight)
-                })
-            
-            if update.waist_cm:
-                progress_data['measurements']['waist'].append({
-                    'date': date_str,
-                    'value': float(update.waist_cm)
-                })
-            
-            if update.hips_cm:
-                progress_data['measurements']['hips'].append({
-                    'date': date_str,
-                    'value': float(update.hips_cm)
-                })
-            
-            if update.chest_cm:
-                progress_data['measurements']['chest'].append({
-                    'date': date_str,
-                    'value': float(update.chest_cm)
-                })
-            
-            if update.arm_cm:
-                progress_data['measurements']['arm'].append({
-                    'date': date_str,
-                    'value': float(update.arm_cm)
-                })
-            
-            if update.thigh_cm:
-                progress_data['measurements']['thigh'].append({
-                    'date': date_str,
-                    'value': float(update.thigh_cm)
-                })
-            
-            if update.energy_level:
-                progress_data['energy_levels'].append({
-                    'date': date_str,
-                    'value': update.energy_level
-                })
-            
-            if update.compliance_score:
-                progress_data['compliance'].append({
-                    'date': date_str,
-                    'value': update.compliance_score
-                })
+        targets = {
+            'weight': progress_data['weight'],
+            'energy': progress_data['energy_levels'],
+            'compliance': progress_data['compliance'],
+            **progress_data['measurements'],
+        }
+        for day, *values in rows:
+            date_str = day.isoformat()
+            for metric, value in zip(metrics, values):
+                if value:
+                    targets[metric].append({'date': date_str, 'value': value})
         
         return Response(progress_data)
+
+class NutritionistPatientProgressSeriesView(APIView):
+    """
+    Columnar, optionally downsampled progress series for a patient; takes
+    the same parameters as the patient-facing progress/series/ endpoint.
+    """
+    permission_classes = [IsNutritionist]
+
+    def get(self, request, patient_id):
+        if not caseload(request.user.id).filter(id=patient_id).exists():
+            return Response({'error': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            return Response(timeseries.series_response_data(patient_id, request.query_params))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class NutritionistExportView(APIView):
+    """
+    Download the caseload's data, or one patient's with ?patient=<id>, as
+    a stream: see export.parse_export_params for ?dataset=, ?output= and
+    ?gzip=. Rows are read in chunks and written as they arrive, so memory
+    doesn't grow with history length; under ASGI each chunk is pulled
+    through streaming.aiter_sync().
+    """
+    permission_classes = [IsNutritionist]
+
+    def get(self, request):
+        try:
+            datasets, output, compress = export.parse_export_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        patient_id = request.query_params.get('patient')
+        if patient_id is not None:
+            if not patient_id.isdigit():
+                return Response({'error': 'patient must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+            if not caseload(request.user.id).filter(id=patient_id).exists():
+                return Response({'error': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+            patient_id = int(patient_id)
+
+        chunks = export.export_chunks(datasets, output, request.user.id, patient_id)
+        response = StreamingHttpResponse(
+            export.encode_chunks(chunks, compress),
+            content_type='application/gzip' if compress else export.FORMATS[output][0],
+        )
+        filename = export.export_filename(datasets, output, compress, patient_id)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Cache-Control'] = 'no-store'
+        response['X-Accel-Buffering'] = 'no'
+        return for_server(request, response)
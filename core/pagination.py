@@ -0,0 +1,192 @@
+import base64
+import json
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from . import social
+from .models import WeeklyUpdate
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination keyed on the queryset's own ordering, with the
+    primary key as a tie-breaker so rows sharing a date never repeat or get
+    skipped. Each page is a single indexed range scan, however deep the
+    client pages.
+
+    Opt-in: requests without ?cursor or ?page_size get the plain list the SPA
+    already consumes.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 200
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.attname, self.field, self.descending = self.get_ordering(queryset)
+        self.pk_field = queryset.model._meta.pk
+
+        pk_name = self.pk_field.attname
+        prefix = '-' if self.descending else ''
+        ordering = [prefix + self.attname]
+        if self.attname != pk_name:
+            ordering.append(prefix + pk_name)
+        queryset = queryset.order_by(*ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, pk_name))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = None
+        if self.has_next:
+            last = results[-1]
+            self.next_position = (getattr(last, self.attname), last.pk)
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        """
+        Return (name, field, descending) for the leading ordering term,
+        falling back to Meta.ordering and then to the primary key. The term
+        may name an annotation, which must not be nullable.
+        """
+        opts = queryset.model._meta
+        ordering = list(queryset.query.order_by) or list(opts.ordering)
+        for term in ordering:
+            if isinstance(term, str) and '__' not in term and term.lstrip('-') != '?':
+                name = term.lstrip('-')
+                if name in queryset.query.annotations:
+                    return name, queryset.query.annotations[name].output_field, term.startswith('-')
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+                return field.attname, field, term.startswith('-')
+        return opts.pk.attname, opts.pk, True
+
+    def seek_filter(self, position, pk_name):
+        value, pk = position
+        op = 'lt' if self.descending else 'gt'
+        if self.attname == pk_name:
+            return Q(**{f'{pk_name}__{op}': pk})
+        return (
+            Q(**{f'{self.attname}__{op}': value}) |
+            Q(**{self.attname: value, f'{pk_name}__{op}': pk})
+        )
+
+    def encode_cursor(self, position):
+        value, pk = position
+        # Full isoformat: DjangoJSONEncoder truncates microseconds, which
+        # would make the seek predicate skip rows
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        raw = json.dumps([value, pk])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return self.field.to_python(value), self.pk_field.to_python(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+
+class RankedPagination(KeysetPagination):
+    """
+    Seek pagination over a precomputed relevance ranking of (score, pk)
+    pairs, best first. Ties on score are broken by pk so pages never overlap.
+    """
+    def paginate_ranking(self, ranking, request):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            score, pk = position
+            ranking = [item for item in ranking if (-item[0], item[1]) > (-score, pk)]
+
+        self.has_next = len(ranking) > self.page_size
+        page = ranking[:self.page_size]
+        self.next_position = page[-1] if self.has_next else None
+        return page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            score, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return float(score), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Seek pagination over the cached social feed (core.social), newest
+    first, keyed on (date, id) like the WeeklyUpdate index.
+    """
+    page_size = social.FEED_PAGE_SIZE
+
+    def paginate_feed(self, request, exclude_user_id):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field = WeeklyUpdate._meta.get_field('date')
+        self.pk_field = WeeklyUpdate._meta.pk
+        page = social.feed_page(exclude_user_id, self.decode_cursor(request), self.page_size + 1)
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = (date.fromisoformat(page[-1]['date']), page[-1]['id']) if self.has_next else None
+        return page
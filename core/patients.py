@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import Case, DateField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Conversation, FoodLog, MealPlan, WeeklyUpdate
+
+
+def caseload(nutritionist_id):
+    """Patients assigned to the nutritionist (an index range on profile_caseload_idx)."""
+    return User.objects.filter(
+        profile__nutritionist_id=nutritionist_id,
+        profile__is_nutritionist=False,
+        is_staff=False
+    )
+
+
+def reachable(nutritionist_id):
+    """The caseload plus unassigned pending patients, whom any nutritionist may approve and claim."""
+    return User.objects.filter(
+        Q(profile__nutritionist_id=nutritionist_id) | Q(profile__nutritionist__isnull=True, profile__is_approved=False),
+        profile__is_nutritionist=False,
+        is_staff=False
+    )
+
+
+# ?ordering= values -> order_by term; sort keys are non-null for keyset paging
+PATIENT_ORDERINGS = {
+    'username': 'username',
+    'last_activity': 'activity_sort',
+    'unread_messages': 'unread_messages',
+}
+
+
+def _latest(queryset, field, ordering):
+    return Subquery(queryset.filter(user=OuterRef('pk')).order_by(*ordering).values(field)[:1])
+
+
+def annotate_patients(queryset, nutritionist_id):
+    """
+    Add per-patient activity columns as correlated subqueries, so the whole
+    list stays one statement:
+    last_food_log, last_update, latest_weight, open_plan_end (latest end
+    date of a plan still running), last_activity, and unread_messages (sent
+    by the patient to `nutritionist_id` and not yet read).
+    """
+    today = timezone.now().date()
+    updates = WeeklyUpdate.objects.all()
+    unread = Conversation.objects.filter(
+        Q(user_a=OuterRef('pk'), user_b_id=nutritionist_id) | Q(user_a_id=nutritionist_id, user_b=OuterRef('pk'))
+    ).annotate(
+        # The nutritionist's side of the pair holds their unread count
+        unread=Case(When(user_a_id=nutritionist_id, then=F('unread_a')), default=F('unread_b'))
+    ).values('unread')[:1]
+
+    queryset = queryset.annotate(
+        last_food_log=_latest(FoodLog.objects.all(), 'date', ('-date',)),
+        last_update=_latest(updates, 'date', ('-date', '-id')),
+        latest_weight=_latest(updates, 'current_weight', ('-date', '-id')),
+        open_plan_end=_latest(MealPlan.objects.filter(end_date__gte=today), 'end_date', ('-end_date',)),
+        unread_messages=Coalesce(Subquery(unread), 0),
+    )
+    # GREATEST is NULL on SQLite/MySQL if either side is, so fill each from the other
+    return queryset.annotate(
+        last_activity=Greatest(
+            Coalesce('last_food_log', 'last_update'), Coalesce('last_update', 'last_food_log'),
+            output_field=DateField(),
+        ),
+        activity_sort=Coalesce('last_activity', Value(date.min), output_field=DateField()),
+    )
+
+
+def filter_patients(queryset, params):
+    """
+    ?inactive_days=N   no food log or weekly update in the last N days
+    ?has_unread=true   unread messages from the patient
+    ?without_plan=true no meal plan running today
+    ?ordering=         a PATIENT_ORDERINGS key, optionally prefixed with '-'
+    Raises ValueError for malformed values.
+    """
+    inactive_days = params.get('inactive_days')
+    if inactive_days:
+        if not inactive_days.isdigit():
+            raise ValueError('inactive_days must be a whole number of days')
+        cutoff = timezone.now().date() - timedelta(days=int(inactive_days))
+        queryset = queryset.filter(activity_sort__lt=cutoff)
+    if params.get('has_unread') == 'true':
+        queryset = queryset.filter(unread_messages__gt=0)
+    if params.get('without_plan') == 'true':
+        queryset = queryset.filter(open_plan_end__isnull=True)
+
+    ordering = params.get('ordering')
+    if ordering:
+        name = ordering.lstrip('-')
+        if name not in PATIENT_ORDERINGS:
+            raise ValueError(f"ordering must be one of: {', '.join(PATIENT_ORDERINGS)}")
+        queryset = queryset.order_by(('-' if ordering.startswith('-') else '') + PATIENT_ORDERINGS[name])
+    return queryset
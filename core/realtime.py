@@ -0,0 +1,154 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def _put_nowait(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # A stalled client shouldn't grow memory without bound
+        logger.warning("Dropping realtime event for a slow subscriber")
+
+
+class InProcessBroker:
+    """
+    Fans events out to the subscribers connected to this process. Enough for a
+    single ASGI worker. publish() may be called from sync views, which run in
+    worker threads.
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            targets = list(self._subscribers.get(user_id, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_put_nowait, queue, event)
+            except RuntimeError:
+                # Loop already closed; the subscriber is going away
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id, set())
+                subscribers.discard(entry)
+                if not subscribers:
+                    self._subscribers.pop(user_id, None)
+
+
+class UnixSocketBroker(InProcessBroker):
+    """
+    Local stand-in for a shared pub/sub service when several workers run on
+    one host. Every worker with subscribers binds a datagram socket in
+    REALTIME_SOCKET_DIR; publish() sends the event to all of them and each
+    worker delivers it to its own subscribers.
+    """
+    max_datagram = 256 * 1024
+
+    def __init__(self, socket_dir=None):
+        super().__init__()
+        self.socket_dir = socket_dir or settings.REALTIME_SOCKET_DIR
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._receiver = None
+        self._bind_lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        payload = json.dumps({'user_id': user_id, 'event': event}, cls=DjangoJSONEncoder).encode()
+        for name in os.listdir(self.socket_dir):
+            path = os.path.join(self.socket_dir, name)
+            try:
+                self._sender.sendto(payload, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker that owned this socket has exited
+                self._unlink(path)
+            except OSError as e:
+                logger.warning(f"Could not publish realtime event to {path}: {e}")
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        self._ensure_receiver(asyncio.get_running_loop())
+        async with super().subscribe(user_id) as queue:
+            yield queue
+
+    def _ensure_receiver(self, loop):
+        with self._bind_lock:
+            if self._receiver is not None:
+                return
+            path = os.path.join(self.socket_dir, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(path)
+            receiver.setblocking(False)
+            loop.add_reader(receiver.fileno(), self._drain)
+            atexit.register(self._unlink, path)
+            self._receiver = receiver
+
+    def _drain(self):
+        while True:
+            try:
+                payload = self._receiver.recv(self.max_datagram)
+            except BlockingIOError:
+                return
+            try:
+                data = json.loads(payload)
+                self.deliver(data['user_id'], data['event'])
+            except (ValueError, KeyError):
+                logger.warning("Ignoring malformed realtime datagram")
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.REALTIME_BROKER)()
+    return _broker
+
+
+def publish(user_ids, event_type, data):
+    """Send an event to each user once the current transaction commits."""
+    event = {'type': event_type, 'data': data}
+
+    def send():
+        broker = get_broker()
+        for user_id in set(user_ids):
+            broker.publish(user_id, event)
+
+    transaction.on_commit(send)
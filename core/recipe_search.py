@@ -0,0 +1,177 @@
+import math
+import re
+import uuid
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F
+
+SEARCH_CONFIG = 'english'
+# (field, PostgreSQL weight label, fallback multiplier). The multipliers are
+# PostgreSQL's default weights for A-D, so both backends rank alike.
+SEARCH_FIELDS = (
+    ('title', 'A', 1.0),
+    ('tags', 'B', 0.4),
+    ('ingredients', 'C', 0.2),
+    ('instructions', 'D', 0.1),
+)
+MACRO_FILTERS = ('calories', 'protein_g', 'carbs_g', 'fat_g')
+TIME_FILTERS = {
+    'prep_time_max': 'prep_time_minutes',
+    'cook_time_max': 'cook_time_minutes',
+}
+MAX_RESULTS = 500
+
+STOPWORDS = frozenset('a an and are as at be by for from in into is it of on or the to with'.split())
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+GENERATION_KEY = 'recipes:search-generation'
+
+
+def parse_tags(text):
+    """Split the comma-separated Recipe.tags into unique normalized names."""
+    names = {}
+    for tag in (text or '').split(','):
+        tag = ' '.join(tag.split()).lower()[:50]
+        if tag:
+            names[tag] = None
+    return list(names)
+
+
+def search_vector():
+    vector = None
+    for field, weight, _ in SEARCH_FIELDS:
+        part = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vector(recipe):
+    if connections[recipe._state.db or 'default'].vendor == 'postgresql':
+        type(recipe).objects.filter(pk=recipe.pk).update(search_vector=search_vector())
+
+
+def update_search_vectors(queryset):
+    """Recompute the vectors of many recipes in one UPDATE."""
+    if connections[queryset.db].vendor == 'postgresql':
+        queryset.update(search_vector=search_vector())
+
+
+def filter_recipes(queryset, params):
+    """
+    Apply the tag, macro-range and time filters from query params. Raises
+    ValueError for malformed numbers.
+    """
+    for tag in params.getlist('tag'):
+        for name in parse_tags(tag):
+            queryset = queryset.filter(tag_set__name=name)
+
+    for field in MACRO_FILTERS:
+        for suffix, lookup in (('_min', 'gte'), ('_max', 'lte')):
+            value = params.get(field + suffix)
+            if value not in (None, ''):
+                queryset = queryset.filter(**{f'{field}__{lookup}': _number(field + suffix, value)})
+
+    for param, field in TIME_FILTERS.items():
+        value = params.get(param)
+        if value not in (None, ''):
+            queryset = queryset.filter(**{f'{field}__lte': _number(param, value)})
+    return queryset
+
+
+def _number(name, value):
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a number")
+    return number
+
+
+def _stem(token):
+    # Crude plural folding so "eggs" finds "egg"; PostgreSQL has its own stemmer
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_stem(token) for token in TOKEN_RE.findall((text or '').lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    In-memory term -> {recipe id: weighted term frequency} index, used where
+    PostgreSQL full-text search isn't available. Every query term must
+    match, like websearch_to_tsquery without operators; scores are TF-IDF.
+    """
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        self.size = 0
+        for row in rows:
+            self.size += 1
+            for field, _, weight in SEARCH_FIELDS:
+                for term in tokenize(row[field]):
+                    postings = self.postings[term]
+                    postings[row['id']] = postings.get(row['id'], 0) + weight
+
+    def search(self, query):
+        scores = None
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                return []
+            idf = math.log(1 + self.size / len(postings))
+            if scores is None:
+                scores = {recipe_id: tf * idf for recipe_id, tf in postings.items()}
+            else:
+                scores = {
+                    recipe_id: score + postings[recipe_id] * idf
+                    for recipe_id, score in scores.items() if recipe_id in postings
+                }
+        return sorted(((score, recipe_id) for recipe_id, score in (scores or {}).items()), key=lambda item: (-item[0], item[1]))
+
+
+_index = None
+_index_generation = None
+
+
+def invalidate_index():
+    # A fresh token rather than a counter, so a cleared cache can't match an
+    # old index. It lives in the default cache, which settings make shared
+    # between processes in production.
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+
+
+def get_index():
+    """This process's index, rebuilt when any process has changed a recipe."""
+    global _index, _index_generation
+    generation = cache.get_or_set(GENERATION_KEY, lambda: uuid.uuid4().hex, None)
+    if _index is None or generation != _index_generation:
+        from .models import Recipe
+        fields = [field for field, _, _ in SEARCH_FIELDS]
+        _index = InvertedIndex(Recipe.objects.values('id', *fields).iterator())
+        _index_generation = generation
+    return _index
+
+
+def ranked_ids(query, queryset):
+    """(score, id) pairs for the recipes in `queryset` matching `query`, best first."""
+    if connections[queryset.db].vendor == 'postgresql':
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        return list(
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query))
+            .order_by('-rank', 'id')
+            .values_list('rank', 'id')[:MAX_RESULTS]
+        )
+
+    ranking = get_index().search(query)
+    if queryset.query.has_filters():
+        allowed = set(queryset.values_list('id', flat=True))
+        ranking = [item for item in ranking if item[1] in allowed]
+    return ranking[:MAX_RESULTS]
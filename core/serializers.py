@@ -1,7 +1,14 @@
+import os
+from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Profile, MealPlan, WeeklyUpdate, Recipe, MealPlanTemplate, FoodLog, Message, LabResult, NutritionistNote
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .authentication import add_user_claims
+from . import dietary, uploads
+from .images import rendition_urls
+from .meal_plans import load_plan_recipes, plan_macro_totals, iter_plan_slots
+from .models import Profile, MealPlan, WeeklyUpdate, Recipe, MealPlanTemplate, BulkAssignmentJob, FoodLog, Message, Conversation, LabResult, NutritionistNote, UploadSession
 
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -39,7 +46,27 @@ class UserSerializer(serializers.ModelSerializer):
             password=validated_data['password']
         )
 
+
+class PatientListSerializer(UserSerializer):
+    """UserSerializer plus the activity columns from patients.annotate_patients()."""
+    last_food_log = serializers.DateField(read_only=True)
+    last_update = serializers.DateField(read_only=True)
+    latest_weight = serializers.FloatField(read_only=True)
+    open_plan_end = serializers.DateField(read_only=True)
+    last_activity = serializers.DateField(read_only=True)
+    unread_messages = serializers.IntegerField(read_only=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + [
+            'last_food_log', 'last_update', 'latest_weight', 'open_plan_end', 'last_activity', 'unread_messages',
+        ]
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Claims read by StatelessJWTAuthentication; copied into the access token
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
         # Add extra user data
@@ -47,23 +74,157 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         data['user'] = serializer.data
         return data
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        # Re-stamp claims from the database so approval/staff changes reach
+        # the next access token instead of living as long as the refresh token
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.select_related('profile').filter(
+            id=refresh.payload.get(jwt_settings.USER_ID_CLAIM)
+        ).first()
+        if user is not None:
+            attrs = {**attrs, 'refresh': str(add_user_claims(refresh, user))}
+        return super().validate(attrs)
+
+class RenditionsField(serializers.Field):
+    """URLs of the resized copies of each image field, keyed by field then size."""
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        return rendition_urls(instance, request.build_absolute_uri if request else None)
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'sha256', 'offset', 'chunk_size', 'status', 'created_at']
+        read_only_fields = ['status', 'created_at']
+
+    def get_chunk_size(self, obj):
+        return settings.CHUNKED_UPLOAD_MAX_CHUNK
+
+    def validate_filename(self, value):
+        value = os.path.basename(value)
+        if not value:
+            raise serializers.ValidationError("Filename is required")
+        return value
+
+    def validate_size(self, value):
+        if value < 1 or value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError("Expected a hex SHA-256 digest")
+        return value
+
+class ChunkedUploadFieldMixin(serializers.Serializer):
+    """
+    Accept `upload_id`, the id of a completed UploadSession, in place of a
+    multipart `file`. The part file is attached on save and then discarded.
+    """
+    upload_id = serializers.UUIDField(write_only=True, required=False)
+    upload_session = None
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        upload_id = attrs.pop('upload_id', None)
+        if upload_id is not None:
+            self.upload_session = UploadSession.objects.filter(
+                id=upload_id, user_id=self.context['request'].user.id, status='complete'
+            ).first()
+            if self.upload_session is None:
+                raise serializers.ValidationError({'upload_id': "No completed upload with this id"})
+            attrs['file'] = uploads.open_upload(self.upload_session)
+        return attrs
+
+    def save(self, **kwargs):
+        if self.upload_session is None:
+            return super().save(**kwargs)
+        try:
+            instance = super().save(**kwargs)
+        finally:
+            self.validated_data['file'].close()
+        uploads.discard_upload(self.upload_session)
+        return instance
+
 class RecipeSerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
+    allergens = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = '__all__'
+        # Search and dietary internals, derived from the other fields
+        exclude = ['tag_set', 'search_vector', 'allergen_flags']
+
+    def get_allergens(self, obj):
+        return dietary.flag_names(obj.allergen_flags)
+
+class CompactRecipeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Recipe
+        fields = ['id', 'title', 'image', 'prep_time_minutes', 'cook_time_minutes', 'servings', 'calories', 'protein_g', 'carbs_g', 'fat_g', 'tags']
+
+class MealPlanListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        if self.child.expand_recipes():
+            # One recipe query for the whole page instead of one per plan
+            data = list(data.all() if hasattr(data, 'all') else data)
+            self.child.recipe_map = load_plan_recipes([plan.structured_plan for plan in data])
+        return super().to_representation(data)
+
+class MealPlanSerializer(ChunkedUploadFieldMixin, serializers.ModelSerializer):
+    """
+    With ?expand=recipes, embeds compact payloads for every recipe referenced
+    by structured_plan plus per-plan macro totals, fetched in one query.
+    """
+    recipe_map = None
 
-class MealPlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = MealPlan
-        fields = ['id', 'start_date', 'end_date', 'content', 'structured_plan', 'file', 'created_at']
+        fields = ['id', 'start_date', 'end_date', 'content', 'structured_plan', 'file', 'upload_id', 'nutrition_summary', 'created_at']
+        read_only_fields = ['nutrition_summary']
+        list_serializer_class = MealPlanListSerializer
+
+    def expand_recipes(self):
+        request = self.context.get('request')
+        if request is None:
+            return False
+        return 'recipes' in request.query_params.get('expand', '').split(',')
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self.expand_recipes():
+            recipe_map = self.recipe_map
+            if recipe_map is None:
+                recipe_map = load_plan_recipes([instance.structured_plan])
+            recipe_ids = {recipe_id for _, _, recipe_id in iter_plan_slots(instance.structured_plan)}
+            data['recipes'] = {
+                str(recipe_id): CompactRecipeSerializer(recipe_map[recipe_id], context=self.context).data
+                for recipe_id in sorted(recipe_ids) if recipe_id in recipe_map
+            }
+            data['macro_totals'] = plan_macro_totals(instance.structured_plan, recipe_map)
+        return data
 
 class WeeklyUpdateSerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
+
     class Meta:
         model = WeeklyUpdate
-        fields = ['id', 'date', 'current_weight', 'waist_cm', 'hips_cm', 'chest_cm', 'arm_cm', 'thigh_cm', 'energy_level', 'compliance_score', 'notes', 'photo_front', 'photo_side', 'photo_back']
+        fields = ['id', 'date', 'current_weight', 'waist_cm', 'hips_cm', 'chest_cm', 'arm_cm', 'thigh_cm', 'energy_level', 'compliance_score', 'notes', 'photo_front', 'photo_side', 'photo_back', 'renditions']
         read_only_fields = ['date']
 
 class FoodLogSerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
+
     class Meta:
         model = FoodLog
         fields = '__all__'
@@ -80,16 +241,66 @@ class MessageSerializer(serializers.ModelSerializer):
         fields = ['id', 'sender', 'sender_name', 'recipient', 'recipient_name', 'subject', 'content', 'timestamp', 'is_read']
         read_only_fields = ['sender', 'timestamp']
 
-class LabResultSerializer(serializers.ModelSerializer):
+class ConversationSerializer(serializers.ModelSerializer):
+    last_message_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['last_message_id', 'last_message_preview', 'last_message_at']
+
+    def to_representation(self, instance):
+        # Only what the messages page shows, from the caller's side
+        user = self.context['request'].user
+        return {
+            'username': instance.other_participant(user).username,
+            **super().to_representation(instance),
+            'unread_count': instance.unread_for(user),
+        }
+
+class LabResultSerializer(ChunkedUploadFieldMixin, serializers.ModelSerializer):
     class Meta:
         model = LabResult
         fields = '__all__'
         read_only_fields = ['uploaded_at', 'user']
+        # May come from upload_id instead
+        extra_kwargs = {'file': {'required': False}}
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if self.instance is None and not attrs.get('file'):
+            raise serializers.ValidationError({'file': "No file was submitted."})
+        return attrs
 
 class MealPlanTemplateSerializer(serializers.ModelSerializer):
     class Meta:
         model = MealPlanTemplate
-        fields = ['id', 'name', 'description', 'content', 'structured_plan', 'created_at']
+        fields = ['id', 'name', 'description', 'content', 'structured_plan', 'nutrition_summary', 'created_at']
+        read_only_fields = ['nutrition_summary']
+
+class TemplateAssignmentSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    start_date = serializers.DateField()
+
+    def validate_user_ids(self, value):
+        user_ids = list(dict.fromkeys(value))
+        patients = User.objects.filter(profile__is_nutritionist=False)
+        request = self.context.get('request')
+        if request is not None:
+            # Nutritionists may only assign to their own caseload
+            patients = patients.filter(profile__nutritionist_id=request.user.id)
+        patient_ids = set(patients.filter(id__in=user_ids).values_list('id', flat=True))
+        unknown = [user_id for user_id in user_ids if user_id not in patient_ids]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown patient ids: {unknown[:20]}")
+        return user_ids
+
+class BulkAssignmentJobSerializer(serializers.ModelSerializer):
+    template_name = serializers.CharField(source='template.name', read_only=True)
+
+    class Meta:
+        model = BulkAssignmentJob
+        fields = ['id', 'template', 'template_name', 'start_date', 'status', 'total', 'processed', 'error', 'created_at', 'updated_at']
+        read_only_fields = fields
 
 class NutritionistNoteSerializer(serializers.ModelSerializer):
     nutritionist_name = serializers.CharField(source='nutritionist.username', read_only=True)
@@ -99,3 +310,10 @@ class NutritionistNoteSerializer(serializers.ModelSerializer):
         model = NutritionistNote
         fields = ['id', 'nutritionist', 'nutritionist_name', 'patient', 'patient_name', 'content', 'tags', 'created_at', 'updated_at']
         read_only_fields = ['nutritionist', 'created_at', 'updated_at']
+
+    def validate_patient(self, value):
+        request = self.context.get('request')
+        profile = getattr(value, 'profile', None)
+        if request is not None and (profile is None or profile.nutritionist_id != request.user.id):
+            raise serializers.ValidationError("Not one of your patients")
+        return value
@@ -0,0 +1,125 @@
+import re
+from collections import Counter
+
+from django.core.cache import cache
+
+from .dietary import normalize_ingredient
+from .meal_plans import iter_plan_slots, load_plan_recipes
+from .models import Recipe
+
+CACHE_SECONDS = 60 * 60 * 24
+
+# unit -> (base unit, factor). Mass and volume merge across units; count
+# units (cloves, cans...) only merge with themselves.
+UNIT_FACTORS = {
+    'g': ('g', 1), 'gram': ('g', 1), 'kg': ('g', 1000), 'kilogram': ('g', 1000), 'mg': ('g', 0.001),
+    'oz': ('g', 28.35), 'ounce': ('g', 28.35), 'lb': ('g', 453.6), 'lbs': ('g', 453.6), 'pound': ('g', 453.6),
+    'ml': ('ml', 1), 'l': ('ml', 1000), 'liter': ('ml', 1000), 'litre': ('ml', 1000),
+    'cup': ('ml', 240), 'tbsp': ('ml', 15), 'tablespoon': ('ml', 15), 'tsp': ('ml', 5), 'teaspoon': ('ml', 5),
+}
+COUNT_UNITS = frozenset('clove can slice piece bunch pinch handful scoop sprig dash'.split())
+FRACTIONS = {'½': 0.5, '¼': 0.25, '¾': 0.75, '⅓': 1 / 3, '⅔': 2 / 3}
+
+QUANTITY_RE = re.compile(
+    r'^\s*(?:(?P<whole>\d+(?:\.\d+)?)(?:\s*(?P<frac>\d+/\d+|[½¼¾⅓⅔])|(?:/(?P<den>\d+)))?|(?P<glyph>[½¼¾⅓⅔]))'
+    r'\s*(?:(?P<unit>[a-zA-Z]+)\.?(?![a-zA-Z]))?'
+)
+
+
+def _fraction(text):
+    if text in FRACTIONS:
+        return FRACTIONS[text]
+    numerator, denominator = text.split('/')
+    return int(numerator) / int(denominator) if int(denominator) else 0
+
+
+def _unit(word):
+    word = word.lower()
+    for candidate in (word, word[:-1] if word.endswith('s') else word, word[:-2] if word.endswith('es') else word):
+        if candidate in UNIT_FACTORS:
+            return UNIT_FACTORS[candidate]
+        if candidate in COUNT_UNITS:
+            return candidate, 1
+    return None
+
+
+def parse_line(line):
+    """
+    (name, quantity, unit) for one ingredient line, with mass in g and
+    volume in ml: "1 1/2 cups oat milk" -> ("oat milk", 360.0, "ml").
+    quantity and unit are None when the line has no leading amount.
+    """
+    match = QUANTITY_RE.match(line)
+    resolved = _unit(match['unit']) if match and match['unit'] else None
+    # Drop the leading amount before naming, so "2 cups" doesn't leave "cup"
+    # behind while "ground cloves" keeps its cloves
+    name = normalize_ingredient(line[match.end():] if resolved else line)
+    if not name:
+        return None
+    if not match:
+        return name, None, None
+
+    if match['glyph']:
+        quantity = FRACTIONS[match['glyph']]
+    elif match['den']:
+        quantity = _fraction(f"{match['whole']}/{match['den']}")
+    else:
+        quantity = float(match['whole']) + (_fraction(match['frac']) if match['frac'] else 0)
+
+    unit = None
+    if resolved:
+        unit, factor = resolved
+        quantity *= factor
+    return name, quantity, unit
+
+
+def _display(quantity, unit):
+    if unit == 'g' and quantity >= 1000:
+        return round(quantity / 1000, 2), 'kg'
+    if unit == 'ml' and quantity >= 1000:
+        return round(quantity / 1000, 2), 'l'
+    return round(quantity, 2), unit
+
+
+def build_shopping_list(structured_plan):
+    """
+    Merge the ingredients of every recipe in a plan into one list. Each slot
+    is one serving, so a recipe's amounts are divided by its servings and
+    multiplied by the number of slots it fills.
+    """
+    slots = Counter(recipe_id for _, _, recipe_id in iter_plan_slots(structured_plan))
+    recipe_map = load_plan_recipes([structured_plan], Recipe.objects.only('id', 'title', 'ingredients', 'servings'))
+
+    items = {}
+    for recipe_id, count in slots.items():
+        recipe = recipe_map.get(recipe_id)
+        if recipe is None:
+            continue
+        scale = count / (recipe.servings or 1)
+        for line in recipe.ingredients.splitlines():
+            parsed = parse_line(line)
+            if parsed is None:
+                continue
+            name, quantity, unit = parsed
+            item = items.setdefault((name, unit), {'name': name, 'quantity': None, 'unit': unit, 'recipes': []})
+            if quantity is not None:
+                item['quantity'] = (item['quantity'] or 0) + quantity * scale
+            if recipe.title not in item['recipes']:
+                item['recipes'].append(recipe.title)
+
+    result = []
+    for item in sorted(items.values(), key=lambda item: (item['name'], item['unit'] or '')):
+        if item['quantity'] is not None:
+            item['quantity'], item['unit'] = _display(item['quantity'], item['unit'])
+        result.append(item)
+    return result
+
+
+def get_shopping_list(plan):
+    """
+    The plan's shopping list, cached per plan version. The version moves on
+    every plan save and whenever a referenced recipe changes, so stale keys
+    are simply never read again.
+    """
+    key = f'shopping-list:{plan.pk}:{plan.version}'
+    return cache.get_or_set(key, lambda: build_shopping_list(plan.structured_plan), CACHE_SECONDS)
@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Profile
+from .models import Profile, MealPlan, MealPlanTemplate, Recipe, RecipeIngredient, Message, Conversation, WeeklyUpdate, FoodLog, LabResult, Tag
+from . import dietary, images, realtime, recipe_search, social, storage
+from .conditional import touch
+from .dashboard import invalidate_dashboard_stats
+from .meal_plans import MACRO_FIELDS, load_plan_recipes, nutrition_summary, refresh_nutrition_summaries
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -12,3 +18,206 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'profile'):
         instance.profile.save()
+
+@receiver(post_save, sender=Message)
+def update_conversation_on_save(sender, instance, created, **kwargs):
+    if created:
+        Conversation.record_message(instance)
+        from .serializers import MessageSerializer
+        realtime.publish(
+            [instance.recipient_id, instance.sender_id], 'message', MessageSerializer(instance).data
+        )
+    else:
+        # Edits (e.g. toggling is_read in the admin) are rare; recount the pair
+        Conversation.rebuild(instance.sender_id, instance.recipient_id)
+
+@receiver(post_delete, sender=Message)
+def update_conversation_on_delete(sender, instance, **kwargs):
+    Conversation.rebuild(instance.sender_id, instance.recipient_id)
+
+# Dashboard stats cache: only flips of the fields the counts depend on
+# invalidate it, so the Profile save on every login doesn't
+DASHBOARD_PROFILE_FIELDS = ('is_approved', 'is_nutritionist', 'nutritionist_id')
+
+@receiver(post_init, sender=Profile)
+def remember_profile_state(sender, instance, **kwargs):
+    instance._dashboard_state = tuple(instance.__dict__.get(f) for f in DASHBOARD_PROFILE_FIELDS)
+
+@receiver(post_save, sender=Profile)
+def invalidate_stats_on_profile_save(sender, instance, created, **kwargs):
+    state = tuple(getattr(instance, f) for f in DASHBOARD_PROFILE_FIELDS)
+    if created or state != instance._dashboard_state:
+        invalidate_dashboard_stats()
+    instance._dashboard_state = state
+
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=MealPlan)
+@receiver(post_delete, sender=MealPlan)
+def invalidate_stats(sender, **kwargs):
+    invalidate_dashboard_stats()
+
+# Materialized nutrition summaries for meal plans and templates
+@receiver(pre_save, sender=MealPlan)
+@receiver(pre_save, sender=MealPlanTemplate)
+def compute_nutrition_summary(sender, instance, **kwargs):
+    recipe_map = load_plan_recipes([instance.structured_plan])
+    instance.nutrition_summary = nutrition_summary(instance.structured_plan, recipe_map)
+    instance._plan_recipe_ids = list(recipe_map)
+
+@receiver(post_save, sender=MealPlan)
+@receiver(post_save, sender=MealPlanTemplate)
+def sync_plan_recipes(sender, instance, **kwargs):
+    recipe_ids = getattr(instance, '_plan_recipe_ids', None)
+    if recipe_ids is not None:
+        instance.recipes.set(recipe_ids)
+
+# Recipe state as loaded, which the post_save handlers below each compare
+# their own fields against; one snapshot per load rather than one per handler
+SHOPPING_LIST_FIELDS = ('title', 'ingredients', 'servings')
+# Only edits to the searched text re-index, not macro or image saves
+SEARCH_TEXT_FIELDS = tuple(field for field, _, _ in recipe_search.SEARCH_FIELDS)
+RECIPE_TRACKED_FIELDS = tuple(dict.fromkeys(SHOPPING_LIST_FIELDS + MACRO_FIELDS + SEARCH_TEXT_FIELDS))
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_state(sender, instance, **kwargs):
+    instance._saved_state = {f: instance.__dict__.get(f) for f in RECIPE_TRACKED_FIELDS}
+    storage.remember_refs(instance)
+
+def recipe_changed(instance, fields, update_fields=None):
+    # Fields never loaded read as None on both sides, so they count as
+    # unchanged; so do edits a save(update_fields=...) didn't write
+    if update_fields is not None:
+        fields = [f for f in fields if f in update_fields]
+    return any(instance.__dict__.get(f) != instance._saved_state[f] for f in fields)
+
+# Plan versions, which key the cached shopping lists
+@receiver(pre_save, sender=MealPlan)
+def bump_plan_version(sender, instance, **kwargs):
+    if not instance._state.adding:
+        # Incremented in the UPDATE, so a save from a stale instance still moves it
+        instance.version = F('version') + 1
+
+@receiver(post_save, sender=MealPlan)
+def reload_plan_version(sender, instance, created, **kwargs):
+    if not created:
+        instance.refresh_from_db(fields=['version'])
+
+@receiver(post_save, sender=Recipe)
+def bump_versions_on_recipe_change(sender, instance, created, update_fields=None, **kwargs):
+    if not created and recipe_changed(instance, SHOPPING_LIST_FIELDS, update_fields):
+        instance.meal_plans.update(version=F('version') + 1, **touch(MealPlan))
+
+@receiver(pre_delete, sender=Recipe)
+def bump_versions_on_recipe_delete(sender, instance, **kwargs):
+    # Before the cascade clears the recipes M2M rows
+    instance.meal_plans.update(version=F('version') + 1, **touch(MealPlan))
+
+@receiver(post_save, sender=Recipe)
+def refresh_summaries_on_macro_change(sender, instance, created, update_fields=None, **kwargs):
+    if not created and recipe_changed(instance, MACRO_FIELDS, update_fields):
+        # Only the plans that reference this recipe, found through the recipes M2M
+        refresh_nutrition_summaries(MealPlan, instance.meal_plans.all())
+        refresh_nutrition_summaries(MealPlanTemplate, instance.meal_plan_templates.all())
+
+# Recipe search: normalized tags, PostgreSQL search vector, fallback index
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, created, update_fields=None, **kwargs):
+    if not created and not recipe_changed(instance, SEARCH_TEXT_FIELDS, update_fields):
+        return
+    if created or recipe_changed(instance, ('tags',), update_fields):
+        names = recipe_search.parse_tags(instance.tags)
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        instance.tag_set.set(Tag.objects.filter(name__in=names))
+    recipe_search.update_search_vector(instance)
+    recipe_search.invalidate_index()
+
+# Canonical ingredients and allergen flags, for dietary filtering
+@receiver(pre_save, sender=Recipe)
+def classify_recipe_ingredients(sender, instance, update_fields=None, **kwargs):
+    if 'ingredients' not in instance.__dict__ or (update_fields is not None and 'ingredients' not in update_fields):
+        return
+    if instance._state.adding or recipe_changed(instance, ('ingredients',)):
+        instance._ingredient_names = dietary.parse_ingredients(instance.ingredients)
+        instance.allergen_flags = dietary.ingredient_flags(instance._ingredient_names)
+
+@receiver(post_save, sender=Recipe)
+def store_recipe_ingredients(sender, instance, **kwargs):
+    names = instance.__dict__.pop('_ingredient_names', None)
+    if names is None:
+        return
+    RecipeIngredient.objects.filter(recipe=instance).exclude(name__in=names).delete()
+    RecipeIngredient.objects.bulk_create(
+        [RecipeIngredient(recipe=instance, name=name) for name in names], ignore_conflicts=True,
+    )
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_state(sender, instance, update_fields=None, **kwargs):
+    # After the handlers above: what this save wrote is the new baseline
+    for field in RECIPE_TRACKED_FIELDS:
+        if update_fields is None or field in update_fields:
+            instance._saved_state[field] = instance.__dict__.get(field)
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, **kwargs):
+    recipe_search.invalidate_index()
+
+# Blob reference counts for content-addressed media
+# (Recipe references are remembered by remember_recipe_state)
+@receiver(post_init, sender=LabResult)
+@receiver(post_init, sender=MealPlan)
+@receiver(post_init, sender=WeeklyUpdate)
+@receiver(post_init, sender=FoodLog)
+def remember_blob_refs(sender, instance, **kwargs):
+    storage.remember_refs(instance)
+
+@receiver(post_save, sender=LabResult)
+@receiver(post_save, sender=MealPlan)
+@receiver(post_save, sender=WeeklyUpdate)
+@receiver(post_save, sender=FoodLog)
+@receiver(post_save, sender=Recipe)
+def count_blob_refs(sender, instance, created, **kwargs):
+    storage.sync_refs(instance, created)
+
+@receiver(post_delete, sender=LabResult)
+@receiver(post_delete, sender=MealPlan)
+@receiver(post_delete, sender=WeeklyUpdate)
+@receiver(post_delete, sender=FoodLog)
+@receiver(post_delete, sender=Recipe)
+def release_blob_refs(sender, instance, **kwargs):
+    storage.release_refs(instance)
+
+# Strip metadata and build renditions for uploaded images
+@receiver(post_save, sender=WeeklyUpdate)
+@receiver(post_save, sender=FoodLog)
+@receiver(post_save, sender=Recipe)
+def process_uploaded_images(sender, instance, **kwargs):
+    fields = images.pending_fields(instance)
+    if not fields:
+        return
+    if images.should_process_inline(instance, fields):
+        images.process_images(instance)
+    else:
+        # The pool's threads can't see the row until it's committed
+        transaction.on_commit(lambda: images.process_later(sender, instance.pk))
+
+# Social feed (rebuilt once per write) and incrementally kept leaderboard stats
+@receiver(post_save, sender=WeeklyUpdate)
+def record_progress(sender, instance, created, **kwargs):
+    social.record_update(instance, created)
+    transaction.on_commit(social.rebuild_feed)
+
+@receiver(post_delete, sender=WeeklyUpdate)
+def forget_progress(sender, instance, **kwargs):
+    social.recompute_stats(instance.user_id)
+    transaction.on_commit(social.rebuild_feed)
+
+@receiver(post_init, sender=Profile)
+def remember_profile_weight(sender, instance, **kwargs):
+    instance._saved_weight = instance.__dict__.get('weight')
+
+@receiver(post_save, sender=Profile)
+def rebuild_feed_on_weight_change(sender, instance, **kwargs):
+    # Feed entries show progress against the profile's starting weight
+    if 'weight' in instance.__dict__ and instance.weight != instance._saved_weight:
+        transaction.on_commit(social.rebuild_feed)
+    instance._saved_weight = instance.__dict__.get('weight')
@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ProgressStats, WeeklyUpdate
+
+FEED_CACHE_KEY = 'social:feed'
+# The newest updates kept in the shared cached feed; older pages hit the database
+FEED_SIZE = 200
+# Rebuilt on every write; the timeout only bounds staleness from writes
+# that bypass signals (e.g. a username change)
+FEED_CACHE_SECONDS = 60 * 60
+FEED_PAGE_SIZE = 20
+LEADERBOARD_SIZE = 20
+# Weekly updates at most this far apart keep a streak going
+STREAK_GAP = timedelta(days=10)
+
+FEED_COLUMNS = ('id', 'user_id', 'user__username', 'date', 'current_weight', 'user__profile__weight')
+
+
+def _entry(row):
+    update_id, user_id, username, day, weight, first_weight = row
+    weight_diff = weight - first_weight if first_weight else 0
+    return {
+        'username': username,
+        'weight_lost': round(weight_diff * -1, 1),  # Positive means lost, negative means gained
+        'current_weight': weight,
+        'date': day.isoformat(),
+        'id': update_id,
+        'user_id': user_id,
+    }
+
+
+def _feed_queryset():
+    return WeeklyUpdate.objects.order_by('-date', '-id').values_list(*FEED_COLUMNS)
+
+
+def rebuild_feed():
+    entries = [_entry(row) for row in _feed_queryset()[:FEED_SIZE]]
+    cache.set(FEED_CACHE_KEY, entries, FEED_CACHE_SECONDS)
+    return entries
+
+
+def get_feed():
+    entries = cache.get(FEED_CACHE_KEY)
+    return rebuild_feed() if entries is None else entries
+
+
+def feed_page(exclude_user_id, position=None, limit=FEED_PAGE_SIZE):
+    """
+    Up to `limit` feed entries from other users, older than `position`
+    ((date, id) of the last entry seen) when given. Served from the cached
+    feed; only pages past its end query the database.
+    """
+    feed = get_feed()
+    entries = feed
+    if position is not None:
+        cutoff = (position[0].isoformat(), position[1])
+        entries = [e for e in entries if (e['date'], e['id']) < cutoff]
+    page = [e for e in entries if e['user_id'] != exclude_user_id][:limit]
+    if len(page) == limit or len(feed) < FEED_SIZE:
+        return page
+
+    # Ran off the end of the cached window
+    queryset = _feed_queryset().exclude(user_id=exclude_user_id)
+    last = (date.fromisoformat(page[-1]['date']), page[-1]['id']) if page else position
+    if last is not None:
+        queryset = queryset.filter(Q(date__lt=last[0]) | Q(date=last[0], id__lt=last[1]))
+    return page + [_entry(row) for row in queryset[:limit - len(page)]]
+
+
+def public_entry(entry):
+    return {key: value for key, value in entry.items() if key != 'user_id'}
+
+
+# Leaderboard stats, folded one update at a time
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def apply_update(stats, day, weight):
+    """Fold an update newer than any already applied into `stats`."""
+    if stats.last_update_date is not None and day - stats.last_update_date <= STREAK_GAP:
+        stats.streak += 1
+    else:
+        stats.streak = 1
+    stats.best_streak = max(stats.best_streak, stats.streak)
+
+    if stats.month != _month(day):
+        stats.month = _month(day)
+        # Measured from the last weight before the month, if there is one
+        stats.month_start_weight = stats.latest_weight if stats.latest_weight is not None else weight
+    stats.latest_weight = weight
+    stats.last_update_date = day
+
+
+def recompute_stats(user_id):
+    """Rebuild a user's stats from their own updates, for edits and deletes."""
+    stats = ProgressStats(user_id=user_id)
+    rows = WeeklyUpdate.objects.filter(user_id=user_id).order_by('date', 'id').values_list('date', 'current_weight')
+    for day, weight in rows.iterator():
+        apply_update(stats, day, weight)
+    if stats.last_update_date is None:
+        ProgressStats.objects.filter(user_id=user_id).delete()
+        return None
+    stats.save()
+    return stats
+
+
+def record_update(update, created):
+    """
+    Keep the user's leaderboard stats current. A new latest update is
+    folded in directly; anything else (an edit, a backdated row) rebuilds
+    that one user's stats.
+    """
+    with transaction.atomic():
+        stats = ProgressStats.objects.select_for_update().filter(user_id=update.user_id).first()
+        if created and stats is not None and update.date >= stats.last_update_date:
+            apply_update(stats, update.date, update.current_weight)
+            stats.save()
+        else:
+            recompute_stats(update.user_id)
+
+
+def leaderboard(mode):
+    """Top users for `mode`: 'lost_month' (this calendar month) or 'streak'."""
+    today = timezone.now().date()
+    queryset = ProgressStats.objects.all()
+    if mode == 'lost_month':
+        queryset = queryset.filter(month=_month(today)).annotate(score=F('month_start_weight') - F('latest_weight'))
+    else:
+        queryset = queryset.annotate(score=F('best_streak'))
+    rows = queryset.order_by('-score', 'user_id').values_list(
+        'user__username', 'score', 'streak', 'last_update_date', 'latest_weight',
+    )[:LEADERBOARD_SIZE]
+    return [
+        {
+            'username': username,
+            'score': round(score, 1),
+            # A streak only counts while it can still be extended
+            'current_streak': streak if today - last_update <= STREAK_GAP else 0,
+            'latest_weight': weight,
+        }
+        for username, score, streak, last_update, weight in rows
+    ]
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Blob, LabResult, MealPlan, WeeklyUpdate, FoodLog, Recipe
+
+# File fields whose values count as references to a blob. Models with a
+# `renditions` JSON (core.images) also reference their current renditions.
+REFERENCING_FIELDS = {
+    LabResult: ('file',),
+    MealPlan: ('file',),
+    WeeklyUpdate: ('photo_front', 'photo_side', 'photo_back'),
+    FoodLog: ('image',),
+    Recipe: ('image',),
+}
+
+# Unreferenced blobs younger than this may belong to a row that is still
+# being saved
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file as <upload_to>/<sha256 prefix>.<ext>, hashing while
+    it streams to disk. Identical uploads to the same directory share one
+    file and one Blob row, so a repeat upload only costs the hashing.
+    Keeping the upload_to directory in the name lets the media view keep
+    authorizing by path.
+    """
+    def get_available_name(self, name, max_length=None):
+        # _save derives the real name from the content
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        ext = os.path.splitext(name)[1].lower()[:10]
+        incoming = os.path.join(self.location, '.incoming')
+        os.makedirs(incoming, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=incoming, delete=False) as tmp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+
+        name = posixpath.join(directory, f'{digest.hexdigest()[:32]}{ext}')
+        full_path = self.path(name)
+        try:
+            with transaction.atomic():
+                # The row lock keeps gc_blobs from deleting the file under us
+                blob, created = Blob.objects.select_for_update().get_or_create(name=name, defaults={'size': size})
+                if not created:
+                    blob.save(update_fields=['updated_at'])
+                if not os.path.exists(full_path):
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.replace(tmp.name, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+        return name
+
+
+def _loaded_names(instance):
+    """
+    {field: [blob names]} for the reference fields already loaded on
+    `instance`; deferred fields are left out rather than fetched.
+    """
+    fields = REFERENCING_FIELDS[instance._meta.concrete_model]
+    loaded = instance.__dict__
+    names = {}
+    for field in fields:
+        if field in loaded:
+            value = loaded[field]
+            name = getattr(value, 'name', value)
+            names[field] = [name] if name else []
+    if 'renditions' in loaded:
+        for field in fields:
+            entry = (loaded['renditions'] or {}).get(field) or {}
+            if field in names and entry.get('source') in names[field]:
+                names[field] += [name for label, name in entry.items() if label != 'source']
+    return names
+
+
+def remember_refs(instance):
+    instance._blob_refs = _loaded_names(instance)
+
+
+def _adjust(counts, sign):
+    for name, count in counts.items():
+        Blob.objects.filter(name=name).update(ref_count=Greatest(F('ref_count') + sign * count, 0))
+    if sign < 0 and counts:
+        # Delete what this left unreferenced once it commits. Blobs still in
+        # the grace period may be about to gain a reference and wait for
+        # gc_blobs. robust: a failed unlink shouldn't fail a committed request.
+        names = list(counts)
+        transaction.on_commit(lambda: collect_garbage(names=names), robust=True)
+
+
+def sync_refs(instance, created=False):
+    """Apply the reference changes since remember_refs() to the blob counts."""
+    before = {} if created else getattr(instance, '_blob_refs', {})
+    after = _loaded_names(instance)
+    old, new = Counter(), Counter()
+    for field, names in after.items():
+        # A field deferred when the row was loaded has no baseline to diff against
+        if created or field in before:
+            new.update(names)
+            old.update(before.get(field, []))
+    _adjust(new - old, 1)
+    _adjust(old - new, -1)
+    instance._blob_refs = after
+
+
+def release_refs(instance):
+    _adjust(Counter(name for names in getattr(instance, '_blob_refs', {}).values() for name in names), -1)
+
+
+def delete_released(names):
+    """
+    Delete these blobs once the transaction commits, without waiting out
+    the grace period, if nothing references them by then. For originals
+    that shouldn't stay on disk, such as photos still carrying GPS
+    metadata. A blob saved again since this call has a newer updated_at
+    and is left to gc_blobs, since its new row may not be committed yet.
+    """
+    seen = dict(Blob.objects.filter(name__in=names).values_list('name', 'updated_at'))
+
+    def delete():
+        for name, updated_at in seen.items():
+            with transaction.atomic():
+                # The lock _save takes before reusing a blob
+                blob = Blob.objects.select_for_update().filter(name=name, ref_count=0, updated_at=updated_at).first()
+                if blob is not None:
+                    default_storage.delete(blob.name)
+                    blob.delete()
+
+    transaction.on_commit(delete, robust=True)
+
+
+def count_references():
+    """Recount every blob reference from the tables themselves."""
+    counts = Counter()
+    for model, fields in REFERENCING_FIELDS.items():
+        columns = list(fields) + (['renditions'] if hasattr(model, 'renditions') else [])
+        for instance in model.objects.only(*columns).iterator(chunk_size=500):
+            for names in _loaded_names(instance).values():
+                counts.update(names)
+    return counts
+
+
+def _stale_blobs():
+    return Blob.objects.filter(ref_count=0, updated_at__lt=timezone.now() - GC_GRACE_PERIOD)
+
+
+def collect_garbage(dry_run=False, names=None):
+    """Delete blobs that are unreferenced and past the grace period."""
+    stale = _stale_blobs()
+    if names is not None:
+        stale = stale.filter(name__in=names)
+    deleted, freed = 0, 0
+    for blob_id in stale.values_list('id', flat=True).iterator():
+        with transaction.atomic():
+            # Checked again under the lock _save takes before reusing a blob
+            blob = _stale_blobs().select_for_update().filter(id=blob_id).first()
+            if blob is None:
+                continue
+            if not dry_run:
+                default_storage.delete(blob.name)
+                blob.delete()
+            deleted += 1
+            freed += blob.size
+    return deleted, freed
@@ -0,0 +1,44 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from .authentication import authenticate_token_request
+from .realtime import get_broker
+
+KEEPALIVE_SECONDS = 25
+
+
+def _format_event(event):
+    data = json.dumps(event['data'], cls=DjangoJSONEncoder)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def message_stream(request):
+    """
+    Server-Sent Events stream of new messages and read receipts for the
+    authenticated user. Needs the ASGI server; under WSGI the response
+    would be buffered.
+    """
+    user = await sync_to_async(authenticate_token_request)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    async def events():
+        yield 'retry: 5000\n\n'
+        # The ASGI handler cancels this generator on disconnect, which
+        # unwinds the subscription
+        async with get_broker().subscribe(user.id) as queue:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield _format_event(event)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
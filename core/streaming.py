@@ -0,0 +1,38 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+_DONE = object()
+
+
+async def aiter_sync(iterator):
+    """
+    Hand a blocking iterator to the ASGI handler one item at a time. Given a
+    sync iterator, Django reads it whole with sync_to_async(list) before
+    sending a byte. Every step runs in the same thread (thread_sensitive), so
+    database cursors opened by the iterator stay on their connection.
+    """
+    iterator = iter(iterator)
+    step = sync_to_async(next, thread_sensitive=True)
+    while True:
+        item = await step(iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+def is_asgi(request):
+    # DRF wraps the Django request
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def for_server(request, response):
+    """
+    Make a streaming response stream under either server. WSGI keeps the
+    sync iterator (FileResponse keeps wsgi.file_wrapper and sendfile());
+    under ASGI it is swapped for aiter_sync(). The original iterator's
+    close() stays registered, so response.close() still releases its
+    cursor or file.
+    """
+    if is_asgi(request) and not response.is_async:
+        response.streaming_content = aiter_sync(response.streaming_content)
+    return response
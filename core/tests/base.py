@@ -0,0 +1,43 @@
+import shutil
+import tempfile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+PASSWORD = 'password123'
+
+
+class TokenAuthMixin:
+    """Bearer-token authentication for APITestCase clients."""
+
+    def login(self, username, client=None):
+        """
+        Log in through the token view, whose tokens carry the user and profile
+        claims, and send the access token with later requests from `client`
+        (self.client by default). Returns the access/refresh pair.
+        """
+        client = client or self.client
+        response = client.post(reverse('token_obtain_pair'), {'username': username, 'password': PASSWORD}, format='json')
+        client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        return response.data
+
+    def authenticate(self, user, client=None):
+        # No custom claims, unlike the login view's tokens, so requests load the user
+        token = str(RefreshToken.for_user(user).access_token)
+        (client or self.client).credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+
+
+class TempMediaMixin:
+    """Points MEDIA_ROOT at a fresh directory, removed after each test."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.use_settings(MEDIA_ROOT=self.media_root)
+
+    def use_settings(self, **settings):
+        # For overrides that depend on media_root; fixed ones can decorate the class
+        override = override_settings(**settings)
+        override.enable()
+        self.addCleanup(override.disable)
@@ -0,0 +1,62 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from core.models import Profile
+from .base import TokenAuthMixin
+
+class StatelessAuthenticationTests(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        self.nutritionist = User.objects.create_user(username='nutritionist', password='password123')
+        profile = Profile.objects.get(user=self.nutritionist)
+        profile.is_nutritionist = True
+        profile.is_approved = True
+        profile.save()
+
+    def test_permission_check_uses_claims(self):
+        self.login('nutritionist')
+        url = reverse('nutritionist_notes')
+        # Only the notes query itself; no User or Profile lookup
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_full_row_loaded_on_demand(self):
+        User.objects.filter(pk=self.nutritionist.pk).update(email='doc@example.com')
+        self.login('nutritionist')
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'doc@example.com')
+        self.assertTrue(response.data['profile']['is_nutritionist'])
+
+    def test_refresh_restamps_claims(self):
+        patient = User.objects.create_user(username='patient', password='password123')
+        refresh = self.login('patient')['refresh']
+        Profile.objects.filter(user=patient).update(is_nutritionist=True)
+
+        # dj_rest_auth registers its own 'token_refresh' name, so use the path the SPA calls
+        response = self.client.post('/api/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        response = self.client.get(reverse('nutritionist_notes'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_saves_through_the_api_fire_model_signals(self):
+        self.login('nutritionist')
+        saved = []
+        receiver = lambda sender, instance, **kwargs: saved.append((sender, instance.pk))
+        for model in (User, Profile):
+            post_save.connect(receiver, sender=model)
+            self.addCleanup(post_save.disconnect, receiver, sender=model)
+
+        updated_at = Profile.objects.get(user=self.nutritionist).updated_at
+        response = self.client.put(reverse('profile'), {'weight': 70}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile = Profile.objects.get(user=self.nutritionist)
+        self.assertEqual(saved, [(Profile, profile.pk)])
+        self.assertEqual(profile.weight, 70)
+        self.assertGreater(profile.updated_at, updated_at)
+
+        self.client.put(reverse('profile'), {'first_name': 'Ana'}, format='json')
+        self.assertIn((User, self.nutritionist.pk), saved)
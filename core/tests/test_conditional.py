@@ -0,0 +1,63 @@
+from datetime import date
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from core.models import MealPlan, Recipe
+from .base import TokenAuthMixin
+
+class ConditionalGetTests(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testclient', password='password123')
+        # The login view's tokens carry the user claims, so no user query per request
+        self.login('testclient')
+        self.recipe = Recipe.objects.create(
+            title='Oats', prep_time_minutes=5, ingredients='Oats', instructions='Mix.',
+            calories=300, protein_g=10, carbs_g=50, fat_g=5,
+        )
+        self.plan = MealPlan.objects.create(
+            user=self.user, start_date=date(2026, 1, 5), end_date=date(2026, 1, 11),
+            structured_plan={'Monday': {'Breakfast': self.recipe.id}},
+        )
+
+    def revalidate(self, url, etag, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response
+
+    def test_not_modified_until_content_changes(self):
+        url = reverse('recipe_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        # A single version query; the serializer never runs
+        self.assertEqual(self.revalidate(url, etag, 1).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.recipe.title = 'Porridge'
+        self.recipe.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_meal_plans_track_embedded_recipes(self):
+        for url in (reverse('meal_plans'), reverse('meal_plan_detail', args=[self.plan.id])):
+            url += '?expand=recipes'
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.revalidate(url, etag, 1).status_code, status.HTTP_304_NOT_MODIFIED)
+            self.recipe.servings = 2
+            self.recipe.save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        other = User.objects.create_user(username='other', password='password123')
+        foreign = MealPlan.objects.create(user=other, start_date=date(2026, 1, 5), end_date=date(2026, 1, 11))
+        response = self.client.get(reverse('meal_plan_detail', args=[foreign.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_profile_changes_move_the_etag(self):
+        url = reverse('profile')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag, 1).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.put(url, {'first_name': 'Ana', 'goals': 'Strength'}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], 'Ana')
@@ -0,0 +1,77 @@
+import io
+import os
+from io import StringIO
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import Blob, FoodLog
+from .base import TempMediaMixin, TokenAuthMixin
+
+def phone_photo():
+    exif = Image.Exif()
+    exif[0x010f] = 'PhoneMaker'
+    exif[0x0112] = 6  # Rotated 90 degrees
+    buffer = io.BytesIO()
+    Image.new('RGB', (3000, 2000), 'green').save(buffer, 'JPEG', exif=exif.tobytes())
+    return SimpleUploadedFile('IMG_0001.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+class ImagePipelineTests(TempMediaMixin, TokenAuthMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='patient', password='password123')
+        self.login('patient')
+
+    def test_upload_is_reencoded_with_renditions(self):
+        response = self.client.post(reverse('food_logs'), {
+            'date': '2026-03-02', 'meal_type': 'Lunch', 'content': 'Salad', 'image': phone_photo(),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data['renditions']['image']), {'medium', 'small', 'thumb'})
+
+        log = FoodLog.objects.get()
+        self.assertRegex(log.image.name, r'^food_logs/[0-9a-f]{32}\.webp$')
+        # The raw upload is released (and deleted on commit); the outputs are referenced
+        refs = dict(Blob.objects.values_list('name', 'ref_count'))
+        self.assertEqual(refs.pop(log.image.name), 1)
+        self.assertEqual(sorted(refs.values()), [0, 1, 1, 1])
+        with Image.open(log.image.path) as image:
+            self.assertEqual(image.size, (1365, 2048))
+            self.assertNotIn('exif', image.info)
+        with Image.open(log.image.storage.path(log.renditions['image']['thumb'])) as thumb:
+            self.assertEqual(max(thumb.size), 160)
+
+        response = self.client.get(response.data['renditions']['image']['thumb'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+    def test_raw_upload_is_deleted_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            log = FoodLog.objects.create(user=self.user, date=date(2026, 3, 2), meal_type='Lunch', content='Soup', image=phone_photo())
+        names = [log.image.name, *(name for label, name in log.renditions['image'].items() if label != 'source')]
+        self.assertEqual(sorted(Blob.objects.values_list('name', flat=True)), sorted(names))
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'food_logs'))), 4)
+
+        # An original another entry still uses (its processing is queued) stays
+        with override_settings(IMAGE_SYNC_MAX_BYTES=0):
+            raw = FoodLog.objects.create(user=self.user, date=date(2026, 3, 3), meal_type='Lunch', content='Soup', image=phone_photo()).image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodLog.objects.create(user=self.user, date=date(2026, 3, 4), meal_type='Lunch', content='Soup', image=phone_photo())
+        self.assertTrue(Blob.objects.filter(name=raw, ref_count=1).exists())
+
+    @override_settings(IMAGE_SYNC_MAX_BYTES=0)
+    def test_large_uploads_are_deferred(self):
+        log = FoodLog.objects.create(user=self.user, date=date(2026, 3, 2), meal_type='Lunch', content='Soup', image=phone_photo())
+        log.refresh_from_db()
+        self.assertTrue(log.image.name.endswith('.jpg'))
+
+        call_command('process_images', stdout=StringIO())
+        log.refresh_from_db()
+        self.assertTrue(log.image.name.endswith('.webp'))
+        self.assertEqual(log.renditions['image']['source'], log.image.name)
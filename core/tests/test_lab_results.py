@@ -1,14 +1,25 @@
 
+import hashlib
 import os
+import shutil
+import tempfile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
-from core.models import LabResult
+from core.models import LabResult, UploadSession
+from .base import TempMediaMixin, TokenAuthMixin
 
 class LabResultTests(APITestCase):
     def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
         self.user = User.objects.create_user(username='testclient', password='password123')
         self.token = self.get_token(self.user)
         self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + self.token)
@@ -35,3 +46,56 @@ class LabResultTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(LabResult.objects.count(), 1)
         self.assertEqual(LabResult.objects.get().title, 'Test Lab Result')
+
+class ChunkedUploadTests(TempMediaMixin, TokenAuthMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_settings(CHUNKED_UPLOAD_DIR=os.path.join(self.media_root, 'parts'))
+        self.user = User.objects.create_user(username='testclient', password='password123')
+        self.login('testclient')
+        self.content = b'%PDF-1.4 scanned bloods'
+
+    def start(self, sha256=None):
+        response = self.client.post(reverse('uploads'), {
+            'filename': 'bloods.pdf', 'size': len(self.content),
+            'sha256': sha256 or hashlib.sha256(self.content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return reverse('upload_detail', args=[response.data['id']]), response.data['id']
+
+    def put_chunk(self, url, start, end):
+        return self.client.put(
+            url, self.content[start:end + 1], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(self.content)}',
+        )
+
+    def test_resumable_upload_attaches_file(self):
+        url, upload_id = self.start()
+        self.assertEqual(self.put_chunk(url, 0, 9).data['offset'], 10)
+        # A retried chunk is accepted; a gap is rejected with the offset to resume from
+        self.assertEqual(self.put_chunk(url, 0, 9).data['offset'], 10)
+        response = self.put_chunk(url, 15, 22)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 10)
+
+        self.assertEqual(self.client.get(url).data['offset'], 10)
+        self.put_chunk(url, 10, 22)
+        response = self.client.post(reverse('upload_complete', args=[upload_id]))
+        self.assertEqual(response.data['status'], 'complete')
+
+        response = self.client.post(reverse('lab_results'), {'title': 'Bloods', 'upload_id': upload_id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with LabResult.objects.get().file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'parts')), [])
+
+    def test_checksum_mismatch_discards_upload(self):
+        url, upload_id = self.start(sha256='0' * 64)
+        self.put_chunk(url, 0, len(self.content) - 1)
+        response = self.client.post(reverse('upload_complete', args=[upload_id]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(UploadSession.objects.exists())
+
+        response = self.client.post(reverse('lab_results'), {'title': 'Bloods', 'upload_id': upload_id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
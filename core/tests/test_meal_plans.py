@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from core.dietary import normalize_ingredient
+from core.models import MealPlan, MealPlanTemplate, Recipe
+from core.shopping import parse_line
+from .base import TokenAuthMixin
+
+class MealPlanTestCase(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testclient', password='password123')
+        self.authenticate(self.user)
+
+        self.oats = self.create_recipe('Oats', calories=300, protein_g=10, carbs_g=50, fat_g=5)
+        self.salad = self.create_recipe('Salad', calories=200, protein_g=20.5, carbs_g=10, fat_g=8)
+        start = date(2026, 1, 5)
+        self.plan = MealPlan.objects.create(
+            user=self.user, start_date=start, end_date=start + timedelta(days=6),
+            structured_plan={
+                'Monday': {'Breakfast': self.oats.id, 'Lunch': self.salad.id},
+                'Tuesday': {'Breakfast': str(self.oats.id), 'Dinner': 99999},
+            }
+        )
+        MealPlan.objects.create(
+            user=self.user, start_date=start - timedelta(days=7), end_date=start - timedelta(days=1),
+            structured_plan={'Monday': {'Lunch': self.salad.id}}
+        )
+
+    def create_recipe(self, title, **macros):
+        return Recipe.objects.create(
+            title=title, prep_time_minutes=5, ingredients='1 cup water', instructions='Mix.', **macros
+        )
+
+class RecipeExpansionTests(MealPlanTestCase):
+    def test_list_expands_recipes_in_one_query(self):
+        # user lookup + ETag version + meal plans + one batched recipe query
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('meal_plans'), {'expand': 'recipes'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        plan = response.data[0]
+        self.assertEqual(set(plan['recipes']), {str(self.oats.id), str(self.salad.id)})
+        self.assertEqual(plan['recipes'][str(self.oats.id)]['title'], 'Oats')
+        self.assertEqual(plan['macro_totals'], {'calories': 800, 'protein_g': 40.5, 'carbs_g': 110, 'fat_g': 18})
+
+    def test_detail_expand(self):
+        url = reverse('meal_plan_detail', args=[self.plan.id])
+        response = self.client.get(url)
+        self.assertNotIn('recipes', response.data)
+        response = self.client.get(url, {'expand': 'recipes'})
+        self.assertEqual(response.data['macro_totals']['calories'], 800)
+
+class NutritionSummaryTests(MealPlanTestCase):
+    def test_summary_stored_on_save(self):
+        self.plan.refresh_from_db()
+        self.assertEqual(self.plan.nutrition_summary['days']['Monday']['calories'], 500)
+        self.assertEqual(self.plan.nutrition_summary['days']['Tuesday']['calories'], 300)
+        self.assertEqual(self.plan.nutrition_summary['total']['protein_g'], 40.5)
+        self.assertEqual(set(self.plan.recipes.values_list('id', flat=True)), {self.oats.id, self.salad.id})
+
+    def test_recipe_macro_change_refreshes_referencing_plans(self):
+        template = MealPlanTemplate.objects.create(name='Week', structured_plan={'Monday': {'Lunch': self.oats.id}})
+        self.oats.calories = 350
+        self.oats.save()
+        self.plan.refresh_from_db()
+        template.refresh_from_db()
+        self.assertEqual(self.plan.nutrition_summary['total']['calories'], 900)
+        self.assertEqual(template.nutrition_summary['total']['calories'], 350)
+
+        response = self.client.get(reverse('meal_plan_detail', args=[self.plan.id]))
+        self.assertEqual(response.data['nutrition_summary']['days']['Monday']['calories'], 550)
+
+class ShoppingListTests(MealPlanTestCase):
+    def test_merges_scales_and_caches_by_version(self):
+        self.oats.servings = 2
+        self.oats.ingredients = '100g rolled oats\n1/2 cup Almond milk\nHoney, to taste'
+        self.oats.save()
+        self.salad.ingredients = '2 cups almond milk\n1 1/2 tbsp olive oil\n2 Eggs'
+        self.salad.save()
+        url = reverse('meal_plan_shopping_list', args=[self.plan.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        items = {item['name']: item for item in response.data['items']}
+        # Oats fill two one-serving slots of a two-serving recipe
+        self.assertEqual((items['rolled oat']['quantity'], items['rolled oat']['unit']), (100, 'g'))
+        self.assertEqual((items['almond milk']['quantity'], items['almond milk']['unit']), (600, 'ml'))
+        self.assertEqual(items['almond milk']['recipes'], ['Oats', 'Salad'])
+        self.assertEqual(items['olive oil']['quantity'], 22.5)
+        self.assertEqual((items['egg']['quantity'], items['egg']['unit']), (2, None))
+        self.assertIsNone(items['honey']['quantity'])
+
+        # Served from the cache until the plan or one of its recipes changes
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).data['items'], response.data['items'])
+        self.salad.ingredients = '1 l almond milk'
+        self.salad.save()
+        items = {item['name']: item for item in self.client.get(url).data['items']}
+        self.assertEqual((items['almond milk']['quantity'], items['almond milk']['unit']), (1.12, 'l'))
+
+        # Two saves from copies loaded at the same version still land on different versions
+        stale = MealPlan.objects.get(pk=self.plan.pk)
+        self.plan.save()
+        stale.save()
+        self.assertEqual(stale.version, self.plan.version + 1)
+        self.assertEqual(MealPlan.objects.get(pk=self.plan.pk).version, stale.version)
+
+        other = User.objects.create_user(username='other', password='password123')
+        self.plan.user = other
+        self.plan.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_leading_unit_is_dropped_but_ingredient_words_kept(self):
+        self.assertEqual(parse_line('2 cloves garlic'), ('garlic', 2, 'clove'))
+        self.assertEqual(parse_line('1 tsp ground cloves'), ('ground clove', 5, 'ml'))
+        self.assertEqual(parse_line('2 cups Almond Milk'), ('almond milk', 480, 'ml'))
+        self.assertEqual(normalize_ingredient('1 tsp ground cloves'), 'ground clove')
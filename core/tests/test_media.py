@@ -0,0 +1,97 @@
+import os
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from core.models import LabResult, Profile
+from .base import TempMediaMixin, TokenAuthMixin
+
+@override_settings(MEDIA_ACCEL_HEADER='')
+class MediaServingTests(TempMediaMixin, TokenAuthMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.media_root, 'lab_results'))
+        with open(os.path.join(self.media_root, 'lab_results', 'scan.pdf'), 'wb') as f:
+            f.write(b'0123456789')
+
+        self.owner = User.objects.create_user(username='owner', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        LabResult.objects.create(user=self.owner, title='Bloods', file='lab_results/scan.pdf')
+        self.url = '/media/lab_results/scan.pdf'
+
+    def test_owner_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.login('other')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+        token = self.login('owner')['access']
+        self.client.credentials()
+        response = self.client.get(self.url, {'token': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_nutritionists_see_their_own_patients_only(self):
+        for username in ('assigned', 'unassigned'):
+            nutritionist = User.objects.create_user(username=username, password='password123')
+            Profile.objects.filter(user=nutritionist).update(is_nutritionist=True, is_approved=True)
+        Profile.objects.filter(user=self.owner).update(nutritionist=User.objects.get(username='assigned'))
+
+        self.login('unassigned')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.login('assigned')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response.close()
+
+    def test_conditional_and_range_requests(self):
+        self.login('owner')
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response.close()
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3', HTTP_IF_RANGE=etag)
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        # A stale If-Range validator gets the whole file
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response.close()
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_accel_redirect_and_traversal(self):
+        self.login('owner')
+        with override_settings(MEDIA_ACCEL_HEADER='X-Accel-Redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/lab_results/scan.pdf')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_ACCEL_HEADER='X-Accel-Redirect'):
+            self.assertEqual(self.client.get('/media/../manage.py').status_code, status.HTTP_404_NOT_FOUND)
+        self.client.credentials()
+        self.assertEqual(self.client.get('/media/recipes/../lab_results/scan.pdf').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_streams_block_by_block_under_asgi(self):
+        token = (await sync_to_async(self.login)('owner'))['access']
+        headers = {'Authorization': 'Bearer ' + token}
+        response = await self.async_client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'0123456789')
+
+        response = await self.async_client.get(self.url, headers={**headers, 'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'2345')
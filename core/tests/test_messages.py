@@ -1,9 +1,13 @@
 
+import asyncio
+import json
+from asgiref.sync import sync_to_async
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 from core.models import Profile, Message
+from core.realtime import get_broker
 
 class MessageTests(APITestCase):
     def setUp(self):
@@ -74,3 +78,89 @@ class MessageTests(APITestCase):
         self.assertEqual(response.data['updated_count'], 2)
         self.assertFalse(Message.objects.filter(is_read=False).exists())
 
+
+    def test_conversation_summary(self):
+        Message.objects.create(sender=self.nutritionist, recipient=self.client_user, content="Msg 1")
+        Message.objects.create(sender=self.nutritionist, recipient=self.client_user, content="Msg 2")
+
+        self.authenticate_client()
+        response = self.client.get(reverse('message_threads'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['username'], 'nutritionist')
+        self.assertEqual(response.data[0]['last_message_preview'], 'Msg 2')
+        self.assertEqual(response.data[0]['unread_count'], 2)
+        # No partner email or other profile fields
+        self.assertEqual(set(response.data[0]), {
+            'username', 'last_message_id', 'last_message_preview', 'last_message_at', 'unread_count',
+        })
+
+        response = self.client.get(reverse('messages_unread_count'))
+        self.assertEqual(response.data['unread_count'], 2)
+
+        self.client.post(reverse('messages_mark_read'), {'sender_username': 'nutritionist'}, format='json')
+        response = self.client.get(reverse('messages_unread_count'))
+        self.assertEqual(response.data['unread_count'], 0)
+
+        # The sender's side is untouched by the recipient reading
+        self.authenticate_nutritionist()
+        response = self.client.get(reverse('message_threads'))
+        self.assertEqual(response.data[0]['username'], 'client')
+        self.assertEqual(response.data[0]['unread_count'], 0)
+
+    def test_admin_conversation_list(self):
+        Message.objects.create(sender=self.nutritionist, recipient=self.client_user, content="Msg 1")
+        self.authenticate_client()
+        response = self.client.get(reverse('conversation_list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.filter(pk=self.nutritionist.pk).update(is_staff=True)
+        self.authenticate_nutritionist()
+        response = self.client.get(reverse('conversation_list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([user['username'] for user in response.data], ['client'])
+
+    def test_thread_with_one_partner(self):
+        other = User.objects.create_user(username='other', password='password123')
+        Message.objects.create(sender=self.nutritionist, recipient=self.client_user, content="Hi")
+        Message.objects.create(sender=other, recipient=self.client_user, content="Elsewhere")
+        Message.objects.create(sender=self.client_user, recipient=self.nutritionist, content="Hello")
+
+        self.authenticate_client()
+        response = self.client.get(reverse('messages'), {'client_username': 'nutritionist'})
+        self.assertEqual([m['content'] for m in response.data], ['Hi', 'Hello'])
+
+    def send(self, content):
+        # Events go out on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(sender=self.nutritionist, recipient=self.client_user, content=content)
+
+    async def test_stream_delivers_new_messages(self):
+        url = reverse('messages_stream')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get(url, {'token': self.client_token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertEqual(await anext(events), b'retry: 5000\n\n')
+
+        # The subscription opens when the next event is awaited
+        pending = asyncio.ensure_future(anext(events))
+        broker = get_broker()
+        while self.client_user.id not in broker._subscribers:
+            await asyncio.sleep(0.01)
+        await sync_to_async(self.send)('Ping')
+        chunk = (await asyncio.wait_for(pending, timeout=2)).decode()
+        event, data = chunk.strip().split('\n')
+        self.assertEqual(event, 'event: message')
+        self.assertEqual(json.loads(data.removeprefix('data: '))['content'], 'Ping')
+
+        # On disconnect the ASGI handler cancels the task, which unwinds the subscription
+        pending = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertNotIn(self.client_user.id, broker._subscribers)
@@ -0,0 +1,360 @@
+import base64
+import csv
+import gzip
+import json
+from io import StringIO
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from core.models import Profile, MealPlan, FoodLog, WeeklyUpdate, LabResult, MealPlanTemplate, Recipe, Message, NutritionistNote
+from .base import TokenAuthMixin
+
+class NutritionistTestCase(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.nutritionist = User.objects.create_user(username='nutritionist', password='password123')
+        profile = Profile.objects.get(user=self.nutritionist)
+        profile.is_nutritionist = True
+        profile.is_approved = True
+        profile.save()
+
+        self.patient = User.objects.create_user(username='patient', password='password123')
+        self.pending = User.objects.create_user(username='pending', password='password123')
+        profile = Profile.objects.get(user=self.patient)
+        profile.is_approved = True
+        profile.save()
+        Profile.objects.filter(user__in=[self.patient, self.pending]).update(nutritionist=self.nutritionist)
+
+        self.access = self.login('nutritionist')['access']
+
+class DashboardStatsTests(NutritionistTestCase):
+    def test_stats_single_query_then_cached(self):
+        MealPlan.objects.create(user=self.patient, start_date=date.today(), end_date=date.today() + timedelta(days=6))
+        url = reverse('nutritionist_stats')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'total_patients': 2,
+            'approved_patients': 1,
+            'pending_patients': 1,
+            'active_meal_plans': 1,
+        })
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_approval_invalidates_cache(self):
+        url = reverse('nutritionist_stats')
+        self.assertEqual(self.client.get(url).data['pending_patients'], 1)
+        # The generation rotates on commit
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.post(reverse('approve_patient', args=[self.pending.id]))
+        self.assertEqual(self.client.get(url).data['pending_patients'], 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url).data['pending_patients'], 0)
+
+class RecentActivityTests(NutritionistTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 4):
+            FoodLog.objects.create(user=self.patient, date=date(2026, 1, day), meal_type='Lunch', content='Soup')
+            LabResult.objects.create(user=self.patient, title=f'Panel {day}', file='lab_results/test.pdf')
+        WeeklyUpdate.objects.create(user=self.pending, current_weight=80)
+
+    def test_default_list(self):
+        response = self.client.get(reverse('nutritionist_recent_activity'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 7)
+        timestamps = [a['timestamp'] for a in response.data]
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+    def test_cursor_pages_cover_feed(self):
+        url = reverse('nutritionist_recent_activity')
+        seen = []
+        params = {'page_size': 2}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend((a['type'], a['id']) for a in response.data['results'])
+            if not response.data['next_cursor']:
+                break
+            params = {'page_size': 2, 'cursor': response.data['next_cursor']}
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_each_branch_is_limited_and_weekly_updates_page_by_date(self):
+        today = date.today()
+        for days_ago in (0, 7, 7, 14):
+            update = WeeklyUpdate.objects.create(user=self.patient, current_weight=80)
+            WeeklyUpdate.objects.filter(pk=update.pk).update(date=today - timedelta(days=days_ago))
+        url = reverse('nutritionist_recent_activity')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'page_size': 2})
+        # One per branch, plus the outer one around the UNION
+        self.assertEqual(queries.captured_queries[-1]['sql'].count('LIMIT 3'), 4)
+
+        seen, params = [], {'page_size': 1, 'type': 'weekly_update'}
+        while True:
+            page = self.client.get(url, params).data
+            seen.extend((a['date'], a['id']) for a in page['results'])
+            if not page['next_cursor']:
+                break
+            params['cursor'] = page['next_cursor']
+        self.assertEqual(seen, sorted(
+            WeeklyUpdate.objects.values_list('date', 'id'), reverse=True,
+        ))
+
+    def test_bad_page_size_and_cursor(self):
+        url = reverse('nutritionist_recent_activity')
+        for page_size in (0, -5):
+            response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), 1)
+        for raw in ('["2026-01-01T00:00:00Z", "food_log", null]', '["2026-01-01T00:00:00Z", "food_log", "x"]', '{}'):
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_by_type_and_patient(self):
+        url = reverse('nutritionist_recent_activity')
+        response = self.client.get(url, {'type': 'lab_result,weekly_update', 'patient': self.patient.id})
+        self.assertEqual([a['type'] for a in response.data], ['lab_result'] * 3)
+        response = self.client.get(url, {'type': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class TemplateAssignmentTests(NutritionistTestCase):
+    def setUp(self):
+        super().setUp()
+        recipe = Recipe.objects.create(
+            title='Oats', prep_time_minutes=5, calories=300, protein_g=10, carbs_g=50, fat_g=5,
+            ingredients='Oats', instructions='Cook'
+        )
+        self.template = MealPlanTemplate.objects.create(
+            name='Week 1', structured_plan={'Monday': {'Breakfast': recipe.id}}
+        )
+        self.url = reverse('nutritionist_template_assign', args=[self.template.id])
+        self.payload = {'user_ids': [self.patient.id, self.pending.id], 'start_date': '2026-03-02'}
+
+    def test_small_batch_assigns_immediately(self):
+        response = self.client.post(self.url, self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {'created': 2})
+        plan = MealPlan.objects.get(user=self.patient)
+        self.assertEqual(plan.end_date, date(2026, 3, 8))
+        self.assertEqual(plan.nutrition_summary, self.template.nutrition_summary)
+        self.assertEqual(list(plan.recipes.all()), list(self.template.recipes.all()))
+
+    def test_rejects_nutritionist_ids(self):
+        response = self.client.post(self.url, {'user_ids': [self.nutritionist.id], 'start_date': '2026-03-02'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BULK_ASSIGN_SYNC_LIMIT=1)
+    def test_large_batch_is_queued_for_worker(self):
+        response = self.client.post(self.url, self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertFalse(MealPlan.objects.exists())
+
+        call_command('run_assignment_jobs', '--once', stdout=StringIO())
+        job = self.client.get(reverse('nutritionist_assignment_job', args=[response.data['id']])).data
+        self.assertEqual((job['status'], job['processed'], job['total']), ('done', 2, 2))
+        self.assertEqual(MealPlan.objects.count(), 2)
+
+class PatientDetailTests(NutritionistTestCase):
+    def setUp(self):
+        super().setUp()
+        for user in (self.patient, self.pending):
+            for day in range(1, 26):
+                FoodLog.objects.create(user=user, date=date(2026, 1, day), meal_type='Lunch', content='Soup')
+            for week in range(3):
+                MealPlan.objects.create(user=user, start_date=date(2026, 1, 5 + 7 * week), end_date=date(2026, 1, 11 + 7 * week))
+
+    def test_detail_uses_bounded_prefetches(self):
+        # patient + profile, then one query per history
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('nutritionist_patient_detail', args=[self.patient.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['food_logs']), 20)
+        self.assertEqual(response.data['food_logs'][0]['date'], '2026-01-25')
+        self.assertEqual(len(response.data['meal_plans']), 3)
+
+    def test_every_history_is_bounded_and_the_rest_paged(self):
+        for week in range(3, 12):
+            start = date(2026, 1, 5) + timedelta(weeks=week)
+            MealPlan.objects.create(user=self.patient, start_date=start, end_date=start + timedelta(days=6))
+        for _ in range(12):
+            LabResult.objects.create(user=self.patient, title='Panel', file='lab_results/test.pdf')
+        response = self.client.get(reverse('nutritionist_patient_detail', args=[self.patient.id]))
+        self.assertEqual((len(response.data['meal_plans']), len(response.data['lab_results'])), (10, 10))
+
+        url = reverse('nutritionist_patient_history', args=[self.patient.id, 'meal_plans'])
+        self.assertEqual(len(self.client.get(url).data), 12)
+        page = self.client.get(url, {'page_size': 10}).data
+        self.assertEqual([plan['id'] for plan in page['results']], [plan['id'] for plan in response.data['meal_plans']])
+        rest = self.client.get(page['next']).data
+        self.assertEqual([plan['start_date'] for plan in rest['results']], ['2026-01-12', '2026-01-05'])
+
+        self.assertEqual(self.client.get(reverse('nutritionist_patient_history', args=[self.patient.id, 'notes'])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('nutritionist_patient_history', args=[self.nutritionist.id, 'food_logs'])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_batch_summaries_in_constant_queries(self):
+        url = reverse('nutritionist_patient_batch')
+        with self.assertNumQueries(5):
+            response = self.client.get(url, {'ids': f'{self.pending.id},{self.patient.id},{self.nutritionist.id},999'})
+        self.assertEqual([patient['id'] for patient in response.data], [self.pending.id, self.patient.id])
+        self.assertEqual(len(response.data[0]['food_logs']), 5)
+        self.assertEqual(response.data[1]['meal_plans'][0]['start_date'], '2026-01-19')
+        self.assertEqual(self.client.get(url, {'ids': 'a,b'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+class PatientListTests(NutritionistTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiet = User.objects.create_user(username='quiet', password='password123')
+        Profile.objects.filter(user=self.quiet).update(is_approved=True, nutritionist=self.nutritionist)
+        today = date.today()
+        FoodLog.objects.create(user=self.patient, date=today - timedelta(days=2), meal_type='Lunch', content='Soup')
+        update = WeeklyUpdate.objects.create(user=self.patient, current_weight=72.5)
+        WeeklyUpdate.objects.filter(pk=update.pk).update(date=today - timedelta(days=5))
+        MealPlan.objects.create(user=self.patient, start_date=today, end_date=today + timedelta(days=6))
+        FoodLog.objects.create(user=self.quiet, date=today - timedelta(days=30), meal_type='Lunch', content='Soup')
+        for content in ('Hi', 'Question'):
+            Message.objects.create(sender=self.patient, recipient=self.nutritionist, content=content)
+        Message.objects.create(sender=self.quiet, recipient=self.pending, content='Not for you')
+
+    def test_annotations_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('nutritionist_patients'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = {row['username']: row for row in response.data}
+        today = date.today()
+        self.assertEqual(rows['patient']['last_activity'], (today - timedelta(days=2)).isoformat())
+        self.assertEqual(rows['patient']['latest_weight'], 72.5)
+        self.assertEqual(rows['patient']['open_plan_end'], (today + timedelta(days=6)).isoformat())
+        self.assertEqual(rows['patient']['unread_messages'], 2)
+        self.assertEqual((rows['quiet']['unread_messages'], rows['quiet']['open_plan_end']), (0, None))
+
+    def test_filters_and_ordering(self):
+        url = reverse('nutritionist_patients')
+        names = lambda response: [row['username'] for row in response.data]
+        self.assertEqual(names(self.client.get(url, {'inactive_days': 14})), ['quiet'])
+        self.assertEqual(names(self.client.get(url, {'has_unread': 'true'})), ['patient'])
+        self.assertEqual(names(self.client.get(url, {'ordering': '-last_activity'})), ['patient', 'quiet'])
+
+        first = self.client.get(url, {'ordering': 'last_activity', 'page_size': 1})
+        self.assertEqual([row['username'] for row in first.data['results']], ['quiet'])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['username'] for row in second.data['results']], ['patient'])
+        self.assertEqual(self.client.get(url, {'ordering': 'weight'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+class CaseloadScopingTests(NutritionistTestCase):
+    def setUp(self):
+        super().setUp()
+        self.colleague = User.objects.create_user(username='colleague', password='password123')
+        Profile.objects.filter(user=self.colleague).update(is_nutritionist=True, is_approved=True)
+        self.other = User.objects.create_user(username='other', password='password123')
+        Profile.objects.filter(user=self.other).update(is_approved=True, nutritionist=self.colleague)
+        self.unassigned = User.objects.create_user(username='unassigned', password='password123')
+        MealPlan.objects.create(user=self.other, start_date=date.today(), end_date=date.today() + timedelta(days=6))
+
+    def test_other_caseloads_are_hidden(self):
+        names = [row['username'] for row in self.client.get(reverse('nutritionist_patients')).data]
+        self.assertEqual(names, ['patient'])
+        response = self.client.get(reverse('nutritionist_patient_detail', args=[self.other.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('nutritionist_meal_plans')).data, [])
+        response = self.client.post(reverse('approve_patient', args=[self.other.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_approving_unassigned_patient_claims_them(self):
+        pending = [row['username'] for row in self.client.get(reverse('nutritionist_pending_patients')).data]
+        self.assertEqual(sorted(pending), ['pending', 'unassigned'])
+        self.assertEqual(self.client.get(reverse('nutritionist_stats')).data['total_patients'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('approve_patient', args=[self.unassigned.id]))
+        self.unassigned.profile.refresh_from_db()
+        self.assertEqual(self.unassigned.profile.nutritionist, self.nutritionist)
+        self.assertEqual(self.client.get(reverse('nutritionist_stats')).data['approved_patients'], 2)
+
+class ExportTests(NutritionistTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 4):
+            FoodLog.objects.create(user=self.patient, date=date(2026, 1, day), meal_type='Lunch', content='Soup, hot')
+        FoodLog.objects.create(user=self.pending, date=date(2026, 1, 1), meal_type='Dinner', content='Rice')
+        WeeklyUpdate.objects.create(user=self.patient, current_weight=72.5)
+        NutritionistNote.objects.create(nutritionist=self.nutritionist, patient=self.patient, content='Doing well')
+        self.url = reverse('nutritionist_export')
+
+    def test_patient_csv(self):
+        response = self.client.get(self.url, {'patient': self.patient.id, 'dataset': 'food_logs', 'output': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="export-patient-{self.patient.id}-food_logs.csv"')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:5], ['id', 'patient_id', 'patient', 'date', 'meal_type'])
+        self.assertEqual([row[3] for row in rows[1:]], ['2026-01-01', '2026-01-02', '2026-01-03'])
+        self.assertEqual(rows[1][5], 'Soup, hot')
+
+        self.assertEqual(self.client.get(self.url, {'output': 'csv'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'patient': self.nutritionist.id}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_csv_formulas_are_neutralized(self):
+        FoodLog.objects.create(user=self.patient, date=date(2026, 1, 4), meal_type='Snack', content='=HYPERLINK("http://x")')
+        WeeklyUpdate.objects.create(user=self.patient, current_weight=-1, notes='@SUM(A1)')
+        response = self.client.get(self.url, {'patient': self.patient.id, 'dataset': 'food_logs', 'output': 'csv'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[-1][5], '\'=HYPERLINK("http://x")')
+        response = self.client.get(self.url, {'patient': self.patient.id, 'dataset': 'weekly_updates', 'output': 'csv'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        # Numbers are left alone
+        self.assertEqual((rows[-1][4], rows[-1][-1]), ('-1.0', "'@SUM(A1)"))
+
+        # NDJSON keeps the text as written
+        response = self.client.get(self.url, {'patient': self.patient.id, 'dataset': 'food_logs'})
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(records[-1]['content'], '=HYPERLINK("http://x")')
+
+    def test_caseload_ndjson_gzip_and_command(self):
+        response = self.client.get(self.url, {'gzip': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(sorted({r['type'] for r in records}), ['food_logs', 'notes', 'weekly_updates'])
+        self.assertEqual(sum(r['type'] == 'food_logs' for r in records), 4)
+
+        out = StringIO()
+        call_command('export_patient_data', '--patient', str(self.patient.id), '--dataset', 'weekly_updates', stdout=out)
+        self.assertEqual([json.loads(line)['current_weight'] for line in out.getvalue().splitlines()], [72.5])
+
+    async def test_streams_chunk_by_chunk_under_asgi(self):
+        response = await self.async_client.get(self.url, headers={'Authorization': 'Bearer ' + self.access})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # An async iterator, so the handler doesn't collect the body with sync_to_async(list)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        # One flush per dataset
+        self.assertEqual(len(chunks), 3)
+        records = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual(sum(r['type'] == 'food_logs' for r in records), 4)
+
+class NoteTests(NutritionistTestCase):
+    def test_only_caseload_patients(self):
+        url = reverse('nutritionist_notes')
+        response = self.client.post(url, {'patient': self.patient.id, 'content': 'Doing well'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        stranger = User.objects.create_user(username='stranger', password='password123')
+        response = self.client.post(url, {'patient': stranger.id, 'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # No profile row at all is a validation error, not a 500
+        Profile.objects.filter(user=stranger).delete()
+        response = self.client.post(url, {'patient': stranger.id, 'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
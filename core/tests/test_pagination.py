@@ -0,0 +1,37 @@
+from datetime import date
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from core.models import FoodLog
+from .base import TokenAuthMixin
+
+class KeysetPaginationTests(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testclient', password='password123')
+        self.authenticate(self.user)
+        # Several entries share a date so the id tie-breaker matters
+        for day in [1, 2, 2, 2, 3]:
+            FoodLog.objects.create(user=self.user, date=date(2026, 1, day), meal_type='Lunch', content='Soup')
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(reverse('food_logs'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_walk_pages(self):
+        url = reverse('food_logs') + '?page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(entry['id'] for entry in response.data['results'])
+            url = response.data['next']
+
+        expected = list(FoodLog.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('food_logs') + '?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from core.models import WeeklyUpdate
+from core.timeseries import lttb_indices
+from .base import TokenAuthMixin
+
+class ProgressSeriesTests(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='password123')
+        self.authenticate(self.user)
+
+        # Ten weekly updates losing 0.5 kg a week; waist only every other week
+        start = date(2026, 1, 5)
+        for week in range(10):
+            update = WeeklyUpdate.objects.create(
+                user=self.user, current_weight=80 - week * 0.5, waist_cm=90 - week if week % 2 == 0 else None,
+            )
+            # date is auto_now_add
+            WeeklyUpdate.objects.filter(pk=update.pk).update(date=start + timedelta(weeks=week))
+
+    def get(self, **params):
+        return self.client.get(reverse('progress_series'), params)
+
+    def test_columns_rolling_mean_and_slope(self):
+        response = self.get(metrics='weight,waist', window=2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        weight = response.data['series']['weight']
+        self.assertEqual(len(weight['dates']), 10)
+        self.assertEqual(weight['values'][:2], [80, 79.5])
+        self.assertEqual(weight['rolling'][:2], [80, 79.75])
+        self.assertEqual(weight['slope_per_week'], -0.5)
+        self.assertEqual(len(response.data['series']['waist']['values']), 5)
+        self.assertEqual(set(response.data['series']), {'weight', 'waist'})
+
+        ranged = self.get(metrics='weight', **{'from': '2026-01-12', 'to': '2026-01-26'})
+        self.assertEqual(ranged.data['series']['weight']['dates'], ['2026-01-12', '2026-01-19', '2026-01-26'])
+
+    def test_downsampling(self):
+        monthly = self.get(metrics='weight', bucket='month').data['series']['weight']
+        self.assertEqual(monthly['dates'], ['2026-01-01', '2026-02-01', '2026-03-01'])
+        # January holds the first four weeks: 80, 79.5, 79, 78.5
+        self.assertEqual(monthly['values'][0], 79.25)
+
+        thinned = self.get(metrics='weight', points=4).data['series']['weight']
+        self.assertEqual(len(thinned['values']), 4)
+        self.assertEqual((thinned['dates'][0], thinned['dates'][-1]), ('2026-01-05', '2026-03-09'))
+
+        for params in ({'metrics': 'height'}, {'bucket': 'day'}, {'points': 2}, {'from': 'yesterday'}):
+            self.assertEqual(self.get(**params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lttb_keeps_the_spike(self):
+        days = [date(2026, 1, 1) + timedelta(days=i) for i in range(9)]
+        values = [1, 1, 1, 1, 9, 1, 1, 1, 1]
+        kept = lttb_indices(days, values, 5)
+        self.assertEqual(len(kept), 5)
+        self.assertIn(4, kept)
+
+    def test_nutritionist_views(self):
+        nutritionist = User.objects.create_user(username='nutri', password='password123')
+        nutritionist.profile.is_nutritionist = True
+        nutritionist.profile.save()
+        self.user.profile.nutritionist = nutritionist
+        self.user.profile.save()
+        self.authenticate(nutritionist)
+
+        legacy = self.client.get(reverse('nutritionist_patient_progress', args=[self.user.id]))
+        self.assertEqual(legacy.data['weight'][1], {'date': '2026-01-12', 'value': 79.5})
+        self.assertEqual(len(legacy.data['measurements']['waist']), 5)
+
+        url = reverse('nutritionist_patient_progress_series', args=[self.user.id])
+        self.assertEqual(len(self.client.get(url, {'points': 5}).data['series']['weight']['values']), 5)
+        url = reverse('nutritionist_patient_progress_series', args=[nutritionist.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,13 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+class QueryPlanTests(TestCase):
+    def test_hot_paths_are_index_backed(self):
+        User.objects.create_user(username='patient', password='password123')
+        User.objects.create_user(username='nutritionist', password='password123')
+        out = StringIO()
+        # Raises CommandError if any plan has a seq scan or filesort
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('food logs: index-backed', out.getvalue())
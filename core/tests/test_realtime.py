@@ -0,0 +1,28 @@
+import asyncio
+import tempfile
+import threading
+from django.test import SimpleTestCase
+from core.realtime import InProcessBroker, UnixSocketBroker
+
+class BrokerTests(SimpleTestCase):
+    async def test_in_process_delivery_from_thread(self):
+        broker = InProcessBroker()
+        async with broker.subscribe(1) as queue:
+            # Sync views publish from worker threads
+            thread = threading.Thread(target=broker.publish, args=(1, {'type': 'message', 'data': {'id': 7}}))
+            thread.start()
+            event = await asyncio.wait_for(queue.get(), timeout=2)
+            thread.join()
+        self.assertEqual(event['data']['id'], 7)
+        self.assertEqual(broker._subscribers, {})
+
+    async def test_unix_socket_fan_out(self):
+        with tempfile.TemporaryDirectory() as socket_dir:
+            worker = UnixSocketBroker(socket_dir)
+            publisher = UnixSocketBroker(socket_dir)
+            async with worker.subscribe(5) as queue:
+                publisher.publish(5, {'type': 'read', 'data': {'updated_count': 2}})
+                publisher.publish(6, {'type': 'read', 'data': {'updated_count': 9}})
+                event = await asyncio.wait_for(queue.get(), timeout=2)
+            self.assertEqual(event, {'type': 'read', 'data': {'updated_count': 2}})
+            self.assertTrue(queue.empty())
@@ -0,0 +1,230 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.core.cache import cache
+from core import dietary, recipe_search
+from core.models import MealPlanTemplate, Recipe
+from .base import TokenAuthMixin
+
+class RecipeSearchTests(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='patient', password='password123')
+        self.login('patient')
+
+        def recipe(title, tags, ingredients, calories, protein_g, prep=10):
+            return Recipe.objects.create(
+                title=title, tags=tags, ingredients=ingredients, instructions='Mix and serve',
+                prep_time_minutes=prep, calories=calories, protein_g=protein_g, carbs_g=20, fat_g=10,
+            )
+        self.omelette = recipe('Spinach Omelette', 'Breakfast, Keto', 'Eggs\nSpinach', 320, 24)
+        self.salad = recipe('Egg Salad', 'Lunch, Keto', 'Eggs\nLettuce\nMayonnaise', 410, 18)
+        self.oats = recipe('Overnight Oats', 'Breakfast, Vegan', 'Oats\nAlmond milk', 350, 12, prep=5)
+
+    def get(self, **params):
+        return self.client.get(reverse('recipe_list'), params)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [recipe['id'] for recipe in results]
+
+    def test_tag_and_range_filters(self):
+        self.assertEqual(len(self.ids(self.get())), 3)
+        self.assertEqual(self.ids(self.get(tag='keto')), [self.omelette.id, self.salad.id])
+        self.assertEqual(self.ids(self.client.get(reverse('recipe_list') + '?tag=Keto&tag=breakfast')), [self.omelette.id])
+        self.assertEqual(self.ids(self.get(calories_max=400, protein_g_min=20)), [self.omelette.id])
+        self.assertEqual(self.ids(self.get(prep_time_max=5)), [self.oats.id])
+        self.assertEqual(self.get(calories_max='lots').status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Editing the text field keeps the tag table in sync
+        self.oats.tags = 'Breakfast, Keto'
+        self.oats.save()
+        self.assertEqual(len(self.ids(self.get(tag='keto'))), 3)
+
+    def test_full_text_ranking_and_pages(self):
+        # A title match outranks an ingredient-only match
+        self.assertEqual(self.ids(self.get(q='egg')), [self.salad.id, self.omelette.id])
+        self.assertEqual(self.ids(self.get(q='eggs spinach')), [self.omelette.id])
+        self.assertEqual(self.ids(self.get(q='egg', calories_min=400)), [self.salad.id])
+        self.assertEqual(self.ids(self.get(q='pancakes')), [])
+
+        first = self.get(q='egg', page_size=1)
+        self.assertEqual(self.ids(first), [self.salad.id])
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.ids(second), [self.omelette.id])
+        self.assertIsNone(second.data['next'])
+
+    def test_only_search_text_edits_reindex(self):
+        generation = cache.get(recipe_search.GENERATION_KEY)
+        self.oats.calories = 360
+        self.oats.save()
+        self.assertEqual(cache.get(recipe_search.GENERATION_KEY), generation)
+
+        self.oats.instructions = 'Soak overnight in almond milk'
+        self.oats.save()
+        self.assertNotEqual(cache.get(recipe_search.GENERATION_KEY), generation)
+        self.assertEqual(self.ids(self.get(q='soak')), [self.oats.id])
+
+    def test_partial_save_keeps_unsaved_edits_pending(self):
+        generation = cache.get(recipe_search.GENERATION_KEY)
+        self.oats.title = 'Bircher muesli'
+        self.oats.calories = 360
+        self.oats.save(update_fields=['calories'])
+        self.assertEqual(cache.get(recipe_search.GENERATION_KEY), generation)
+        # The title was never written, so the next full save still indexes it
+        self.oats.save()
+        self.assertNotEqual(cache.get(recipe_search.GENERATION_KEY), generation)
+        self.assertEqual(self.ids(self.get(q='bircher')), [self.oats.id])
+
+    def test_for_patient_excludes_conflicting_recipes(self):
+        self.assertEqual(
+            sorted(self.oats.ingredient_set.values_list('name', flat=True)), ['almond milk', 'oat'],
+        )
+        self.assertEqual(self.get().data[2]['allergens'], ['tree_nut'])
+
+        profile = self.user.profile
+        profile.allergies = 'Tree nuts'
+        profile.dietary_prefs = 'Vegetarian'
+        profile.save()
+        self.assertEqual(self.ids(self.get(for_patient=self.user.id)), [self.omelette.id, self.salad.id])
+
+        profile.allergies = ''
+        profile.dietary_prefs = 'Vegan'
+        profile.save()
+        self.assertEqual(self.ids(self.get(for_patient=self.user.id)), [self.oats.id])
+
+        # Editing the ingredients re-classifies the recipe
+        self.oats.ingredients = 'Oats\nHoney'
+        self.oats.save()
+        self.assertEqual(self.ids(self.get(for_patient=self.user.id)), [])
+
+        other = User.objects.create_user(username='other', password='password123')
+        self.assertEqual(self.get(for_patient=other.id).status_code, status.HTTP_403_FORBIDDEN)
+
+class DietaryClassificationTests(APITestCase):
+    def flags(self, line):
+        return dietary.flag_names(dietary.classify(dietary.normalize_ingredient(line)))
+
+    def test_compound_and_prepared_ingredients(self):
+        self.assertEqual(self.flags('1 cup buttermilk'), ['dairy'])
+        self.assertEqual(self.flags('2 tbsp pesto'), ['dairy', 'tree_nut'])
+        self.assertEqual(self.flags('1 tsp Worcestershire sauce'), ['fish'])
+        self.assertEqual(self.flags('Butternut squash'), [])
+
+    def test_non_wheat_flours(self):
+        self.assertEqual(self.flags('100g almond flour'), ['tree_nut'])
+        self.assertEqual(self.flags('2 cups rice flour'), [])
+        self.assertEqual(self.flags('Chickpea flour'), [])
+        self.assertEqual(self.flags('200g plain flour'), ['gluten'])
+        self.assertEqual(self.flags('1 cup gluten-free flour'), [])
+
+    def test_keywords_ending_in_s(self):
+        self.assertEqual(dietary.normalize_ingredient('1 cup couscous'), 'couscous')
+        self.assertEqual(self.flags('1 cup couscous'), ['gluten'])
+        self.assertEqual(dietary.normalize_ingredient('200g hummus'), 'hummus')
+
+    def test_plural_units(self):
+        self.assertEqual(dietary.parse_ingredients(
+            '2 cups beef broth\n3 slices bread\n2 tbsps soy sauce\n2 cups Almond Milk (unsweetened), chilled'
+        ), ['beef broth', 'bread', 'soy sauce', 'almond milk'])
+        # A unit word naming the ingredient itself is kept
+        self.assertEqual(dietary.normalize_ingredient('1 tsp ground cloves'), 'ground clove')
+        self.assertEqual(dietary.normalize_ingredient('2 cups'), '')
+
+    def test_command_reclassifies_stored_flags(self):
+        recipe = Recipe.objects.create(
+            title='Pancakes', prep_time_minutes=10, calories=300, protein_g=8, carbs_g=40, fat_g=10,
+            ingredients='1 cup almond flour\n1 cup buttermilk', instructions='Fry',
+        )
+        self.assertEqual(dietary.flag_names(recipe.allergen_flags), ['dairy', 'tree_nut'])
+        # As stored before the tables changed
+        Recipe.objects.filter(pk=recipe.pk).update(allergen_flags=dietary.GLUTEN | dietary.TREE_NUT)
+        out = StringIO()
+        call_command('reclassify_recipes', stdout=out)
+        self.assertIn('Reclassified 1 recipes', out.getvalue())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.allergen_flags, dietary.DAIRY | dietary.TREE_NUT)
+
+    def test_command_reparses_stored_names(self):
+        recipe = Recipe.objects.create(
+            title='Tabbouleh', prep_time_minutes=10, calories=300, protein_g=8, carbs_g=40, fat_g=10,
+            ingredients='1 cup couscous\n2 cups parsley', instructions='Mix',
+        )
+        # As parsed before couscous kept its final s
+        recipe.ingredient_set.all().delete()
+        recipe.ingredient_set.create(name='couscou')
+        recipe.ingredient_set.create(name='cup parsley')
+        Recipe.objects.filter(pk=recipe.pk).update(allergen_flags=0)
+        call_command('reclassify_recipes', stdout=StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.allergen_flags, dietary.GLUTEN)
+        self.assertEqual(sorted(recipe.ingredient_set.values_list('name', flat=True)), ['couscous', 'parsley'])
+
+class CatalogImportTests(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.login('admin')
+
+    def upload(self, lines, name='catalog.ndjson'):
+        content = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        return self.client.post(reverse('catalog_import'), {'file': SimpleUploadedFile(name, content.encode())})
+
+    def recipe(self, key, title, ingredients, calories, tags=''):
+        return {
+            'key': key, 'title': title, 'ingredients': ingredients, 'instructions': 'Cook', 'tags': tags,
+            'prep_time_minutes': 10, 'calories': calories, 'protein_g': 10, 'carbs_g': 20, 'fat_g': '5',
+        }
+
+    def test_upserts_recipes_and_rewrites_template_references(self):
+        template = {'type': 'template', 'key': 'week-1', 'name': 'Week 1', 'structured_plan': {'Monday': {'Breakfast': 'oats', 'Lunch': 'soup'}}}
+        response = self.upload([
+            self.recipe('oats', 'Oats', 'Oats\nMilk', 300, tags='Breakfast, Vegan'),
+            self.recipe('soup', 'Soup', 'Lentils', 400),
+            '{not json',
+            {'key': 'bad', 'title': 'Bad', 'calories': 'lots'},
+            template,
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recipes'], {'created': 2, 'updated': 0})
+        self.assertEqual(response.data['templates'], {'created': 1, 'updated': 0})
+        self.assertEqual([error['row'] for error in response.data['error_details']], [3, 4])
+
+        oats = Recipe.objects.get(catalog_key='oats')
+        self.assertTrue(oats.allergen_flags & dietary.DAIRY)
+        self.assertEqual(sorted(oats.ingredient_set.values_list('name', flat=True)), ['milk', 'oat'])
+        self.assertEqual(sorted(oats.tag_set.values_list('name', flat=True)), ['breakfast', 'vegan'])
+        week = MealPlanTemplate.objects.get(catalog_key='week-1')
+        self.assertEqual(week.structured_plan['Monday']['Breakfast'], oats.id)
+        self.assertEqual(week.nutrition_summary['total']['calories'], 700)
+        self.assertEqual(week.recipes.count(), 2)
+
+        # Re-importing updates in place and refreshes the summaries using the recipe
+        response = self.upload([self.recipe('oats', 'Oats', 'Oats\nMilk', 350)])
+        self.assertEqual(response.data['recipes'], {'created': 0, 'updated': 1})
+        self.assertEqual(Recipe.objects.get(catalog_key='oats').id, oats.id)
+        week.refresh_from_db()
+        self.assertEqual(week.nutrition_summary['total']['calories'], 750)
+
+    def test_csv_command_and_permissions(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            writer = csv.DictWriter(f, fieldnames=[*self.recipe('', '', '', 0), 'cook_time_minutes'])
+            writer.writeheader()
+            writer.writerow(self.recipe('eggs', 'Eggs', 'Eggs', 150))
+            writer.writerow({**self.recipe('toast', 'Toast', 'Bread', 200), 'cook_time_minutes': ''})
+        self.addCleanup(os.unlink, f.name)
+        out = StringIO()
+        call_command('import_catalog', f.name, stdout=out)
+        self.assertIn('recipes 2 created, 0 updated', out.getvalue())
+        self.assertEqual(Recipe.objects.get(catalog_key='eggs').allergen_flags, dietary.EGG)
+
+        User.objects.create_user(username='patient', password='password123')
+        self.login('patient')
+        self.assertEqual(self.upload([]).status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from django.contrib.auth.models import User
+from core.models import ProgressStats, WeeklyUpdate
+from .base import TokenAuthMixin
+
+class SocialFeedTests(TokenAuthMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='me', password='password123')
+        self.authenticate(self.user)
+
+        self.ana = User.objects.create_user(username='ana', password='password123')
+        self.ana.profile.weight = 80
+        self.ana.profile.save()
+        self.ben = User.objects.create_user(username='ben', password='password123')
+
+    def log(self, user, weight, days_ago):
+        with self.captureOnCommitCallbacks(execute=True):
+            update = WeeklyUpdate.objects.create(user=user, current_weight=weight)
+            WeeklyUpdate.objects.filter(pk=update.pk).update(date=timezone.now().date() - timedelta(days=days_ago))
+            # Re-save so the stats see the real date, as an edit would
+            update.refresh_from_db()
+            update.save()
+        return update
+
+    def test_feed_excludes_caller_and_pages(self):
+        self.log(self.ana, 79, 14)
+        self.log(self.user, 70, 10)
+        self.log(self.ben, 90, 7)
+        latest = self.log(self.ana, 78, 0)
+
+        response = self.client.get(reverse('social_progress'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry['username'] for entry in response.data], ['ana', 'ben', 'ana'])
+        self.assertEqual(response.data[0], {
+            'username': 'ana', 'weight_lost': 2.0, 'current_weight': 78, 'date': latest.date.isoformat(), 'id': latest.id,
+        })
+
+        first = self.client.get(reverse('social_progress'), {'page_size': 2})
+        self.assertEqual([entry['username'] for entry in first.data['results']], ['ana', 'ben'])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([entry['current_weight'] for entry in second.data['results']], [79])
+        self.assertIsNone(second.data['next'])
+
+    def test_starting_weight_edit_through_the_api_rebuilds_feed(self):
+        self.log(self.ana, 78, 0)
+        self.assertEqual(self.client.get(reverse('social_progress')).data[0]['weight_lost'], 2.0)
+
+        # Ana's own claims-based session, as the SPA would have
+        ana = self.client_class()
+        self.login('ana', client=ana)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = ana.put(reverse('profile'), {'weight': 90}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('social_progress')).data[0]['weight_lost'], 12.0)
+
+    def test_leaderboards_track_updates_incrementally(self):
+        self.log(self.ana, 80, 21)
+        self.log(self.ana, 79, 14)
+        self.log(self.ana, 78, 7)
+        self.log(self.ben, 90, 30)
+        self.log(self.ben, 89, 0)
+
+        stats = ProgressStats.objects.get(user=self.ana)
+        self.assertEqual((stats.streak, stats.best_streak, stats.latest_weight), (3, 3, 78))
+        streaks = self.client.get(reverse('leaderboard'), {'mode': 'streak'}).data['results']
+        self.assertEqual([(row['username'], row['score']) for row in streaks], [('ana', 3), ('ben', 1)])
+
+        # Deleting an update rebuilds that user's stats
+        WeeklyUpdate.objects.filter(user=self.ana, current_weight=78).delete()
+        stats = ProgressStats.objects.get(user=self.ana)
+        self.assertEqual((stats.best_streak, stats.latest_weight), (2, 79))
+
+        self.assertEqual(self.client.get(reverse('leaderboard'), {'mode': 'fastest'}).status_code, status.HTTP_400_BAD_REQUEST)
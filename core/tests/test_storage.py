@@ -0,0 +1,69 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from core.models import Blob, LabResult, MealPlan
+from .base import TempMediaMixin
+
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='patient', password='password123')
+
+    def upload(self, content=b'%PDF same scan'):
+        return LabResult.objects.create(user=self.user, title='Bloods', file=SimpleUploadedFile('scan.pdf', content))
+
+    def test_identical_uploads_share_a_blob(self):
+        first, second = self.upload(), self.upload()
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertRegex(first.file.name, r'^lab_results/[0-9a-f]{32}\.pdf$')
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+        # Same content under another upload_to is a separate blob
+        MealPlan.objects.create(user=self.user, start_date='2026-03-02', end_date='2026-03-08', file=SimpleUploadedFile('scan.pdf', b'%PDF same scan'))
+        self.assertEqual(Blob.objects.count(), 2)
+
+        first.delete()
+        self.assertEqual(Blob.objects.get(name=second.file.name).ref_count, 1)
+
+    def test_released_blobs_are_deleted_on_commit(self):
+        old, recent = self.upload(b'old'), self.upload(b'recent')
+        Blob.objects.filter(name=old.file.name).update(updated_at=timezone.now() - timedelta(days=1))
+        storage = old.file.storage
+
+        with self.captureOnCommitCallbacks(execute=True):
+            old.delete()
+            recent.delete()
+        self.assertFalse(storage.exists(old.file.name))
+        self.assertFalse(Blob.objects.filter(name=old.file.name).exists())
+        # Just uploaded, so possibly about to be referenced again; gc_blobs gets it later
+        self.assertTrue(storage.exists(recent.file.name))
+
+        # Replacing a file releases the old one too
+        kept = self.upload(b'kept')
+        Blob.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        previous = kept.file.name
+        kept.file = SimpleUploadedFile('scan.pdf', b'replacement')
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.save()
+        self.assertFalse(storage.exists(previous))
+        self.assertTrue(storage.exists(kept.file.name))
+
+    def test_gc_deletes_unreferenced_blobs_after_grace_period(self):
+        kept, dropped = self.upload(b'kept'), self.upload(b'dropped')
+        name = dropped.file.name
+        dropped.delete()
+
+        call_command('gc_blobs', stdout=StringIO())
+        self.assertTrue(Blob.objects.filter(name=name).exists())
+
+        Blob.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        # A drifted count is repaired before collection
+        Blob.objects.filter(name=kept.file.name).update(ref_count=0)
+        call_command('gc_blobs', '--recount', stdout=StringIO())
+        self.assertEqual(list(Blob.objects.values_list('name', 'ref_count')), [(kept.file.name, 1)])
+        self.assertFalse(kept.file.storage.exists(name))
+        self.assertTrue(kept.file.storage.exists(kept.file.name))
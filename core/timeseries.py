@@ -0,0 +1,208 @@
+from collections import deque
+from datetime import date
+
+from .models import WeeklyUpdate
+
+# metric name -> WeeklyUpdate column
+METRICS = {
+    'weight': 'current_weight',
+    'waist': 'waist_cm',
+    'hips': 'hips_cm',
+    'chest': 'chest_cm',
+    'arm': 'arm_cm',
+    'thigh': 'thigh_cm',
+    'energy': 'energy_level',
+    'compliance': 'compliance_score',
+}
+MEASUREMENTS = ('waist', 'hips', 'chest', 'arm', 'thigh')
+BUCKETS = ('week', 'month')
+DEFAULT_WINDOW = 4
+MAX_WINDOW = 52
+MIN_POINTS = 3
+
+
+def load_rows(user_id, metrics, start=None, end=None):
+    """(date, value, value, ...) tuples for `metrics`, oldest first; only those columns are read."""
+    queryset = WeeklyUpdate.objects.filter(user_id=user_id)
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    return queryset.order_by('date', 'id').values_list('date', *(METRICS[m] for m in metrics))
+
+
+class Accumulator:
+    """
+    Collects one metric's points and, in the same pass, its trailing
+    rolling mean and the least-squares sums for a linear trend.
+    """
+    def __init__(self, window):
+        self.dates, self.values, self.rolling = [], [], []
+        self.window = deque(maxlen=window)
+        self.window_sum = 0.0
+        self.n = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.origin = None
+
+    def add(self, day, value):
+        if len(self.window) == self.window.maxlen:
+            self.window_sum -= self.window[0]
+        self.window.append(value)
+        self.window_sum += value
+
+        if self.origin is None:
+            self.origin = day
+        x = (day - self.origin).days
+        self.n += 1
+        self.sx += x
+        self.sy += value
+        self.sxx += x * x
+        self.sxy += x * value
+
+        self.dates.append(day)
+        self.values.append(value)
+        self.rolling.append(self.window_sum / len(self.window))
+
+    def slope_per_week(self):
+        denominator = self.n * self.sxx - self.sx * self.sx
+        if self.n < 2 or not denominator:
+            return None
+        return (self.n * self.sxy - self.sx * self.sy) / denominator * 7
+
+
+def lttb_indices(dates, values, threshold):
+    """
+    Indices kept by Largest-Triangle-Three-Buckets: the first and last
+    points plus, per bucket, the point forming the largest triangle with
+    the previous pick and the next bucket's average. Keeps peaks and dips
+    that plain averaging would flatten.
+    """
+    size = len(values)
+    if threshold >= size or threshold < MIN_POINTS:
+        return list(range(size))
+    xs = [d.toordinal() for d in dates]
+    every = (size - 2) / (threshold - 2)
+    picked = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, size)
+        next_x = xs[end:next_end] or [xs[-1]]
+        next_y = values[end:next_end] or [values[-1]]
+        avg_x = sum(next_x) / len(next_x)
+        avg_y = sum(next_y) / len(next_y)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (values[j] - values[a]) - (xs[a] - xs[j]) * (avg_y - values[a]))
+            if area > best_area:
+                best, best_area = j, area
+        picked.append(best)
+        a = best
+    picked.append(size - 1)
+    return picked
+
+
+def _bucket_start(day, bucket):
+    if bucket == 'week':
+        return date.fromordinal(day.toordinal() - day.weekday())
+    return day.replace(day=1)
+
+
+def bucket_means(dates, columns, bucket):
+    """Average every column per calendar week/month; dates become bucket starts."""
+    out_dates, out_columns = [], [[] for _ in columns]
+    current, count, sums = None, 0, None
+    for i, day in enumerate(dates):
+        key = _bucket_start(day, bucket)
+        if key != current:
+            if current is not None:
+                out_dates.append(current)
+                for column, total in zip(out_columns, sums):
+                    column.append(total / count)
+            current, count, sums = key, 0, [0.0] * len(columns)
+        count += 1
+        for k, column in enumerate(columns):
+            sums[k] += column[i]
+    if current is not None:
+        out_dates.append(current)
+        for column, total in zip(out_columns, sums):
+            column.append(total / count)
+    return out_dates, out_columns
+
+
+def build_series(rows, metrics, window=DEFAULT_WINDOW, bucket=None, points=None):
+    """
+    Columnar series per metric from load_rows() output:
+    {metric: {'dates': [...], 'values': [...], 'rolling': [...],
+    'slope_per_week': float | None}}. Rolling means and slopes come from the
+    full-resolution data; `bucket` or `points` only thin what is returned.
+    """
+    accumulators = [Accumulator(window) for _ in metrics]
+    for row in rows:
+        day = row[0]
+        for accumulator, value in zip(accumulators, row[1:]):
+            if value is not None:
+                accumulator.add(day, float(value))
+
+    series = {}
+    for metric, acc in zip(metrics, accumulators):
+        dates, values, rolling = acc.dates, acc.values, acc.rolling
+        if bucket:
+            dates, (values, rolling) = bucket_means(dates, [values, rolling], bucket)
+        elif points:
+            keep = lttb_indices(dates, values, points)
+            dates, values, rolling = ([column[i] for i in keep] for column in (dates, values, rolling))
+        slope = acc.slope_per_week()
+        series[metric] = {
+            'dates': [day.isoformat() for day in dates],
+            'values': [round(value, 2) for value in values],
+            'rolling': [round(value, 2) for value in rolling],
+            'slope_per_week': None if slope is None else round(slope, 3),
+        }
+    return series
+
+
+def parse_series_params(params):
+    """
+    Validate the time-series query params into build options. Raises
+    ValueError with a client-facing message.
+    """
+    metrics = [m.strip() for m in params.get('metrics', '').split(',') if m.strip()] or list(METRICS)
+    unknown = [m for m in metrics if m not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+
+    bounds = {}
+    for param in ('from', 'to'):
+        value = params.get(param)
+        if value:
+            try:
+                bounds[param] = date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"{param} must be a YYYY-MM-DD date")
+
+    bucket = params.get('bucket') or None
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+
+    options = {'window': DEFAULT_WINDOW, 'points': None}
+    for param, low, high in (('window', 1, MAX_WINDOW), ('points', MIN_POINTS, None)):
+        value = params.get(param)
+        if value:
+            if not value.isdigit() or int(value) < low or (high and int(value) > high):
+                limit = f"between {low} and {high}" if high else f"at least {low}"
+                raise ValueError(f"{param} must be an integer {limit}")
+            options[param] = int(value)
+    if bucket and options['points']:
+        raise ValueError("Use either bucket or points, not both")
+
+    return metrics, bounds.get('from'), bounds.get('to'), dict(options, bucket=bucket)
+
+
+def series_response_data(user_id, params):
+    metrics, start, end, options = parse_series_params(params)
+    return {
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'series': build_series(load_rows(user_id, metrics, start, end), metrics, **options),
+    }
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession
+
+READ_SIZE = 64 * 1024
+# Sessions untouched for this long are abandoned and can be purged
+STALE_UPLOAD_AFTER = timedelta(days=1)
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class ChunkError(Exception):
+    """A chunk or completion request that doesn't fit the session's state."""
+    def __init__(self, message, session=None):
+        super().__init__(message)
+        self.session = session
+
+
+def part_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.id}.part')
+
+
+def parse_content_range(header):
+    """Return (start, end, total) from `bytes start-end/total`, or None."""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        return None
+    start, end, total = (int(value) for value in match.groups())
+    if end < start or end >= total:
+        return None
+    return start, end, total
+
+
+def start_upload(user, filename, size, sha256):
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    session = UploadSession.objects.create(user=user, filename=filename, size=size, sha256=sha256)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session_id, user, start, stream, length):
+    """
+    Stream `length` bytes from `stream` into the part file at `start`.
+    Chunks must arrive in order; re-sending one that is already stored is a
+    no-op, so clients can retry after a dropped connection without asking
+    for the offset first.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session_id, user_id=user.id)
+        if session.status != 'uploading':
+            raise ChunkError('Upload is already complete', session)
+        if start + length <= session.received:
+            return session
+        if start != session.received:
+            raise ChunkError(f'Expected a chunk starting at byte {session.received}', session)
+
+        remaining = length
+        with open(part_path(session), 'r+b') as f:
+            f.seek(start)
+            # Drop anything left by an interrupted write
+            f.truncate()
+            while remaining:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                remaining -= len(data)
+        if remaining:
+            raise ChunkError('Chunk body is shorter than its Content-Range', session)
+
+        session.received = start + length
+        session.save(update_fields=['received', 'updated_at'])
+    return session
+
+
+def finish_upload(session_id, user):
+    """
+    Check the assembled file against the declared size and SHA-256. A
+    mismatch discards the upload, since there is no way to tell which chunk
+    was corrupted.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session_id, user_id=user.id)
+        if session.status == 'complete':
+            return session
+        if session.received != session.size:
+            raise ChunkError(f'Only {session.received} of {session.size} bytes received', session)
+
+        digest = hashlib.sha256()
+        with open(part_path(session), 'rb') as f:
+            for data in iter(lambda: f.read(READ_SIZE), b''):
+                digest.update(data)
+        if digest.hexdigest() == session.sha256:
+            session.status = 'complete'
+            session.save(update_fields=['status', 'updated_at'])
+            return session
+
+    # Outside the transaction, which the error would otherwise roll back
+    discard_upload(session)
+    raise ChunkError('Checksum mismatch; start the upload again')
+
+
+def open_upload(session):
+    """The assembled file, ready to assign to a FileField."""
+    return File(open(part_path(session), 'rb'), name=session.filename)
+
+
+def discard_upload(session):
+    try:
+        os.unlink(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def purge_stale_uploads():
+    count = 0
+    for session in UploadSession.objects.filter(updated_at__lt=timezone.now() - STALE_UPLOAD_AFTER).iterator():
+        discard_upload(session)
+        count += 1
+    return count
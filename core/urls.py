@@ -1,46 +1,59 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
 from . import views
 from . import nutritionist_views
+from . import stream_views
 
 urlpatterns = [
     path('auth/register/', views.RegisterView.as_view(), name='register'),
     path('auth/login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'),
     
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('meal-plans/', views.MealPlanListView.as_view(), name='meal_plans'),
     path('meal-plans/<int:pk>/', views.MealPlanDetailView.as_view(), name='meal_plan_detail'),
+    path('meal-plans/<int:pk>/shopping-list/', views.MealPlanShoppingListView.as_view(), name='meal_plan_shopping_list'),
     path('weekly-updates/', views.WeeklyUpdateView.as_view(), name='weekly_updates'),
     path('weight-history/', views.WeightHistoryView.as_view(), name='weight_history'),
+    path('progress/series/', views.ProgressSeriesView.as_view(), name='progress_series'),
     path('social-progress/', views.SocialProgressView.as_view(), name='social_progress'),
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
     path('auth/google/', views.GoogleLogin.as_view(), name='google_login'),
     
     path('recipes/', views.RecipeListView.as_view(), name='recipe_list'),
     path('recipes/<int:pk>/', views.RecipeViewSet.as_view(), name='recipe_detail'),
+    path('catalog/import/', views.CatalogImportView.as_view(), name='catalog_import'),
     
     path('food-logs/', views.FoodLogViewSet.as_view(), name='food_logs'),
     path('messages/', views.MessageViewSet.as_view({'get': 'list', 'post': 'create'}), name='messages'),
     path('messages/mark_read/', views.MessageViewSet.as_view({'post': 'mark_conversation_read'}), name='messages_mark_read'),
-    # path('messages/conversations/', views.ConversationListView.as_view(), name='conversation_list'),
+    path('messages/unread_count/', views.MessageViewSet.as_view({'get': 'unread_count'}), name='messages_unread_count'),
+    path('messages/stream/', stream_views.message_stream, name='messages_stream'),
+    path('messages/conversations/', views.ConversationListView.as_view(), name='conversation_list'),
+    path('messages/threads/', views.MessageThreadListView.as_view(), name='message_threads'),
     path('nutritionists/', views.NutritionistView.as_view(), name='nutritionists'),
     path('lab-results/', views.LabResultViewSet.as_view(), name='lab_results'),
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='uploads'),
+    path('uploads/<uuid:pk>/', views.UploadSessionView.as_view(), name='upload_detail'),
+    path('uploads/<uuid:pk>/complete/', views.UploadSessionCompleteView.as_view(), name='upload_complete'),
     
     # Nutritionist-specific endpoints
     path('nutritionist/patients/', nutritionist_views.NutritionistPatientListView.as_view(), name='nutritionist_patients'),
     path('nutritionist/pending-patients/', nutritionist_views.NutritionistPendingPatientsListView.as_view(), name='nutritionist_pending_patients'),
     path('nutritionist/approve-patient/<int:patient_id>/', nutritionist_views.ApprovePatientView.as_view(), name='approve_patient'),
+    path('nutritionist/patients/batch/', nutritionist_views.NutritionistPatientBatchView.as_view(), name='nutritionist_patient_batch'),
     path('nutritionist/patients/<int:pk>/', nutritionist_views.NutritionistPatientDetailView.as_view(), name='nutritionist_patient_detail'),
+    path('nutritionist/patients/<int:patient_id>/history/<str:history>/', nutritionist_views.NutritionistPatientHistoryView.as_view(), name='nutritionist_patient_history'),
     path('nutritionist/patients/<int:patient_id>/progress/', nutritionist_views.NutritionistPatientProgressView.as_view(), name='nutritionist_patient_progress'),
+    path('nutritionist/patients/<int:patient_id>/progress/series/', nutritionist_views.NutritionistPatientProgressSeriesView.as_view(), name='nutritionist_patient_progress_series'),
     path('nutritionist/meal-plans/', nutritionist_views.NutritionistMealPlanViewSet.as_view({'get': 'list', 'post': 'create'}), name='nutritionist_meal_plans'),
     path('nutritionist/meal-plans/<int:pk>/', nutritionist_views.NutritionistMealPlanViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='nutritionist_meal_plan_detail'),
     path('nutritionist/templates/', nutritionist_views.NutritionistMealPlanTemplateViewSet.as_view({'get': 'list', 'post': 'create'}), name='nutritionist_templates'),
     path('nutritionist/templates/<int:pk>/', nutritionist_views.NutritionistMealPlanTemplateViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='nutritionist_template_detail'),
+    path('nutritionist/templates/<int:pk>/assign/', nutritionist_views.NutritionistMealPlanTemplateViewSet.as_view({'post': 'assign'}), name='nutritionist_template_assign'),
+    path('nutritionist/assignment-jobs/<int:pk>/', nutritionist_views.BulkAssignmentJobView.as_view(), name='nutritionist_assignment_job'),
     path('nutritionist/stats/', nutritionist_views.NutritionistDashboardStatsView.as_view(), name='nutritionist_stats'),
     path('nutritionist/notes/', nutritionist_views.NutritionistNoteViewSet.as_view({'get': 'list', 'post': 'create'}), name='nutritionist_notes'),
     path('nutritionist/notes/<int:pk>/', nutritionist_views.NutritionistNoteViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), name='nutritionist_note_detail'),
+    path('nutritionist/export/', nutritionist_views.NutritionistExportView.as_view(), name='nutritionist_export'),
     path('nutritionist/recent-activity/', nutritionist_views.NutritionistRecentActivityView.as_view(), name='nutritionist_recent_activity'),
 ]
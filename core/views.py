@@ -1,13 +1,18 @@
+import io
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.views import TokenObtainPairView as SimpleJWTTokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView as SimpleJWTTokenObtainPairView, TokenRefreshView as SimpleJWTTokenRefreshView
 from django.contrib.auth.models import User
-from .models import Profile, MealPlan, WeeklyUpdate, Recipe, FoodLog, Message, LabResult
-from .serializers import UserSerializer, ProfileSerializer, MealPlanSerializer, WeeklyUpdateSerializer, RecipeSerializer, FoodLogSerializer, MessageSerializer, LabResultSerializer, CustomTokenObtainPairSerializer
+from .models import Profile, MealPlan, WeeklyUpdate, Recipe, FoodLog, Message, Conversation, LabResult, UploadSession
+from .serializers import UserSerializer, ProfileSerializer, MealPlanSerializer, WeeklyUpdateSerializer, RecipeSerializer, FoodLogSerializer, MessageSerializer, ConversationSerializer, LabResultSerializer, CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, UploadSessionSerializer
 from .social_views import GoogleLogin
-from django.db.models import F
+from . import catalog, conditional, dietary, realtime, recipe_search, shopping, social, timeseries, uploads
+from .pagination import FeedPagination, RankedPagination
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Case, When
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -18,9 +23,13 @@ class RegisterView(generics.CreateAPIView):
 class CustomTokenObtainPairView(SimpleJWTTokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class CustomTokenRefreshView(SimpleJWTTokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
 class ProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @conditional.conditional_get(conditional.profile_version)
     def get(self, request):
         user = request.user
         serializer = UserSerializer(user)
@@ -68,6 +77,10 @@ class MealPlanListView(generics.ListAPIView):
     def get_queryset(self):
         return MealPlan.objects.filter(user=self.request.user).order_by('-start_date')
 
+    @conditional.conditional_get(conditional.meal_plans_version)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 class MealPlanDetailView(generics.RetrieveAPIView):
     serializer_class = MealPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -76,6 +89,20 @@ class MealPlanDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return MealPlan.objects.filter(user=self.request.user)
 
+    @conditional.conditional_get(conditional.meal_plans_version)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class MealPlanShoppingListView(APIView):
+    """Merged, unit-normalized ingredients for one of the user's meal plans."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        plan = MealPlan.objects.filter(user=request.user, pk=pk).only('id', 'version', 'structured_plan').first()
+        if plan is None:
+            return Response({'error': 'Meal plan not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'plan': plan.id, 'version': plan.version, 'items': shopping.get_shopping_list(plan)})
+
 class WeeklyUpdateView(generics.ListCreateAPIView):
     serializer_class = WeeklyUpdateSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -119,51 +146,145 @@ class WeightHistoryView(APIView):
                 'notes': 'Starting weight'
             })
         
-        updates = WeeklyUpdate.objects.filter(user=user).order_by('date')
-        for update in updates:
-            history.append({
-                'date': update.date.isoformat(),
-                'current_weight': update.current_weight,
-                'notes': update.notes
-            })
-            
+        updates = WeeklyUpdate.objects.filter(user_id=user.id).order_by('date').values_list('date', 'current_weight', 'notes')
+        history.extend(
+            {'date': day.isoformat(), 'current_weight': weight, 'notes': notes}
+            for day, weight, notes in updates
+        )
         return Response(history)
 
+class ProgressSeriesView(APIView):
+    """
+    Columnar progress series for the current user:
+    ?metrics=       comma-separated subset of timeseries.METRICS (default all)
+    ?from= / ?to=   YYYY-MM-DD bounds
+    ?window=        points in the rolling mean (default 4)
+    ?bucket=        week or month: return per-bucket means
+    ?points=        thin each series to at most this many points (LTTB)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            return Response(timeseries.series_response_data(request.user.id, request.query_params))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 class RecipeViewSet(generics.RetrieveAPIView):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @conditional.conditional_get(conditional.recipe_version)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 class RecipeListView(generics.ListAPIView):
-    queryset = Recipe.objects.all()
+    """
+    Recipes, optionally narrowed by:
+    ?q=             full-text search over title, tags, ingredients and
+                    instructions, ordered by relevance
+    ?tag=           recipes carrying the tag (repeat for several)
+    ?calories_min=  / ?calories_max=, likewise protein_g, carbs_g and fat_g
+    ?prep_time_max= / ?cook_time_max= in minutes
+    ?for_patient=   user id; drops recipes that clash with that patient's
+                    allergies or diet. Patients may only pass their own id,
+                    nutritionists those of their patients. Advisory only:
+                    matching is by ingredient keywords (core.dietary), so
+                    it can miss brand names or hidden ingredients.
+    """
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @conditional.conditional_get(conditional.recipes_version)
+    def list(self, request, *args, **kwargs):
+        try:
+            queryset = recipe_search.filter_recipes(Recipe.objects.all(), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        patient_id = request.query_params.get('for_patient')
+        if patient_id:
+            if not patient_id.isdigit():
+                return Response({'error': 'for_patient must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+            user = request.user
+            profile = getattr(user, 'profile', None)
+            if int(patient_id) != user.id and not (user.is_staff or (profile and profile.is_nutritionist)):
+                return Response({'error': "You can only filter recipes for yourself"}, status=status.HTTP_403_FORBIDDEN)
+            row = Profile.objects.filter(user_id=patient_id).values_list(
+                'allergies', 'dietary_prefs', 'nutritionist_id'
+            ).first()
+            # Nutritionists only see their own caseload
+            if row is None or not (int(patient_id) == user.id or user.is_staff or row[2] == user.id):
+                return Response({'error': 'Patient not found'}, status=status.HTTP_404_NOT_FOUND)
+            queryset = dietary.exclude_conflicts(queryset, dietary.avoided_flags(*row[:2]))
+
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            return Response(self.get_serializer(queryset, many=True).data)
+
+        ranking = recipe_search.ranked_ids(query, queryset)
+        paginator = RankedPagination()
+        page = paginator.paginate_ranking(ranking, request)
+        ids = [pk for _, pk in (ranking if page is None else page)]
+        recipes = Recipe.objects.in_bulk(ids)
+        data = self.get_serializer([recipes[pk] for pk in ids if pk in recipes], many=True).data
+        if page is not None:
+            return paginator.get_paginated_response(data)
+        return Response(data)
+
+class CatalogImportView(APIView):
+    """
+    Staff upload of a recipe/template catalog as multipart `file`
+    (.json, .ndjson or .csv; ?input_format= overrides the extension).
+    Rows are validated and upserted by catalog key in batches; the response
+    is the import report with counts, row errors and throughput.
+    ?dry_run=true only validates.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            input_format = request.query_params.get('input_format') or catalog.detect_format(upload.name)
+            if input_format not in catalog.INPUT_FORMATS.values():
+                raise ValueError(f"input_format must be one of: {', '.join(sorted(set(catalog.INPUT_FORMATS.values())))}")
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            report = catalog.import_catalog(stream, input_format, dry_run=request.query_params.get('dry_run') == 'true')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
 class SocialProgressView(APIView):
+    """
+    Community feed of the latest weekly updates, excluding the caller's
+    own. Served from a cached feed rebuilt on each WeeklyUpdate write;
+    ?page_size / ?cursor page back through older entries.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        # Get latest 20 updates from the community (excluding current user)
-        # This creates a "Live Feed" feel rather than just a leaderboard
-        recent_updates = WeeklyUpdate.objects.exclude(user=request.user).select_related('user', 'user__profile').order_by('-date', '-id')[:20]
-        
-        social_data = []
-        for update in recent_updates:
-            profile = getattr(update.user, 'profile', None)
-            first_weight = profile.weight if profile else None
-            
-            weight_diff = 0
-            if first_weight:
-                weight_diff = update.current_weight - first_weight
-                
-            social_data.append({
-                'username': update.user.username,
-                'weight_lost': round(weight_diff * -1, 1), # Positive means lost, negative means gained
-                'current_weight': update.current_weight,
-                'date': update.date.isoformat(),
-                'id': update.id
-            })
-        return Response(social_data)
+        paginator = FeedPagination()
+        page = paginator.paginate_feed(request, request.user.id)
+        if page is not None:
+            return paginator.get_paginated_response([social.public_entry(entry) for entry in page])
+        return Response([social.public_entry(entry) for entry in social.feed_page(request.user.id)])
+
+class LeaderboardView(APIView):
+    """?mode=lost_month (default): most weight lost this calendar month; ?mode=streak: longest weekly streaks."""
+    permission_classes = [permissions.IsAuthenticated]
+    modes = ('lost_month', 'streak')
+
+    def get(self, request):
+        mode = request.query_params.get('mode', 'lost_month')
+        if mode not in self.modes:
+            return Response({'error': f"mode must be one of: {', '.join(self.modes)}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'mode': mode, 'results': social.leaderboard(mode)})
         
 class FoodLogViewSet(generics.ListCreateAPIView):
     serializer_class = FoodLogSerializer
@@ -190,9 +311,9 @@ class MessageViewSet(viewsets.ModelViewSet):
         elif folder == 'inbox':
             return Message.objects.filter(recipient=user).order_by('-timestamp')
             
-        # If staff, they can filter by a recipient (client)
+        # One conversation thread, oldest first
         client_username = self.request.query_params.get('client_username')
-        if user.is_staff and client_username:
+        if client_username:
             return Message.objects.filter(
                 (Q(sender=user) & Q(recipient__username=client_username)) |
                 (Q(recipient=user) & Q(sender__username=client_username))
@@ -213,48 +334,160 @@ class MessageViewSet(viewsets.ModelViewSet):
         if not sender_username:
             return Response({'error': 'sender_username is required'}, status=status.HTTP_400_BAD_REQUEST)
             
-        updated_count = Message.objects.filter(
-            sender__username=sender_username,
-            recipient=request.user,
-            is_read=False
-        ).update(is_read=True)
+        with transaction.atomic():
+            updated_count = Message.objects.filter(
+                sender__username=sender_username,
+                recipient=request.user,
+                is_read=False
+            ).update(is_read=True)
+            Conversation.mark_read(request.user, other_username=sender_username)
+            if updated_count:
+                # Read receipt for the sender, and badge refresh for the reader's other tabs
+                partner_ids = list(User.objects.filter(username=sender_username).values_list('id', flat=True))
+                realtime.publish(partner_ids + [request.user.id], 'read', {
+                    'reader': request.user.username,
+                    'sender': sender_username,
+                    'updated_count': updated_count,
+                })
         
         return Response({'status': 'success', 'updated_count': updated_count})
 
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
+        # The Conversation summary is updated by a post_save signal; keep both in one transaction
+        with transaction.atomic():
+            serializer.save(sender=self.request.user)
 
     @action(detail=False, methods=['post'])
     def mark_read(self, request):
-        Message.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+        with transaction.atomic():
+            updated_count = Message.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+            Conversation.mark_read(request.user)
+            if updated_count:
+                realtime.publish([request.user.id], 'read', {
+                    'reader': request.user.username,
+                    'sender': None,
+                    'updated_count': updated_count,
+                })
         return Response({'status': 'messages marked as read'})
 
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Total unread messages for the badge, summed from Conversation rows."""
+        user = request.user
+        totals = Conversation.for_user(user).aggregate(
+            unread=Sum(Case(When(user_a=user, then='unread_a'), default='unread_b'))
+        )
+        return Response({'unread_count': totals['unread'] or 0})
+
 class ConversationListView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        # Find all unique users who have exchanged messages with this staff member
-        sent_to = Message.objects.filter(sender=request.user).values_list('recipient', flat=True)
-        received_from = Message.objects.filter(recipient=request.user).values_list('sender', flat=True)
-        
-        user_ids = set(sent_to) | set(received_from)
+        # Find all unique users who have exchanged messages with this staff member,
+        # from the Conversation summary rows rather than the messages
+        pairs = Conversation.for_user(request.user).values_list('user_a_id', 'user_b_id')
+        user_ids = {user_b if user_a == request.user.id else user_a for user_a, user_b in pairs}
         users = User.objects.filter(id__in=user_ids).exclude(id=request.user.id)
-        
-        # Also include all users if the staff wants to start a new chat? 
-        # For now, just those with history.
-        
+
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
 
+class MessageThreadListView(generics.ListAPIView):
+    """
+    The caller's conversations, newest first, read from the Conversation
+    summary table so the cost scales with conversations rather than messages.
+    """
+    serializer_class = ConversationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        return Conversation.for_user(user).exclude(
+            user_a=user, user_b=user
+        ).select_related('user_a', 'user_b').order_by('-last_message_at')
+
 class NutritionistView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @conditional.conditional_get(conditional.nutritionists_version)
     def get(self, request):
         # Return all staff users who can act as nutritionists
         nutritionists = User.objects.filter(is_staff=True)
         serializer = UserSerializer(nutritionists, many=True)
         return Response(serializer.data)
 
+class UploadSessionCreateView(APIView):
+    """
+    Start a resumable upload: POST filename, size and sha256, then PUT the
+    bytes to uploads/<id>/ in order with Content-Range headers, POST
+    uploads/<id>/complete/, and pass the id as `upload_id` when creating
+    the lab result or meal plan.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = uploads.start_upload(request.user, **serializer.validated_data)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+class UploadSessionView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        # Clients resume from the returned offset
+        session = UploadSession.objects.filter(id=pk, user_id=request.user.id).first()
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadSessionSerializer(session).data)
+
+    def put(self, request, pk):
+        content_range = uploads.parse_content_range(request.headers.get('Content-Range'))
+        if content_range is None:
+            return Response({'error': 'Content-Range: bytes <start>-<end>/<size> is required'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end, total = content_range
+        length = end - start + 1
+        if length > settings.CHUNKED_UPLOAD_MAX_CHUNK:
+            return Response({'error': f'Chunks are limited to {settings.CHUNKED_UPLOAD_MAX_CHUNK} bytes'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if request.headers.get('Content-Length') not in (None, str(length)):
+            return Response({'error': 'Content-Length does not match Content-Range'}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = UploadSession.objects.filter(id=pk, user_id=request.user.id).first()
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        if total != session.size:
+            return Response({'error': f'Upload size is {session.size} bytes'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # request.stream reads the body as it arrives instead of buffering it
+            session = uploads.write_chunk(pk, request.user, start, request.stream, length)
+        except UploadSession.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        except uploads.ChunkError as e:
+            return Response({'error': str(e), 'offset': e.session.received}, status=status.HTTP_409_CONFLICT)
+        return Response(UploadSessionSerializer(session).data)
+
+    def delete(self, request, pk):
+        session = UploadSession.objects.filter(id=pk, user_id=request.user.id).first()
+        if session is not None:
+            uploads.discard_upload(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UploadSessionCompleteView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            session = uploads.finish_upload(pk, request.user)
+        except UploadSession.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        except uploads.ChunkError as e:
+            data = {'error': str(e)}
+            if e.session is not None:
+                data['offset'] = e.session.received
+            return Response(data, status=status.HTTP_409_CONFLICT)
+        return Response(UploadSessionSerializer(session).data)
+
 class LabResultViewSet(generics.ListCreateAPIView):
     serializer_class = LabResultSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -1,6 +1,8 @@
 import React from 'react';
 import { Outlet, useNavigate, useLocation } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
+import api from '../services/api';
+import { subscribeToMessages } from '../services/messageStream';
 import {
     AppBar,
     Box,
@@ -72,29 +74,24 @@ const Layout: React.FC = () => {
         const fetchUnreadCount = async () => {
             if (!user) return;
             try {
-                // We'll need an endpoint for this, or just fetch messages and count
-                // A lightweight endpoint for count would be better, but for now filtering messages is okay
-                // Assuming we can use the messages endpoint
-                // Note: We need to import api here.
-                const { default: api } = await import('../services/api');
-                const res = await api.get('/messages/?folder=inbox');
-                const count = res.data.filter((m: any) => !m.is_read).length;
-                setUnreadCount(count);
+                const res = await api.get('/messages/unread_count/');
+                setUnreadCount(res.data.unread_count);
             } catch (error) {
                 console.error("Failed to fetch unread count", error);
             }
         };
 
+        if (!user) return;
         fetchUnreadCount();
 
-        // Listen for custom event from Messages page
-        window.addEventListener('messagesRead', fetchUnreadCount);
-
-        const interval = setInterval(fetchUnreadCount, 60000); // Check every minute
-        return () => {
-            clearInterval(interval);
-            window.removeEventListener('messagesRead', fetchUnreadCount);
-        };
+        // Recount when a message arrives, something is read (in any tab) or the stream reconnects
+        return subscribeToMessages((event) => {
+            if (event.type === 'open'
+                || (event.type === 'message' && event.data.recipient === user.username)
+                || (event.type === 'read' && event.data.reader === user.username)) {
+                fetchUnreadCount();
+            }
+        });
     }, [user]);
 
     const drawer = (
@@ -51,8 +51,9 @@ const ClientFoodJournals: React.FC = () => {
 
             const allLogs: FoodLog[] = [];
             for (const patient of patients) {
-                const detailResponse = await api.get(`/nutritionist/patients/${patient.id}/`);
-                const patientLogs = detailResponse.data.food_logs.map((log: any) => ({
+                // The patient detail only embeds the latest few
+                const historyResponse = await api.get(`/nutritionist/patients/${patient.id}/history/food_logs/`);
+                const patientLogs = historyResponse.data.map((log: any) => ({
                     ...log,
                     user: {
                         id: patient.id,
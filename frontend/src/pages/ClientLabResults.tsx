@@ -51,8 +51,9 @@ const ClientLabResults: React.FC = () => {
 
             const allResults: LabResult[] = [];
             for (const patient of patients) {
-                const detailResponse = await api.get(`/nutritionist/patients/${patient.id}/`);
-                const patientResults = detailResponse.data.lab_results.map((result: any) => ({
+                // The patient detail only embeds the latest few
+                const historyResponse = await api.get(`/nutritionist/patients/${patient.id}/history/lab_results/`);
+                const patientResults = historyResponse.data.map((result: any) => ({
                     ...result,
                     user: {
                         id: patient.id,
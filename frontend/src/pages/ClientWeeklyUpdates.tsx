@@ -64,8 +64,9 @@ const ClientWeeklyUpdates: React.FC = () => {
             // Fetch updates for each patient
             const allUpdates: WeeklyUpdate[] = [];
             for (const patient of patients) {
-                const detailResponse = await api.get(`/nutritionist/patients/${patient.id}/`);
-                const patientUpdates = detailResponse.data.weekly_updates.map((update: any) => ({
+                // The patient detail only embeds the latest few
+                const historyResponse = await api.get(`/nutritionist/patients/${patient.id}/history/weekly_updates/`);
+                const patientUpdates = historyResponse.data.map((update: any) => ({
                     ...update,
                     user: {
                         id: patient.id,
@@ -20,6 +20,7 @@ import {
 } from '@mui/material';
 import { Send, Add, ArrowBack } from '@mui/icons-material';
 import api from '../services/api';
+import { subscribeToMessages, type MessageStreamEvent } from '../services/messageStream';
 import { useAuth } from '../contexts/AuthContext';
 import ComposeMessage from '../components/ComposeMessage';
 
@@ -35,10 +36,12 @@ interface Message {
     is_read: boolean;
 }
 
+// One row of /messages/threads/: the partner plus the summary
 interface Conversation {
-    partner_username: string;
-    partner_name: string; // We might not have this from API, use username or fetch profile
-    last_message: Message;
+    username: string;
+    last_message_id: number;
+    last_message_preview: string;
+    last_message_at: string;
     unread_count: number;
 }
 
@@ -52,13 +55,23 @@ const Messages: React.FC = () => {
     const [sending, setSending] = useState(false);
     const [composeOpen, setComposeOpen] = useState(false);
     const messagesEndRef = useRef<HTMLDivElement>(null);
+    // Read by the stream handler, which is subscribed once
+    const selectedPartnerRef = useRef<string | null>(null);
+    const conversationsRef = useRef<Conversation[]>([]);
 
     useEffect(() => {
-        fetchMessages();
-        // Poll for new messages every 30 seconds
-        const interval = setInterval(fetchMessages, 30000);
-        return () => clearInterval(interval);
-    }, []);
+        fetchConversations();
+        // New messages and read receipts are pushed over SSE instead of polled
+        return subscribeToMessages(handleStreamEvent);
+    }, [user]);
+
+    useEffect(() => {
+        selectedPartnerRef.current = selectedPartner;
+    }, [selectedPartner]);
+
+    useEffect(() => {
+        conversationsRef.current = conversations;
+    }, [conversations]);
 
     useEffect(() => {
         scrollToBottom();
@@ -68,62 +81,79 @@ const Messages: React.FC = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
     };
 
-    const fetchMessages = async () => {
+    const fetchConversations = async () => {
         try {
-            // Fetch all messages (inbox and sent) to build conversations
-            // We could optimize this with a dedicated conversations endpoint
-            const res = await api.get('/messages/');
-            const allMessages: Message[] = res.data;
-            setMessages(allMessages);
-            organizeConversations(allMessages);
+            const res = await api.get('/messages/threads/');
+            setConversations(res.data);
         } catch (err) {
-            console.error('Failed to fetch messages', err);
+            console.error('Failed to fetch conversations', err);
         } finally {
             setLoading(false);
         }
     };
 
-    const organizeConversations = (allMessages: Message[]) => {
-        if (!user) return;
-
-        const convs: { [key: string]: Conversation } = {};
-
-        allMessages.forEach(msg => {
-            const isSender = msg.sender === user.username; // Assuming sender is username in API response
-            // The partner is the other person in the conversation
-            // Note: API returns sender as string (username) based on Serializer
+    const fetchThread = async (partner: string) => {
+        try {
+            const res = await api.get('/messages/', { params: { client_username: partner } });
+            if (selectedPartnerRef.current === partner) {
+                setMessages(res.data);
+            }
+        } catch (err) {
+            console.error('Failed to fetch messages', err);
+        }
+    };
 
-            // Check if sender/recipient fields are usernames or IDs based on serializer
-            // MessageSerializer: sender = StringRelatedField (username), recipient = SlugRelatedField (username)
-            // So they are usernames.
+    const handleStreamEvent = (event: MessageStreamEvent) => {
+        if (!user) return;
+        const selected = selectedPartnerRef.current;
 
-            const partner = isSender ? msg.recipient : msg.sender;
+        if (event.type === 'open') {
+            // Catch up on anything sent while the stream was down
+            fetchConversations();
+            if (selected) fetchThread(selected);
+        } else if (event.type === 'message') {
+            const msg: Message = event.data;
+            const incoming = msg.recipient === user.username;
+            const partner = incoming ? msg.sender : msg.recipient;
+            const isOpen = partner === selected;
 
-            if (!convs[partner]) {
-                convs[partner] = {
-                    partner_username: partner,
-                    partner_name: partner, // We could fetch real name if available
-                    last_message: msg,
-                    unread_count: 0
-                };
+            if (isOpen) {
+                setMessages(prev => prev.some(m => m.id === msg.id) ? prev : [...prev, msg]);
+                if (incoming) markConversationRead(partner);
             }
-
-            // Update last message if this one is newer
-            if (new Date(msg.timestamp) > new Date(convs[partner].last_message.timestamp)) {
-                convs[partner].last_message = msg;
+            if (!conversationsRef.current.some(c => c.username === partner)) {
+                // A new partner; the summary row has their details
+                fetchConversations();
+                return;
             }
-
-            if (!isSender && !msg.is_read) {
-                convs[partner].unread_count++;
+            setConversations(prev => {
+                const existing = prev.find(c => c.username === partner);
+                if (!existing) return prev;
+                const updated = {
+                    ...existing,
+                    last_message_id: msg.id,
+                    last_message_preview: msg.content,
+                    last_message_at: msg.timestamp,
+                    unread_count: existing.unread_count + (incoming && !isOpen ? 1 : 0),
+                };
+                return [updated, ...prev.filter(c => c !== existing)];
+            });
+        } else if (event.type === 'read') {
+            const { reader, sender } = event.data;
+            if (reader === user.username) {
+                // Possibly from another tab
+                if (sender) {
+                    setConversations(prev => prev.map(c => c.username === sender ? { ...c, unread_count: 0 } : c));
+                } else {
+                    fetchConversations();
+                }
             }
-        });
-
-        // Convert to array and sort by last message timestamp
-        const sortedConvs = Object.values(convs).sort((a, b) =>
-            new Date(b.last_message.timestamp).getTime() - new Date(a.last_message.timestamp).getTime()
-        );
-
-        setConversations(sortedConvs);
+            if (sender === user.username) {
+                setMessages(prev => prev.map(m =>
+                    m.sender === user.username && m.recipient === reader ? { ...m, is_read: true } : m
+                ));
+            }
+        }
     };
 
     const handleSendMessage = async (e?: React.FormEvent) => {
@@ -137,11 +167,9 @@ const Messages: React.FC = () => {
                 content: newMessage
             });
 
-            // Optimistically add message
-            const newMsg = res.data;
-            const updatedMessages = [...messages, newMsg];
-            setMessages(updatedMessages);
-            organizeConversations(updatedMessages);
+            // The stream echoes it too; handleStreamEvent skips duplicates
+            const newMsg: Message = res.data;
+            setMessages(prev => prev.some(m => m.id === newMsg.id) ? prev : [...prev, newMsg]);
             setNewMessage('');
         } catch (err) {
             console.error('Failed to send message', err);
@@ -153,31 +181,25 @@ const Messages: React.FC = () => {
 
     const handlePartnerSelect = (partner: string) => {
         setSelectedPartner(partner);
+        selectedPartnerRef.current = partner;
+        setMessages([]);
+        fetchThread(partner);
         markConversationRead(partner);
     };
 
     const markConversationRead = async (partner: string) => {
         try {
             await api.post('/messages/mark_read/', { sender_username: partner });
-            // Update local state
-            const updatedMessages = messages.map(msg =>
-                msg.sender === partner && !msg.is_read ? { ...msg, is_read: true } : msg
-            );
-            setMessages(updatedMessages);
-            organizeConversations(updatedMessages);
-
-            // Trigger layout refresh
-            window.dispatchEvent(new CustomEvent('messagesRead'));
+            // The 'read' event updates the badges; clear this one right away
+            setConversations(prev => prev.map(c => c.username === partner ? { ...c, unread_count: 0 } : c));
         } catch (err) {
             console.error('Failed to mark conversation as read', err);
         }
     };
 
-    // Filter messages for selected conversation
-    const currentMessages = messages.filter(msg =>
-        (msg.sender === user?.username && msg.recipient === selectedPartner) ||
-        (msg.recipient === user?.username && msg.sender === selectedPartner)
-    ).sort((a, b) => new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime());
+    const currentMessages = [...messages].sort((a, b) =>
+        new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime()
+    );
 
     if (loading) {
         return (
@@ -212,22 +234,22 @@ const Messages: React.FC = () => {
                         ) : (
                             conversations.map((conv) => (
                                 <ListItem
-                                    key={conv.partner_username}
+                                    key={conv.username}
                                     disablePadding
                                 >
                                     <ListItemButton
-                                        selected={selectedPartner === conv.partner_username}
-                                        onClick={() => handlePartnerSelect(conv.partner_username)}
+                                        selected={selectedPartner === conv.username}
+                                        onClick={() => handlePartnerSelect(conv.username)}
                                         alignItems="flex-start"
                                     >
                                         <ListItemAvatar>
-                                            <Avatar>{conv.partner_username.charAt(0).toUpperCase()}</Avatar>
+                                            <Avatar>{conv.username.charAt(0).toUpperCase()}</Avatar>
                                         </ListItemAvatar>
                                         <ListItemText
                                             primary={
                                                 <Box display="flex" justifyContent="space-between">
                                                     <Typography variant="subtitle2" fontWeight="bold">
-                                                        {conv.partner_username}
+                                                        {conv.username}
                                                     </Typography>
                                                     {conv.unread_count > 0 && (
                                                         <Badge badgeContent={conv.unread_count} color="primary" />
@@ -236,8 +258,7 @@ const Messages: React.FC = () => {
                                             }
                                             secondary={
                                                 <Typography variant="body2" color="text.secondary" noWrap>
-                                                    {conv.last_message.sender === user?.username && 'You: '}
-                                                    {conv.last_message.content}
+                                                    {conv.last_message_preview}
                                                 </Typography>
                                             }
                                         />
@@ -344,8 +365,8 @@ const Messages: React.FC = () => {
                 open={composeOpen}
                 onClose={() => setComposeOpen(false)}
                 onMessageSent={() => {
-                    fetchMessages();
-                    // Optionally select the partner we just messaged
+                    // The stream delivers the message; refetch in case it's a new partner
+                    fetchConversations();
                 }}
             />
         </Container>
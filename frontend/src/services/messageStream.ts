@@ -0,0 +1,69 @@
+import api from './api';
+
+// Server-Sent Events from /api/messages/stream/: 'message' carries a new
+// message (sent or received), 'read' a read receipt. One EventSource is
+// shared by every subscriber in the tab.
+
+export type MessageStreamEvent =
+    | { type: 'message'; data: any }
+    | { type: 'read'; data: { reader: string; sender: string | null; updated_count: number } }
+    // The stream (re)connected; events may have been missed while it was down
+    | { type: 'open'; data: null };
+
+type Listener = (event: MessageStreamEvent) => void;
+
+const RECONNECT_MS = 5000;
+
+const listeners = new Set<Listener>();
+let source: EventSource | null = null;
+let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+
+const emit = (event: MessageStreamEvent) => {
+    listeners.forEach(listener => listener(event));
+};
+
+const streamUrl = () => {
+    // EventSource can't send headers, so the access token goes in the query
+    const base = import.meta.env.VITE_API_URL || '/api';
+    const token = localStorage.getItem('accessToken') || '';
+    return `${base}/messages/stream/?token=${encodeURIComponent(token)}`;
+};
+
+const connect = () => {
+    const es = new EventSource(streamUrl());
+    source = es;
+    es.addEventListener('open', () => emit({ type: 'open', data: null }));
+    es.addEventListener('message', (e) => emit({ type: 'message', data: JSON.parse((e as MessageEvent).data) }));
+    es.addEventListener('read', (e) => emit({ type: 'read', data: JSON.parse((e as MessageEvent).data) }));
+    es.addEventListener('error', () => {
+        // Network drops are retried by the browser; a rejected token closes
+        // the stream. Any api call refreshes the token, then reopen.
+        if (es.readyState !== EventSource.CLOSED || source !== es) return;
+        source = null;
+        reconnectTimer = setTimeout(async () => {
+            reconnectTimer = null;
+            try {
+                await api.get('/messages/unread_count/');
+            } catch {
+                // Still reconnect; the next failure schedules another try
+            }
+            if (listeners.size > 0 && !source) connect();
+        }, RECONNECT_MS);
+    });
+};
+
+export const subscribeToMessages = (listener: Listener) => {
+    listeners.add(listener);
+    if (!source && !reconnectTimer) connect();
+    return () => {
+        listeners.delete(listener);
+        if (listeners.size === 0) {
+            source?.close();
+            source = null;
+            if (reconnectTimer) {
+                clearTimeout(reconnectTimer);
+                reconnectTimer = null;
+            }
+        }
+    };
+};
@@ -1,3 +1,14 @@
+/**
+ * Patient uploads are only served to authenticated users, and <img>/<a> tags
+ * can't send the Authorization header, so pass the access token in the URL.
+ */
+const withMediaToken = (url: string): string => {
+    if (!url.includes('/media/') || url.includes('/media/recipes/')) return url;
+    const token = typeof window !== 'undefined' ? localStorage.getItem('accessToken') : null;
+    if (!token) return url;
+    return `${url}${url.includes('?') ? '&' : '?'}token=${encodeURIComponent(token)}`;
+};
+
 /**
  * Helper function to construct full media URLs.
  * Handles relative paths by prepending the API origin if available.
@@ -9,9 +20,9 @@ export const getMediaUrl = (path: string | null | undefined): string | undefined
     if (path.startsWith('http')) {
         // If we are on HTTPS, ensure the media URL is also HTTPS to avoid mixed content
         if (typeof window !== 'undefined' && window.location.protocol === 'https:' && path.startsWith('http:')) {
-            return path.replace('http:', 'https:');
+            return withMediaToken(path.replace('http:', 'https:'));
         }
-        return path;
+        return withMediaToken(path);
     }
 
     // Get API URL from env
@@ -37,7 +48,7 @@ export const getMediaUrl = (path: string | null | undefined): string | undefined
 
         // Use the URL constructor to safely combine the base and path
         // We use baseUrl.origin to ensure we don't have multiple API path segments if apiUrl was something like /api
-        return new URL(formattedPath, baseUrl.origin).toString();
+        return withMediaToken(new URL(formattedPath, baseUrl.origin).toString());
     } catch (e) {
         console.error('Error constructing media URL:', e);
         return path;
@@ -148,6 +148,23 @@ else:
     }
 
 
+# Cache (dashboard stats and other short-lived derived data).
+# Invalidation is by writing to the cache, so every process must share it:
+# production (DATABASE_URL set) defaults to the database cache, whose table
+# build.sh creates; development defaults to per-process memory. Point
+# CACHE_BACKEND/CACHE_LOCATION at e.g. memcached to override.
+if os.environ.get('DATABASE_URL'):
+    DEFAULT_CACHE_BACKEND, DEFAULT_CACHE_LOCATION = 'django.core.cache.backends.db.DatabaseCache', 'django_cache'
+else:
+    DEFAULT_CACHE_BACKEND, DEFAULT_CACHE_LOCATION = 'django.core.cache.backends.locmem.LocMemCache', 'nourishlab'
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', DEFAULT_CACHE_BACKEND),
+        'LOCATION': os.getenv('CACHE_LOCATION', DEFAULT_CACHE_LOCATION),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -189,9 +206,33 @@ STATICFILES_DIRS = [
 ]
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Uploads are content-addressed and deduplicated (core.storage). Django 5.1
+# only reads STORAGES, so STATICFILES_STORAGE above has no effect and the
+# staticfiles entry keeps today's behaviour.
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Hand authorized media downloads to a fronting proxy instead of streaming
+# them from Python: 'X-Accel-Redirect' (nginx, served from the internal
+# location MEDIA_ACCEL_PREFIX) or 'X-Sendfile' (Apache/lighttpd)
+MEDIA_ACCEL_HEADER = os.getenv('MEDIA_ACCEL_HEADER', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Uploaded images up to this size are re-encoded inside the request; larger
+# ones are processed on a background thread (see core.images)
+IMAGE_SYNC_MAX_BYTES = int(os.getenv('IMAGE_SYNC_MAX_BYTES', str(2 * 1024 * 1024)))
+
+# Resumable uploads (core.uploads). Part files must be on storage shared by
+# every app instance that can receive the chunks.
+CHUNKED_UPLOAD_DIR = os.getenv('CHUNKED_UPLOAD_DIR', '/tmp/nourishlab-uploads')
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', str(200 * 1024 * 1024)))
+CHUNKED_UPLOAD_MAX_CHUNK = int(os.getenv('CHUNKED_UPLOAD_MAX_CHUNK', str(8 * 1024 * 1024)))
+
 # CORS Settings
 cors_origins = os.getenv('CORS_ALLOWED_ORIGINS', '')
 if cors_origins:
@@ -205,14 +246,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
+        # Stateless variants trust the signed user/profile claims and fall
+        # back to the stock DB lookup for tokens issued without them
+        'core.authentication.StatelessJWTAuthentication',
+        'core.authentication.StatelessJWTCookieAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Keyset pagination on each list view's ordering; enabled per request
+    # with ?page_size= or ?cursor= so existing clients still get plain lists
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
 }
 
+# Realtime message push (Server-Sent Events on the ASGI app).
+# InProcessBroker is enough for one worker; with several workers on one host
+# use core.realtime.UnixSocketBroker so every worker sees every event.
+REALTIME_BROKER = os.getenv('REALTIME_BROKER', 'core.realtime.InProcessBroker')
+REALTIME_SOCKET_DIR = os.getenv('REALTIME_SOCKET_DIR', '/tmp/nourishlab-realtime')
+
+# Template assignments above this many patients are queued as a
+# BulkAssignmentJob for the run_assignment_jobs worker instead of running
+# inside the request
+BULK_ASSIGN_SYNC_LIMIT = int(os.getenv('BULK_ASSIGN_SYNC_LIMIT', '500'))
+
 # Simple JWT Settings
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -230,6 +287,7 @@ REST_AUTH = {
     'JWT_AUTH_COOKIE': 'auth',
     'JWT_AUTH_REFRESH_COOKIE': 'refresh',
     'JWT_AUTH_HTTPONLY': False, # Set to True in production
+    'JWT_TOKEN_CLAIMS_SERIALIZER': 'core.serializers.CustomTokenObtainPairSerializer',
 }
 
 SOCIALACCOUNT_PROVIDERS = {
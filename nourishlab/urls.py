@@ -30,12 +30,14 @@ urlpatterns = [
     path('accounts/', include('allauth.urls')),
 ]
 
-# Serve media files even in production (specifically for Render/simple deployments)
-from django.views.static import serve
+# Serve media files even in production (specifically for Render/simple deployments).
+# serve_media checks ownership of patient uploads and supports ranges/ETags;
+# set MEDIA_ACCEL_HEADER to hand the transfer to a fronting proxy.
 from django.urls import re_path
+from core.media import serve_media
 
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    re_path(r'^media/(?P<path>.*)$', serve_media, name='media'),
 ]
 
 if settings.DEBUG: